@@ -1,10 +1,11 @@
 import os
 import sys
 import types
-from flask import Flask, send_from_directory, jsonify
+from flask import Flask, Response, request, send_file, send_from_directory, jsonify, abort
+from PIL import Image
+from werkzeug.security import safe_join
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
-import mysql.connector
 
 # ---------------------------------------------------
 # 1. إصلاح مسارات الاستيراد (The Sys Path Hack)
@@ -27,57 +28,32 @@ try:
     from backend.routes.auth import auth_bp
     from backend.routes.predict import predict_bp
     from backend.routes.disease import disease_bp
+    from backend.utils.metrics import render_metrics, instrument_app
+    from backend.utils.db import DatabaseBusy, DatabaseUnavailable
+    from backend.utils.etags import file_etag, version_etag
+    from backend.utils.thumbnails import ThumbnailCache, THUMBNAIL_FORMATS, negotiate_format
+    from backend.utils.model_registry import model_state, start_warmup
 except ImportError:
     # محاولة بديلة في حالة التشغيل المحلي
     from config import Config
     from routes.auth import auth_bp
     from routes.predict import predict_bp
     from routes.disease import disease_bp
+    from utils.metrics import render_metrics, instrument_app
+    from utils.db import DatabaseBusy, DatabaseUnavailable
+    from utils.etags import file_etag, version_etag
+    from utils.thumbnails import ThumbnailCache, THUMBNAIL_FORMATS, negotiate_format
+    from utils.model_registry import model_state, start_warmup
 
 # ---------------------------------------------------
-# 3. دالة تهيئة قاعدة البيانات (إنشاء الجداول)
+# 3. مخطط قاعدة البيانات
 # ---------------------------------------------------
-def init_db():
-    """تقوم بإنشاء الجداول الضرورية في MySQL إذا لم تكن موجودة"""
-    try:
-        conn = mysql.connector.connect(
-            host=Config.MYSQL_HOST,
-            user=Config.MYSQL_USER,
-            password=Config.MYSQL_PASSWORD,
-            database=Config.MYSQL_DB,
-            port=Config.MYSQL_PORT
-        )
-        cursor = conn.cursor()
-        
-        # 1. إنشاء جدول المستخدمين
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                username VARCHAR(255) UNIQUE NOT NULL,
-                password VARCHAR(255) NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-
-        # 2. إنشاء جدول التنبؤات (History)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS history (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                user_id INT NOT NULL,
-                image_path VARCHAR(500),
-                disease_name VARCHAR(255),
-                confidence FLOAT,
-                date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-            )
-        """)
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
-        print("✅ Database tables initialized successfully (MySQL).")
-    except Exception as e:
-        print(f"⚠️ Warning: Could not initialize DB tables: {e}")
+# لا يوجد DDL عند التشغيل: الجداول والفهارس تُنشأ مرة واحدة لكل نشر عبر
+#   python -m backend.migrate
+# (انظر backend/utils/migrations.py)
+
+# الصور المصغرة المشتقة من الصور المرفوعة (تُولَّد عند أول طلب)
+THUMBNAILS = ThumbnailCache()
 
 # ---------------------------------------------------
 # 4. إعداد التطبيق
@@ -94,30 +70,107 @@ def create_app():
     jwt = JWTManager(app)
 
     # تهيئة CORS
-    CORS(app, resources={r"/*": {"origins": "*"}})
+    CORS(app, resources={r"/*": {"origins": "*"}}, expose_headers=['X-Next-Cursor', 'ETag', 'Retry-After', 'Location'])
+
+    # قياس عدد الطلبات وزمنها لكل مسار (/metrics)
+    instrument_app(app)
+
+    # تحميل الموديل في الخلفية حتى لا يدفع الاستيراد ثمنه (وإلا يُحمَّل عند أول تنبؤ)
+    if Config.INFERENCE_TIER != 'remote' and Config.MODEL_BACKGROUND_LOAD:
+        start_warmup()
+
+    # كل الاتصالات مشغولة: نطلب من العميل إعادة المحاولة بدلاً من الانتظار
+    @app.errorhandler(DatabaseBusy)
+    def database_busy(error):
+        response = jsonify({"error": "Database busy, please retry"})
+        response.headers['Retry-After'] = '1'
+        return response, 503
 
-    # تهيئة الجداول عند بدء التشغيل
-    init_db()
+    # MySQL غير متاح (التسجيل والدخول لا يمكن تخزينهما محلياً)
+    @app.errorhandler(DatabaseUnavailable)
+    def database_unavailable(error):
+        response = jsonify({"error": "Database temporarily unavailable, please retry"})
+        response.headers['Retry-After'] = '5'
+        return response, 503
 
     # تسجيل المسارات (Blueprints)
     app.register_blueprint(auth_bp, url_prefix="/api/auth")
     app.register_blueprint(predict_bp, url_prefix="/api")
     app.register_blueprint(disease_bp, url_prefix="/api")
 
+    # أسماء الصور المرفوعة UUID ولا تتغير أبداً: تخزين دائم في المتصفح + ETag من بصمة المحتوى
+    def send_upload(filename):
+        path = safe_join(Config.UPLOAD_FOLDER, filename)
+        if path is None or not os.path.isfile(path):
+            abort(404)
+        response = send_from_directory(
+            Config.UPLOAD_FOLDER, filename,
+            etag=file_etag(path),
+            max_age=Config.UPLOAD_MAX_AGE
+        )
+        response.cache_control.immutable = True
+        return response
+
+    # صور مصغرة بأحجام ثابتة (WebP للمتصفحات التي تدعمه، وإلا JPEG)
+    @app.route("/thumbnails/<int:size>/<filename>")
+    def thumbnail(size, filename):
+        if size not in Config.THUMBNAIL_SIZES:
+            return jsonify({"error": f"Unsupported size (use one of {list(Config.THUMBNAIL_SIZES)})"}), 404
+        fmt = negotiate_format(request.args.get('format'), request.accept_mimetypes)
+        if fmt is None:
+            return jsonify({"error": "format must be webp or jpeg"}), 400
+        source = safe_join(Config.UPLOAD_FOLDER, filename)
+        if source is None or not os.path.isfile(source):
+            abort(404)
+
+        try:
+            path = THUMBNAILS.get(source, filename, size, fmt)
+        except (OSError, Image.DecompressionBombError) as e:
+            print(f"Thumbnail Error: {e}")
+            return jsonify({"error": "Could not render thumbnail"}), 415
+        response = send_file(
+            path,
+            mimetype=THUMBNAIL_FORMATS[fmt][1],
+            etag=version_etag(file_etag(source), size, fmt),
+            max_age=Config.UPLOAD_MAX_AGE
+        )
+        response.cache_control.immutable = True
+        if not request.args.get('format'):
+            response.vary.add('Accept')
+        return response
+
     # مسار الصور (الجديد)
     @app.route("/backend/uploads/<filename>")
     def uploaded_file_new(filename):
-        return send_from_directory(Config.UPLOAD_FOLDER, filename)
+        return send_upload(filename)
 
     # مسار الصور (القديم - للدعم)
     @app.route("/uploads/<filename>")
     def uploaded_file_old(filename):
-        return send_from_directory(Config.UPLOAD_FOLDER, filename)
+        return send_upload(filename)
 
     @app.route("/api/health")
     def health_check():
         return jsonify({"status": "healthy", "db": "MySQL Cloud"}), 200
 
+    # فحص الجاهزية: 503 حتى يكتمل تحميل الموديل وتسخينه. يبدأ التحميل في الخلفية إذا لم يبدأ
+    # (أو حان موعد إعادة محاولة فاشلة) لكنه لا ينتظره أبداً
+    # في وضع remote لا يوجد موديل هنا، وجاهزية خدمة الاستدلال في /internal/ready
+    @app.route("/api/ready")
+    def readiness_check():
+        if Config.INFERENCE_TIER == 'remote':
+            return jsonify({"status": "ready", "inference": "remote"}), 200
+        state = model_state()
+        if state != 'ready':
+            start_warmup(background=True)
+        return jsonify({"status": state}), 200 if state == 'ready' else 503
+
+    # مقاييس Prometheus (HTTP، قاعدة البيانات، الموديل، الذاكرة)
+    @app.route("/metrics")
+    def metrics():
+        body, content_type = render_metrics()
+        return Response(body, mimetype=content_type)
+
     @app.route("/")
     def index():
         return jsonify({"message": "Plant Pal API is Running on Clever Cloud DB!"})
@@ -22,13 +22,135 @@ class Config:
     MYSQL_PASSWORD = os.getenv('DB_PASSWORD')
     MYSQL_DB = os.getenv('DB_NAME')
     MYSQL_PORT = int(os.getenv('DB_PORT', 3306))
+    DB_CONNECT_TIMEOUT = int(os.getenv('DB_CONNECT_TIMEOUT', 10))
+
+    # مجمّع الاتصالات (لكل عملية gunicorn)
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 5))
+    DB_POOL_RECYCLE = float(os.getenv('DB_POOL_RECYCLE', 1800))
+    DB_POOL_PING_IDLE = float(os.getenv('DB_POOL_PING_IDLE', 5))
 
     # 4. مسارات الملفات
     BASE_DIR = os.path.dirname(os.path.abspath(__file__))
     UPLOAD_FOLDER = os.path.join(BASE_DIR, 'uploads')
     MODEL_PATH = os.path.join(BASE_DIR, 'models')
+    # نموذج كامل محفوظ محلياً (اختياري) - وإلا يُبنى من config.json + model.weights.h5
+    MODEL_FULL_ARTIFACT = os.getenv('MODEL_FULL_ARTIFACT', 'model.keras')
+    # عند التفعيل يرفض العامل الإقلاع إذا لم يتم تحميل الموديل
+    MODEL_REQUIRED = os.getenv('MODEL_REQUIRED', 'False') == 'True'
+    # compiled = دالة tf.function بتوقيع ثابت، keras = model.predict التقليدية
+    INFERENCE_MODE = os.getenv('INFERENCE_MODE', 'compiled')
+    MODEL_XLA = os.getenv('MODEL_XLA', 'False') == 'True'
+    MODEL_WARMUP = os.getenv('MODEL_WARMUP', 'True') == 'True'
+    # تحميل الموديل في خيط خلفي عند الإقلاع (وإلا عند أول طلب تنبؤ)، راجع /api/ready
+    MODEL_BACKGROUND_LOAD = os.getenv('MODEL_BACKGROUND_LOAD', 'True') == 'True'
+    # إعادة محاولة التحميل الفاشل بعد مهلة تتضاعف مع كل فشل (من 30 ثانية حتى 10 دقائق)
+    MODEL_RETRY_SECONDS = float(os.getenv('MODEL_RETRY_SECONDS', 30))
+    MODEL_RETRY_MAX_SECONDS = float(os.getenv('MODEL_RETRY_MAX_SECONDS', 600))
+    # tensorflow = float32، tflite = عمود فقري مُكمَّم (يتطلب تقرير دقة ناجح)
+    INFERENCE_BACKEND = os.getenv('INFERENCE_BACKEND', 'tensorflow')
+    TFLITE_MODEL = os.getenv('TFLITE_MODEL', 'backbone_quantized.tflite')
+    TFLITE_HEAD = os.getenv('TFLITE_HEAD', 'head.npz')
+    TFLITE_THREADS = int(os.getenv('TFLITE_THREADS', os.cpu_count() or 1))
+    QUANTIZATION_REPORT = os.getenv('QUANTIZATION_REPORT', 'quantization_report.json')
+    QUANTIZATION_MIN_AGREEMENT = float(os.getenv('QUANTIZATION_MIN_AGREEMENT', 0.98))
+    # مع GUNICORN_PRELOAD تُقرأ أوزان tflite مرة واحدة في العملية الرئيسية وتشاركها كل العمال
+    # (بدون XNNPACK الذي ينسخ الأوزان لكل عامل: ذاكرة أقل مقابل استدلال أبطأ قليلاً)
+    TFLITE_SHARE_WEIGHTS = os.getenv('TFLITE_SHARE_WEIGHTS', 'True') == 'True'
+    # نفس متغير gunicorn.conf.py: التطبيق يُستورد في العملية الرئيسية قبل إنشاء العمال
+    GUNICORN_PRELOAD = os.getenv('GUNICORN_PRELOAD', 'False') == 'True'
+
+    # local = الموديل داخل عامل الـ API، remote = خدمة استدلال منفصلة (inference_app.py)
+    # بحيث لا يستورد عامل الـ API مكتبة TensorFlow إطلاقاً
+    INFERENCE_TIER = os.getenv('INFERENCE_TIER', 'local')
+    INFERENCE_URL = os.getenv('INFERENCE_URL', 'unix:///tmp/plantpal-inference.sock')
+    INFERENCE_TIMEOUT = float(os.getenv('INFERENCE_TIMEOUT', 30))
 
     # 5. إعدادات الصور
     ALLOWED_EXTENSIONS = {'jpg', 'jpeg', 'png', 'gif', 'bmp', 'tiff', 'webp'}
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024
+    # الصور المرفوعة لا تتغير (أسماء UUID): سنة كاملة مع Cache-Control: immutable
+    UPLOAD_MAX_AGE = int(os.getenv('UPLOAD_MAX_AGE', 31536000))
+
+    # الصور المصغرة لصفحة السجل (أحجام ثابتة فقط، مخزنة على القرص بحد أقصى وإخلاء LRU)
+    THUMBNAIL_FOLDER = os.getenv('THUMBNAIL_FOLDER', os.path.join(BASE_DIR, 'thumbnails'))
+    THUMBNAIL_SIZES = tuple(int(size) for size in os.getenv('THUMBNAIL_SIZES', '160,320,640').split(','))
+    # 0 = بلا حد
+    THUMBNAIL_CACHE_MAX_MB = int(os.getenv('THUMBNAIL_CACHE_MAX_MB', 512))
+    THUMBNAIL_QUALITY = int(os.getenv('THUMBNAIL_QUALITY', 80))
     IMG_SIZE = (224, 224)
+
+    # 6. إعدادات تجميع طلبات التنبؤ (Micro-batching)، راجع ADMISSION_MAX_IN_FLIGHT
+    BATCH_MAX_SIZE = int(os.getenv('BATCH_MAX_SIZE', 16))
+    BATCH_MAX_WAIT_MS = float(os.getenv('BATCH_MAX_WAIT_MS', 10))
+
+    # 7. إعدادات التنبؤ الدفعي (/api/predict/batch)
+    PREDICT_BATCH_MAX_IMAGES = int(os.getenv('PREDICT_BATCH_MAX_IMAGES', 64))
+    DECODE_WORKERS = int(os.getenv('DECODE_WORKERS', 4))
+
+    # 8. ذاكرة التنبؤات المؤقتة (0 = بلا انتهاء صلاحية)
+    PREDICTION_CACHE_SIZE = int(os.getenv('PREDICTION_CACHE_SIZE', 1024))
+    PREDICTION_CACHE_TTL = float(os.getenv('PREDICTION_CACHE_TTL', 0))
+
+    # سطر سجل منظم (JSON) بأزمنة مراحل كل طلب تنبؤ
+    TIMING_LOG = os.getenv('TIMING_LOG', 'True') == 'True'
+
+    # 9. مخزن تضمينات العمود الفقري (ResNet50V2) على القرص
+    EMBEDDING_STORE_ENABLED = os.getenv('EMBEDDING_STORE_ENABLED', 'True') == 'True'
+    EMBEDDING_FOLDER = os.getenv('EMBEDDING_FOLDER', os.path.join(BASE_DIR, 'embeddings'))
+    # بادئة فقط: تُضاف إليها بصمة أوزان العمود الفقري (أو sha256 لملف tflite)،
+    # فأي تغيير في العمود الفقري يبدأ مساحة جديدة وإعادة تدريب الرأس لا تبطل التضمينات
+    EMBEDDING_NAMESPACE = os.getenv('EMBEDDING_NAMESPACE', 'resnet50v2-gap')
+    # الحد الأقصى لحجم المجلد مع إخلاء الأقدم استخداماً (LRU)، 0 = بلا حد
+    EMBEDDING_STORE_MAX_MB = int(os.getenv('EMBEDDING_STORE_MAX_MB', 1024))
+
+    # 10. سجل الفحوصات (/api/history): حجم الصفحة الافتراضي والأقصى
+    HISTORY_PAGE_SIZE = int(os.getenv('HISTORY_PAGE_SIZE', 50))
+    HISTORY_MAX_PAGE_SIZE = int(os.getenv('HISTORY_MAX_PAGE_SIZE', 200))
+    # عدد الصفوف المقروءة من المؤشر غير المخزّن في كل دفعة أثناء التصدير
+    HISTORY_EXPORT_FETCH_SIZE = int(os.getenv('HISTORY_EXPORT_FETCH_SIZE', 500))
+    # عدد التصديرات المتزامنة لكل عامل (كل تصدير يحجز اتصالاً طوال النقل، أقل من DB_POOL_SIZE)
+    HISTORY_EXPORT_MAX_CONCURRENT = int(os.getenv('HISTORY_EXPORT_MAX_CONCURRENT', 2))
+    # ذاكرة مؤقتة لصفحات السجل لكل مستخدم، تُبطل بختم إصدار في مجلد مشترك يغيّره كل إدخال.
+    # يجب أن يكون المجلد مشتركاً بين كل العمال الذين يخدمون /api/history؛ الكتابات التي لا تمر
+    # عبر الختم (خادم آخر، تعديل يدوي) تظهر بعد HISTORY_CACHE_TTL ثانية على الأكثر
+    HISTORY_CACHE_SIZE = int(os.getenv('HISTORY_CACHE_SIZE', 2048))
+    HISTORY_CACHE_TTL = float(os.getenv('HISTORY_CACHE_TTL', 30))
+    HISTORY_STAMP_FOLDER = os.getenv('HISTORY_STAMP_FOLDER', os.path.join(BASE_DIR, 'history_stamps'))
+    # الحد الأقصى لعدد النتائج في طلب حفظ دفعي واحد (/api/save_results)
+    SAVE_RESULTS_MAX_ITEMS = int(os.getenv('SAVE_RESULTS_MAX_ITEMS', 500))
+
+    # 11. الكتابة المؤجلة لـ /api/save_result (الرد فوراً ثم إدخال دفعي في الخلفية)
+    WRITE_BEHIND_ENABLED = os.getenv('WRITE_BEHIND_ENABLED', 'False') == 'True'
+    WRITE_BEHIND_BATCH_SIZE = int(os.getenv('WRITE_BEHIND_BATCH_SIZE', 100))
+    WRITE_BEHIND_FLUSH_MS = float(os.getenv('WRITE_BEHIND_FLUSH_MS', 200))
+    # عند امتلاء الطابور يعود الحفظ إلى الإدخال المباشر
+    WRITE_BEHIND_MAX_QUEUE = int(os.getenv('WRITE_BEHIND_MAX_QUEUE', 10000))
+
+    # 12. ملف محلي (SQLite WAL) لسجلات الفحص أثناء انقطاع MySQL، يعاد إدخاله عند عودته
+    SPOOL_ENABLED = os.getenv('SPOOL_ENABLED', 'True') == 'True'
+    SPOOL_PATH = os.getenv('SPOOL_PATH', os.path.join(BASE_DIR, 'spool', 'history.sqlite3'))
+    SPOOL_REPLAY_BATCH = int(os.getenv('SPOOL_REPLAY_BATCH', 500))
+    SPOOL_POLL_SECONDS = float(os.getenv('SPOOL_POLL_SECONDS', 5))
+    SPOOL_MAX_BACKOFF = float(os.getenv('SPOOL_MAX_BACKOFF', 300))
+
+    # 13. التحكم في القبول لطلبات التنبؤ (لكل عامل): ما زاد عن الحد يُرفض فوراً بـ 503 و Retry-After
+    ADMISSION_ENABLED = os.getenv('ADMISSION_ENABLED', 'True') == 'True'
+    # كل طلب جارٍ يضع صورة واحدة في MicroBatcher، فالحد الأقصى للدفعة لا يتجاوز عدد الطلبات الجارية:
+    # القيمة الافتراضية = BATCH_MAX_SIZE حتى تمتلئ الدفعة، وأي قيمة أقل تصغّر الدفعات
+    ADMISSION_MAX_IN_FLIGHT = int(os.getenv('ADMISSION_MAX_IN_FLIGHT', BATCH_MAX_SIZE))
+    ADMISSION_MAX_QUEUE = int(os.getenv('ADMISSION_MAX_QUEUE', 8))
+    # أماكن في الطابور محجوزة للمستخدمين المسجلين (JWT صالح)، ويُخدمون أولاً
+    ADMISSION_PRIORITY_RESERVE = int(os.getenv('ADMISSION_PRIORITY_RESERVE', 2))
+    ADMISSION_QUEUE_TIMEOUT = float(os.getenv('ADMISSION_QUEUE_TIMEOUT', 5))
+
+    # 14. التنبؤ غير المتزامن (/api/predict/jobs): job_id فوراً ثم الاستعلام عن النتيجة
+    # حالة كل مهمة ملف JSON في هذا المجلد، فيجيب عنها أي عامل يشارك المجلد
+    PREDICT_JOB_FOLDER = os.getenv('PREDICT_JOB_FOLDER', os.path.join(BASE_DIR, 'jobs'))
+    PREDICT_JOB_WORKERS = int(os.getenv('PREDICT_JOB_WORKERS', 2))
+    PREDICT_JOB_MAX_QUEUE = int(os.getenv('PREDICT_JOB_MAX_QUEUE', 100))
+    PREDICT_JOB_TTL = float(os.getenv('PREDICT_JOB_TTL', 3600))
+    # مهمة غير منتهية لم تتحدث خلال هذه المدة تُعتبر مفقودة (خرج العامل الذي يملكها)
+    PREDICT_JOB_STALE_SECONDS = float(os.getenv('PREDICT_JOB_STALE_SECONDS', 300))
+    # الحد الأقصى لـ ?wait= (أقل من مهلة البروكسي)
+    PREDICT_JOB_MAX_WAIT = float(os.getenv('PREDICT_JOB_MAX_WAIT', 20))
@@ -0,0 +1,77 @@
+import gc
+import os
+import re
+import shutil
+import tempfile
+
+# ---------------------------------------------------
+# التشغيل: gunicorn -c gunicorn.conf.py app:app   (من داخل مجلد backend)
+# خدمة الاستدلال المنفصلة (INFERENCE_TIER=remote):
+#   GUNICORN_BIND=unix:/tmp/plantpal-inference.sock WEB_CONCURRENCY=1 gunicorn -c gunicorn.conf.py inference_app:app
+# ---------------------------------------------------
+bind = os.getenv('GUNICORN_BIND', f"0.0.0.0:{os.getenv('PORT', '5000')}")
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+# عدة خيوط لكل عامل حتى يستطيع MicroBatcher تجميع الطلبات المتزامنة، وأكثر من
+# ADMISSION_MAX_IN_FLIGHT + ADMISSION_MAX_QUEUE حتى يصل الفائض إلى التحكم في القبول
+# فيُرفض فوراً بدلاً من الانتظار في طابور gunicorn (نفس القيم الافتراضية في config.py)
+_admission_slots = (int(os.getenv('ADMISSION_MAX_IN_FLIGHT', os.getenv('BATCH_MAX_SIZE', 16)))
+                    + int(os.getenv('ADMISSION_MAX_QUEUE', 8)))
+# 8 خيوط إضافية للمسارات الأخرى (السجل، الصور، الصحة)
+threads = int(os.getenv('GUNICORN_THREADS', _admission_slots + 8))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+
+# ---------------------------------------------------
+# وضع ما قبل التفرّع (GUNICORN_PRELOAD=True INFERENCE_BACKEND=tflite)
+# ---------------------------------------------------
+# يُستورد التطبيق مرة واحدة في العملية الرئيسية وتُقرأ أوزان tflite فيها، فيتشارك
+# العمال نفس صفحات الذاكرة (copy-on-write) بدلاً من نسخة لكل عامل.
+# TensorFlow لا يدعم التفرّع بعد تهيئته، لذلك لا يُحمَّل إلا داخل كل عامل (post_fork)
+preload_app = os.getenv('GUNICORN_PRELOAD', 'False') == 'True'
+
+# ---------------------------------------------------
+# مقاييس Prometheus المشتركة بين العمليات
+# ---------------------------------------------------
+# يجب ضبط المتغير قبل أن يستورد أي عامل prometheus_client
+# مجلد لكل عنوان ربط حتى لا يمسح تشغيل خدمة الاستدلال مقاييس خدمة الـ API
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(
+    tempfile.gettempdir(), 'plantpal-prometheus-' + re.sub(r'\W+', '_', bind).strip('_')))
+
+
+def _reset_metrics_dir():
+    # حذف ملفات المقاييس من التشغيل السابق
+    path = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+# مع preload_app يُستورد التطبيق (ويكتب مقاييسه) قبل on_starting
+if preload_app:
+    _reset_metrics_dir()
+
+
+def on_starting(server):
+    if not preload_app:
+        _reset_metrics_dir()
+
+
+def when_ready(server):
+    if preload_app:
+        # نقل كائنات العملية الرئيسية خارج جامع القمامة حتى لا يلمس صفحاتها المشتركة
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        from backend.utils.model_registry import after_fork
+        after_fork()
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def worker_exit(server, worker):
+    # كتابة سجلات الفحص المؤجلة قبل خروج العامل (إيقاف سلس)
+    from backend.utils.write_behind import flush_all
+    flush_all()
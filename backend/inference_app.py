@@ -0,0 +1,62 @@
+import os
+import sys
+import types
+from flask import Flask, Response, jsonify
+
+# ---------------------------------------------------
+# 1. إصلاح مسارات الاستيراد (نفس خدعة app.py)
+# ---------------------------------------------------
+current_dir = os.path.dirname(os.path.abspath(__file__))
+if current_dir not in sys.path:
+    sys.path.insert(0, current_dir)
+
+if 'backend' not in sys.modules:
+    backend_module = types.ModuleType('backend')
+    backend_module.__path__ = [current_dir]
+    sys.modules['backend'] = backend_module
+
+from backend.config import Config
+from backend.routes.inference import inference_bp
+from backend.utils.metrics import render_metrics, instrument_app
+from backend.utils.model_registry import model_state, start_warmup
+
+
+# ---------------------------------------------------
+# 2. خدمة الاستدلال (TensorFlow + الموديل فقط، بدون قاعدة بيانات أو JWT)
+#   GUNICORN_BIND=unix:/tmp/plantpal-inference.sock WEB_CONCURRENCY=1 \
+#       gunicorn -c gunicorn.conf.py inference_app:app
+# وعمال الـ API يعملون بـ INFERENCE_TIER=remote INFERENCE_URL=unix:///tmp/plantpal-inference.sock
+# ---------------------------------------------------
+def create_inference_app():
+    app = Flask(__name__)
+    app.config.from_object(Config)
+
+    instrument_app(app)
+    app.register_blueprint(inference_bp, url_prefix="/internal")
+
+    if Config.MODEL_BACKGROUND_LOAD:
+        start_warmup()
+
+    @app.route("/internal/health")
+    def health_check():
+        return jsonify({"status": "healthy"}), 200
+
+    # 503 حتى يصبح الموديل جاهزاً ومسخّناً؛ يبدأ التحميل في الخلفية إذا لزم دون أن ينتظره
+    @app.route("/internal/ready")
+    def readiness_check():
+        state = model_state()
+        if state != 'ready':
+            start_warmup(background=True)
+        return jsonify({"status": state}), 200 if state == 'ready' else 503
+
+    @app.route("/metrics")
+    def metrics():
+        body, content_type = render_metrics()
+        return Response(body, mimetype=content_type)
+
+    return app
+
+app = create_inference_app()
+
+if __name__ == "__main__":
+    app.run(host="127.0.0.1", port=5001, threaded=True)
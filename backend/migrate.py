@@ -0,0 +1,40 @@
+import sys
+import argparse
+
+from backend.utils.db import DatabaseUnavailable
+from backend.utils.migrations import migrate, status
+
+
+# ---------------------------------------------------
+# ترحيل مخطط قاعدة البيانات (مرة واحدة لكل نشر، وليس عند تشغيل كل عامل)
+#   python -m backend.migrate            تطبيق كل الترحيلات المعلقة
+#   python -m backend.migrate status     عرض الترحيلات المطبقة والمعلقة
+#   python -m backend.migrate up --target 3 --dry-run
+# ---------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply versioned MySQL schema migrations")
+    parser.add_argument('command', nargs='?', choices=('up', 'status'), default='up')
+    parser.add_argument('--target', type=int, default=None, help="stop after this version")
+    parser.add_argument('--dry-run', action='store_true', help="list pending migrations without applying them")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == 'status':
+            for version, description, applied in status():
+                print(f"{'✅' if applied else '⏳'} {version:03d} {description}")
+            return 0
+
+        applied = migrate(target=args.target, dry_run=args.dry_run)
+    except DatabaseUnavailable as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+
+    if args.dry_run:
+        print(f"Pending: {applied or 'none'}")
+    elif not applied:
+        print("✅ Schema is up to date")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,45 +4,10 @@ import bcrypt
 import jwt
 import datetime
 from backend.config import Config
+from backend.utils.db import get_db_connection, DatabaseUnavailable  # اتصال موحد ومقاس الزمن (انظر /metrics)
 
 auth_bp = Blueprint('auth', __name__)
 
-# دالة الاتصال بقاعدة البيانات الجديدة (MySQL)
-def get_db_connection():
-    try:
-        conn = mysql.connector.connect(
-            host=Config.MYSQL_HOST,
-            user=Config.MYSQL_USER,
-            password=Config.MYSQL_PASSWORD,
-            database=Config.MYSQL_DB,
-            port=Config.MYSQL_PORT
-        )
-        return conn
-    except mysql.connector.Error as err:
-        print(f"❌ Database Connection Error: {err}")
-        return None
-
-# إنشاء جدول المستخدمين إذا لم يكن موجوداً (لأن القاعدة الجديدة فارغة)
-def init_users_table():
-    conn = get_db_connection()
-    if conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                username VARCHAR(255) UNIQUE NOT NULL,
-                password VARCHAR(255) NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        conn.commit()
-        cursor.close()
-        conn.close()
-        print("✅ Users table checked/created successfully.")
-
-# استدعاء الدالة لمرة واحدة عند تشغيل الملف لضمان وجود الجدول
-init_users_table()
-
 # --------------------------
 # 1. تسجيل مستخدم جديد (Register)
 # --------------------------
@@ -59,7 +24,8 @@ def register():
 
     conn = get_db_connection()
     if not conn:
-        return jsonify({"error": "Database connection failed"}), 500
+        # لا نخزّن الحسابات محلياً (تفرد اسم المستخدم يحتاج MySQL): 503 مع Retry-After
+        raise DatabaseUnavailable("Database connection failed")
 
     cursor = conn.cursor()
     try:
@@ -88,7 +54,8 @@ def login():
 
     conn = get_db_connection()
     if not conn:
-        return jsonify({"error": "Database connection failed"}), 500
+        # الحسابات في MySQL فقط ولا يمكن التحقق من كلمة المرور بدونها: 503 مع Retry-After
+        raise DatabaseUnavailable("Database connection failed")
 
     cursor = conn.cursor(dictionary=True) # dictionary=True لترجع النتائج كـ JSON object
     try:
@@ -1,74 +1,436 @@
-from flask import Blueprint, request, jsonify
+import io
+import csv
+import json
+import time
+import threading
+import uuid
+import mysql.connector
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from backend.utils.db import get_db_connection  # استدعاء الاتصال من الملف الموحد
+from backend.config import Config
+from backend.utils.db import get_db_connection, DatabaseBusy, DatabaseUnavailable, is_outage  # استدعاء الاتصال من الملف الموحد
+from backend.utils.etags import version_etag
+from backend.utils.history_cache import HistoryCache, VersionStamps
+from backend.utils.pagination import encode_cursor, decode_cursor, parse_date_bound
+from backend.utils.spool import WriteSpool, PermanentWriteError
+from backend.utils.write_behind import WriteBehindBuffer
 
 disease_bp = Blueprint('disease', __name__)
 
 # ---------------------------------------------------
-# 1. حفظ نتيجة الفحص (Save Result)
+# 0. كتابة سجلات الفحص (مباشرة، مؤجلة، أو في الملف المحلي أثناء الانقطاع)
 # ---------------------------------------------------
-@disease_bp.route('/save_result', methods=['POST'])
-@jwt_required()
-def save_result():
-    try:
-        user_id = get_jwt_identity()  # الحصول على ID المستخدم من التوكن
-        data = request.json
-        
-        disease_name = data.get('disease_name')
-        confidence = data.get('confidence')
-        image_path = data.get('image_path')
+# record_id فريد لكل سجل: إعادة إدخال نفس السجل من الملف المحلي لا تكرر الصف
+INSERT_HISTORY = """
+    INSERT INTO history (record_id, user_id, disease_name, confidence, image_path, date)
+    VALUES (%s, %s, %s, %s, %s, FROM_UNIXTIME(%s))
+    ON DUPLICATE KEY UPDATE record_id = record_id
+"""
 
-        if not disease_name or not image_path:
-            return jsonify({"error": "Missing data"}), 400
 
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({"error": "Database connection failed"}), 500
+def validate_result(item):
+    """ترجع (disease_name, confidence, image_path) أو رسالة الخطأ لهذا العنصر"""
+    if not isinstance(item, dict):
+        return None, "Item must be an object"
+    disease_name = item.get('disease_name')
+    image_path = item.get('image_path')
+    if not disease_name or not image_path:
+        return None, "Missing data"
+    confidence = item.get('confidence')
+    if confidence is not None:
+        try:
+            confidence = float(confidence)
+        except (TypeError, ValueError):
+            return None, "Invalid confidence"
+    return (disease_name, confidence, image_path), None
+
+
+def new_history_row(user_id, values):
+    """صف جاهز للإدخال: (record_id, user_id, disease_name, confidence, image_path, وقت القبول)"""
+    return (str(uuid.uuid4()), user_id, *values, time.time())
+
 
+def insert_history_rows(rows):
+    """إدخال الصفوف في معاملة واحدة (آمن عند التكرار بفضل record_id)"""
+    conn = get_db_connection()
+    if not conn:
+        raise DatabaseUnavailable("Database connection failed")
+    try:
         cursor = conn.cursor()
-        
-        # MySQL Query (نستخدم %s بدلاً من ?)
-        query = """
-            INSERT INTO history (user_id, disease_name, confidence, image_path)
-            VALUES (%s, %s, %s, %s)
-        """
-        cursor.execute(query, (user_id, disease_name, confidence, image_path))
-        
+        # executemany يحوّل INSERT ... VALUES إلى إدخال واحد متعدد الصفوف
+        cursor.executemany(INSERT_HISTORY, rows)
         conn.commit()
         cursor.close()
+        # صفحات السجل المخزنة لهؤلاء المستخدمين لم تعد صحيحة (في كل العمال عبر الختم)
+        for user_id in {row[1] for row in rows}:
+            HISTORY_CACHE.invalidate(user_id)
+            try:
+                HISTORY_STAMPS.bump(user_id)
+            except OSError as e:
+                # الصف محفوظ؛ العمال الآخرون يرونه بعد انتهاء HISTORY_CACHE_TTL
+                print(f"⚠️ Could not bump history stamp for user {user_id}: {e}")
+    except (mysql.connector.errors.IntegrityError, mysql.connector.errors.DataError) as e:
+        # مثلاً مستخدم محذوف: لن ينجح الإدخال مهما أعدنا المحاولة
+        raise PermanentWriteError(str(e)) from e
+    finally:
+        # close() تلغي المعاملة غير المكتملة قبل إعادة الاتصال إلى المجمّع
         conn.close()
 
+
+# صفحات السجل المقروءة مؤخراً لكل مستخدم (تُبطل عند أي إدخال لذلك المستخدم)
+HISTORY_CACHE = HistoryCache(
+    max_entries=Config.HISTORY_CACHE_SIZE,
+    ttl_seconds=Config.HISTORY_CACHE_TTL
+)
+
+# ختم إصدار لكل مستخدم في مجلد مشترك بين العمال: يتغير مع كل إدخال فيبطل الصفحات المخزنة دون سؤال MySQL
+HISTORY_STAMPS = VersionStamps(Config.HISTORY_STAMP_FOLDER)
+
+
+# الملف المحلي (SQLite WAL) للسجلات أثناء انقطاع MySQL، يُفرَّغ تلقائياً عند عودته
+HISTORY_SPOOL = WriteSpool(
+    Config.SPOOL_PATH,
+    insert_history_rows,
+    batch_size=Config.SPOOL_REPLAY_BATCH,
+    poll_seconds=Config.SPOOL_POLL_SECONDS,
+    max_backoff=Config.SPOOL_MAX_BACKOFF,
+    name='history-spool'
+)
+
+
+def persist_history_rows(rows):
+    """إدخال مباشر، أو حفظ محلي إذا كان MySQL غير متاح. ترجع 'saved' أو 'spooled'"""
+    try:
+        insert_history_rows(rows)
+        return 'saved'
+    except Exception as e:
+        if not (Config.SPOOL_ENABLED and is_outage(e)):
+            raise
+        print(f"⚠️ MySQL unavailable, spooling {len(rows)} history records: {e}")
+        HISTORY_SPOOL.append(rows)
+        return 'spooled'
+
+
+# الكتابة المؤجلة: save_result يرد فوراً ويجمع الخيط الخلفي السجلات في إدخال واحد
+HISTORY_WRITER = WriteBehindBuffer(
+    insert_history_rows,
+    max_batch_size=Config.WRITE_BEHIND_BATCH_SIZE,
+    max_wait_ms=Config.WRITE_BEHIND_FLUSH_MS,
+    max_queue=Config.WRITE_BEHIND_MAX_QUEUE,
+    name='history-writer',
+    on_failure=HISTORY_SPOOL.append if Config.SPOOL_ENABLED else None
+)
+
+
+@disease_bp.before_app_request
+def start_spool_replayer():
+    # يفرغ ما تبقى في الملف المحلي من تشغيل سابق (مرة لكل عملية)
+    if Config.SPOOL_ENABLED:
+        HISTORY_SPOOL.start()
+
+
+# ---------------------------------------------------
+# 1. حفظ نتيجة الفحص (Save Result)
+# ---------------------------------------------------
+@disease_bp.route('/save_result', methods=['POST'])
+@jwt_required()
+def save_result():
+    try:
+        user_id = get_jwt_identity()  # الحصول على ID المستخدم من التوكن
+        values, error = validate_result(request.json)
+        if error:
+            return jsonify({"error": error}), 400
+        row = new_history_row(user_id, values)
+
+        # الوضع المؤجل: الرد دون انتظار MySQL (يعود للإدخال المباشر إذا امتلأ الطابور)
+        if Config.WRITE_BEHIND_ENABLED and HISTORY_WRITER.submit(row):
+            return jsonify({"message": "Result accepted", "queued": True}), 202
+
+        if persist_history_rows([row]) == 'spooled':
+            return jsonify({"message": "Result accepted", "queued": True}), 202
         return jsonify({"message": "Result saved successfully"}), 201
 
+    except DatabaseBusy:
+        raise
     except Exception as e:
         print(f"Error saving result: {e}")
         return jsonify({"error": "Failed to save result"}), 500
 
+# ---------------------------------------------------
+# 1.1 حفظ عدة نتائج دفعة واحدة (Bulk Save Results)
+# ---------------------------------------------------
+@disease_bp.route('/save_results', methods=['POST'])
+@jwt_required()
+def save_results():
+    """حفظ مصفوفة نتائج بإدخال واحد متعدد الصفوف داخل معاملة واحدة، مع حالة لكل عنصر"""
+    data = request.get_json(silent=True)
+    items = data.get('results') if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "Expected a non-empty list of results"}), 400
+    if len(items) > Config.SAVE_RESULTS_MAX_ITEMS:
+        return jsonify({"error": f"Too many results (max {Config.SAVE_RESULTS_MAX_ITEMS})"}), 413
+
+    user_id = get_jwt_identity()
+    statuses, rows = [], []
+    for index, item in enumerate(items):
+        values, error = validate_result(item)
+        if error:
+            statuses.append({'index': index, 'success': False, 'error': error})
+        else:
+            statuses.append({'index': index, 'success': True})
+            rows.append(new_history_row(user_id, values))
+
+    outcome = None
+    if rows:
+        try:
+            outcome = persist_history_rows(rows)
+        except DatabaseBusy:
+            raise
+        except Exception as e:
+            print(f"Error saving results: {e}")
+            return jsonify({"error": "Failed to save results"}), 500
+
+    saved = len(rows)
+    status_code = 400 if not saved else 202 if outcome == 'spooled' else 201
+    return jsonify({
+        "saved": saved,
+        "failed": len(items) - saved,
+        "queued": outcome == 'spooled',
+        "results": statuses
+    }), status_code
+
 # ---------------------------------------------------
 # 2. جلب سجل المستخدم (Get User History)
 # ---------------------------------------------------
+# الأعمدة التي تحتاجها الواجهة فقط (بدلاً من SELECT *)
+HISTORY_COLUMNS = "id, disease_name, confidence, image_path, date"
+
+
+def parse_history_filters(args):
+    """فلاتر السجل من معاملات الطلب: disease و from و to (ISO) و cursor"""
+    cursor = args.get('cursor')
+    return {
+        'disease': args.get('disease') or None,
+        'from': parse_date_bound(args.get('from')),
+        'to': parse_date_bound(args.get('to'), end=True),
+        'after': decode_cursor(cursor) if cursor else None,
+    }
+
+
+def build_history_query(user_id, filters, limit=None):
+    """استعلام SELECT للسجل مرتباً تنازلياً على (date, id) ليستفيد من الفهرس idx_history_user_date_id"""
+    clauses, params = ["user_id = %s"], [user_id]
+    if filters['disease']:
+        clauses.append("disease_name = %s")
+        params.append(filters['disease'])
+    if filters['from']:
+        clauses.append("date >= %s")
+        params.append(filters['from'])
+    if filters['to']:
+        clauses.append("date < %s")
+        params.append(filters['to'])
+    if filters['after']:
+        # Keyset: الصفوف التي تأتي بعد آخر صف في الصفحة السابقة
+        after_date, after_id = filters['after']
+        clauses.append("(date < %s OR (date = %s AND id < %s))")
+        params.extend([after_date, after_date, after_id])
+
+    query = f"SELECT {HISTORY_COLUMNS} FROM history WHERE {' AND '.join(clauses)} ORDER BY date DESC, id DESC"
+    if limit is not None:
+        query += " LIMIT %s"
+        params.append(limit)
+    return query, params
+
+
+# إصدار سجل المستخدم: يتغير مع كل إدخال أو حذف (يُقرأ من الفهرس فقط)
+HISTORY_VERSION_QUERY = "SELECT MAX(id) AS last_id, COUNT(*) AS total FROM history WHERE user_id = %s"
+
+
+def history_response(body, next_cursor, etag):
+    response = Response(body, mimetype='application/json')
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    # no-cache: المتصفح يعيد التحقق دائماً، ويأخذ 304 إذا لم تتغير الصفحة
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+
 @disease_bp.route('/history', methods=['GET'])
 @jwt_required()
 def get_user_history():
+    """صفحة من السجل (قائمة كما في السابق) ومؤشر الصفحة التالية في الترويسة X-Next-Cursor"""
+    try:
+        limit = int(request.args.get('limit', Config.HISTORY_PAGE_SIZE))
+        filters = parse_history_filters(request.args)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid query parameter: {e}"}), 400
+    limit = max(1, min(limit, Config.HISTORY_MAX_PAGE_SIZE))
+
+    user_id = get_jwt_identity()
+    query_key = (limit, filters['disease'], filters['from'], filters['to'], filters['after'])
+    conn = None
     try:
-        user_id = get_jwt_identity()
-        
+        # الصفحة المخزنة صالحة ما دام ختم المستخدم لم يتغير: لا اتصال بقاعدة البيانات إطلاقاً
+        # (make_conditional ترد 304 إذا طابق If-None-Match الـ ETag المخزن)
+        stamp = HISTORY_STAMPS.read(user_id)
+        page = HISTORY_CACHE.get(user_id, query_key, stamp)
+        if page is not None:
+            return history_response(*page)
+
+        generation = HISTORY_CACHE.generation(user_id)
         conn = get_db_connection()
         if not conn:
             return jsonify({"error": "Database connection failed"}), 500
 
         # dictionary=True مهمة جداً لترجع البيانات بشكل {key: value}
         cursor = conn.cursor(dictionary=True)
-        
-        query = "SELECT * FROM history WHERE user_id = %s ORDER BY date DESC"
-        cursor.execute(query, (user_id,))
-        results = cursor.fetchall()
 
+        # ETag من إصدار السجل: إذا لم يتغير منذ آخر مرة نرد 304 دون جلب الصفحة
+        cursor.execute(HISTORY_VERSION_QUERY, (user_id,))
+        version = cursor.fetchone()
+        etag = version_etag(user_id, version['last_id'], version['total'], *query_key)
+        if request.if_none_match.contains(etag):
+            cursor.close()
+            return history_response(b'', None, etag)
+
+        # نجلب صفاً إضافياً لمعرفة وجود صفحة تالية
+        query, params = build_history_query(user_id, filters, limit + 1)
+        cursor.execute(query, params)
+        results = cursor.fetchall()
         cursor.close()
-        conn.close()
 
-        return jsonify(results), 200
+        has_more = len(results) > limit
+        results = results[:limit]
+        next_cursor = encode_cursor(results[-1]['date'], results[-1]['id']) if has_more else None
 
+        page = (jsonify(results).get_data(), next_cursor, etag)
+        # الختم المقروء قبل الاستعلام: أي إدخال أثناءه يغيّر الختم فلا تُستخدم هذه الصفحة
+        HISTORY_CACHE.put(user_id, query_key, page, generation, stamp)
+        return history_response(*page)
+
+    except DatabaseBusy:
+        raise
     except Exception as e:
         print(f"Error fetching history: {e}")
         return jsonify({"error": "Failed to fetch history"}), 500
+    finally:
+        if conn:
+            conn.close()
+
+
+# ---------------------------------------------------
+# 3. تصدير السجل كاملاً (Export History: CSV / NDJSON)
+# ---------------------------------------------------
+EXPORT_FIELDS = ['id', 'disease_name', 'confidence', 'image_path', 'date', 'cursor']
+EXPORT_MIMETYPES = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+
+def export_row(row):
+    """صف جاهز للتصدير مع مؤشر يسمح باستئناف التنزيل بعده (?cursor=)"""
+    return {
+        'id': row['id'],
+        'disease_name': row['disease_name'],
+        'confidence': row['confidence'],
+        'image_path': row['image_path'],
+        'date': row['date'].isoformat() if row['date'] else None,
+        'cursor': encode_cursor(row['date'], row['id']),
+    }
+
+
+def format_export_chunk(rows, fmt, header=False):
+    if fmt == 'ndjson':
+        return ''.join(json.dumps(export_row(row)) + '\n' for row in rows)
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    if header:
+        writer.writeheader()
+    writer.writerows(export_row(row) for row in rows)
+    return buffer.getvalue()
+
+
+# كل تصدير يحجز اتصالاً من المجمّع طوال مدة النقل، فنحدّ عددها المتزامن في كل عامل
+EXPORT_SLOTS = threading.BoundedSemaphore(max(1, Config.HISTORY_EXPORT_MAX_CONCURRENT))
+
+
+@disease_bp.route('/history/export', methods=['GET'])
+@jwt_required()
+def export_history():
+    """بث السجل صفاً صفاً من مؤشر غير مخزّن (ذاكرة ثابتة مهما كان عدد الصفوف)"""
+    fmt = request.args.get('format', 'csv').lower()
+    if fmt not in EXPORT_MIMETYPES:
+        return jsonify({"error": "format must be csv or ndjson"}), 400
+    try:
+        filters = parse_history_filters(request.args)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid query parameter: {e}"}), 400
+
+    headers = {
+        'Content-Disposition': f'attachment; filename="history.{fmt}"',
+        # منع التخزين المؤقت في الوكيل العكسي حتى تصل الدفعات فوراً
+        'X-Accel-Buffering': 'no'
+    }
+    if request.method == 'HEAD':
+        # لا جسم للرد: لا نحجز اتصالاً ولا نشغّل الاستعلام
+        return Response(mimetype=EXPORT_MIMETYPES[fmt], headers=headers)
+
+    if not EXPORT_SLOTS.acquire(blocking=False):
+        response = jsonify({"error": "Too many exports in progress, please retry"})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+
+    user_id = get_jwt_identity()
+    try:
+        conn = get_db_connection()
+    except BaseException:
+        EXPORT_SLOTS.release()
+        raise
+    if not conn:
+        EXPORT_SLOTS.release()
+        return jsonify({"error": "Database connection failed"}), 500
+
+    try:
+        # buffered=False: الصفوف تُقرأ من الخادم عند الطلب بدلاً من تحميلها كلها
+        cursor = conn.cursor(dictionary=True, buffered=False)
+        query, params = build_history_query(user_id, filters)
+        cursor.execute(query, params)
+    except Exception as e:
+        conn.invalidate()
+        EXPORT_SLOTS.release()
+        print(f"Error exporting history: {e}")
+        return jsonify({"error": "Failed to export history"}), 500
+
+    state = {'finished': False, 'released': False}
+
+    def release():
+        # مرة واحدة: عند نهاية المولّد، أو عند إغلاق الرد إذا لم يبدأ المولّد أصلاً
+        # (انقطاع العميل قبل أول دفعة) فلا يبقى الاتصال محجوزاً
+        if state['released']:
+            return
+        state['released'] = True
+        try:
+            if state['finished']:
+                cursor.close()
+                conn.close()
+            else:
+                # انقطع العميل أو حدث خطأ: بقية النتائج غير مقروءة على الاتصال
+                conn.invalidate()
+        finally:
+            EXPORT_SLOTS.release()
+
+    def generate():
+        try:
+            header = True
+            while True:
+                rows = cursor.fetchmany(Config.HISTORY_EXPORT_FETCH_SIZE)
+                if not rows and not header:
+                    break
+                yield format_export_chunk(rows, fmt, header=header)
+                header = False
+            state['finished'] = True
+        finally:
+            release()
+
+    response = Response(stream_with_context(generate()), mimetype=EXPORT_MIMETYPES[fmt], headers=headers)
+    response.call_on_close(release)
+    return response
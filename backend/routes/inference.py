@@ -0,0 +1,46 @@
+from flask import Blueprint, request, jsonify, g
+from backend.utils import inference_engine
+from backend.utils.inference_protocol import (
+    BLOB_SIZES_HEADER, MODE_HEADER, ModelUnavailable, decode_request, encode_outcomes,
+)
+from backend.utils.timing import StageTimer
+
+# ---------------------------------------------------
+# خدمة الاستدلال الداخلية (تعمل في عملية منفصلة: backend/inference_app.py)
+# عمال الـ API يرسلون الصور هنا عندما INFERENCE_TIER=remote
+# ---------------------------------------------------
+inference_bp = Blueprint('inference', __name__)
+
+
+@inference_bp.before_request
+def start_stage_timer():
+    g.stage_timer = StageTimer()
+
+
+@inference_bp.after_request
+def report_stage_timer(response):
+    timer = g.pop('stage_timer', None)
+    if timer is not None:
+        response.headers['Server-Timing'] = timer.server_timing_header()
+        timer.report(request.endpoint or 'unknown', response.status_code)
+    return response
+
+
+@inference_bp.route('/infer', methods=['POST'])
+def infer():
+    timer = g.stage_timer
+    try:
+        with timer.stage('read'):
+            blobs = decode_request(request.get_data(), request.headers.get(BLOB_SIZES_HEADER))
+    except ValueError as e:
+        return jsonify({'error': f"Bad inference request: {e}"}), 400
+
+    single = request.headers.get(MODE_HEADER) == 'single'
+    try:
+        outcomes = inference_engine.run_predictions(blobs, timer=timer, single=single)
+    except ModelUnavailable as e:
+        return jsonify({'status': e.status, 'detail': e.detail}), 503
+    except Exception as e:
+        print(f"Inference Error: {e}")
+        return jsonify({'error': f"Error running prediction: {str(e)}"}), 500
+    return jsonify(encode_outcomes(outcomes))
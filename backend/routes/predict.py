@@ -1,101 +1,235 @@
-import os
-import numpy as np
-import tensorflow as tf
-from flask import Blueprint, request, jsonify
-from PIL import Image
+from flask import Blueprint, request, jsonify, g, url_for
+from flask_jwt_extended import verify_jwt_in_request
 from backend.config import Config
+from backend.utils.admission import AdmissionController, Overloaded
+from backend.utils.inference_protocol import ModelUnavailable, InferenceTierUnavailable
+from backend.utils.jobs import JobQueue, FINISHED
+from backend.utils.timing import StageTimer
 
 # ملاحظة: لا نستورد utils.db هنا لأننا لا نحتاج قاعدة البيانات للتنبؤ حالياً
 predict_bp = Blueprint('predict', __name__)
 
 # -----------------------------------------------------------
-# 1. تحميل الموديل مرة واحدة فقط (Global Scope)
+# 1. محرك التنبؤ: داخل العملية (local) أو خدمة الاستدلال المنفصلة (remote)
 # -----------------------------------------------------------
-MODEL = None
-try:
-    model_path = os.path.join(Config.MODEL_PATH, 'model.weights.h5')
-    print(f"🔄 Loading model from: {model_path}")
-    
-    # تحميل الموديل
-    MODEL = tf.keras.models.load_model(model_path)
-    print("✅ Model loaded successfully (Global)")
-except Exception as e:
-    print(f"❌ Error loading model: {e}")
-
-# قائمة أسماء الأمراض (39 صنف)
-CLASS_NAMES = [
-    'Apple___Apple_scab', 'Apple___Black_rot', 'Apple___Cedar_apple_rust', 'Apple___healthy',
-    'Blueberry___healthy', 'Cherry_(including_sour)___Powdery_mildew', 'Cherry_(including_sour)___healthy',
-    'Corn_(maize)___Cercospora_leaf_spot Gray_leaf_spot', 'Corn_(maize)___Common_rust_',
-    'Corn_(maize)___Northern_Leaf_Blight', 'Corn_(maize)___healthy', 'Grape___Black_rot',
-    'Grape___Esca_(Black_Measles)', 'Grape___Leaf_blight_(Isariopsis_Leaf_Spot)', 'Grape___healthy',
-    'Orange___Haunglongbing_(Citrus_greening)', 'Peach___Bacterial_spot', 'Peach___healthy',
-    'Pepper,_bell___Bacterial_spot', 'Pepper,_bell___healthy', 'Potato___Early_blight',
-    'Potato___Late_blight', 'Potato___healthy', 'Raspberry___healthy', 'Soybean___healthy',
-    'Squash___Powdery_mildew', 'Strawberry___Leaf_scorch', 'Strawberry___healthy',
-    'Tomato___Bacterial_spot', 'Tomato___Early_blight', 'Tomato___Late_blight',
-    'Tomato___Leaf_Mold', 'Tomato___Septoria_leaf_spot', 'Tomato___Spider_mites Two-spotted_spider_mite',
-    'Tomato___Target_Spot', 'Tomato___Tomato_Yellow_Leaf_Curl_Virus', 'Tomato___Tomato_mosaic_virus',
-    'Tomato___healthy'
-]
-
-def prepare_image(image, target_size):
-    """تجهيز الصورة لتتناسب مع مدخلات الموديل"""
-    if image.mode != "RGB":
-        image = image.convert("RGB")
-    image = image.resize(target_size)
-    image = np.array(image) / 255.0
-    image = np.expand_dims(image, axis=0)
-    return image
+# في وضع remote لا يستورد عامل الـ API أي شيء من TensorFlow ولا يحمّل الموديل
+if Config.INFERENCE_TIER == 'remote':
+    from backend.utils.inference_client import RemoteInference
+    ENGINE = RemoteInference(Config.INFERENCE_URL, timeout=Config.INFERENCE_TIMEOUT)
+else:
+    from backend.utils import inference_engine as ENGINE
+
+
+# -----------------------------------------------------------
+# 2. قياس زمن كل مرحلة (Server-Timing + سجل منظم + /metrics)
+# -----------------------------------------------------------
+@predict_bp.before_request
+def start_stage_timer():
+    g.stage_timer = StageTimer()
+
+
+@predict_bp.after_request
+def report_stage_timer(response):
+    timer = g.pop('stage_timer', None)
+    if timer is not None:
+        response.headers['Server-Timing'] = timer.server_timing_header()
+        timer.report(request.endpoint or 'unknown', response.status_code)
+    return response
+
+
+# -----------------------------------------------------------
+# 3. التحكم في القبول: عدد محدود من طلبات التنبؤ الجارية والمنتظرة لكل عامل
+# -----------------------------------------------------------
+ADMISSION = AdmissionController(
+    max_in_flight=Config.ADMISSION_MAX_IN_FLIGHT,
+    max_queue=Config.ADMISSION_MAX_QUEUE,
+    priority_reserve=Config.ADMISSION_PRIORITY_RESERVE,
+    queue_timeout=Config.ADMISSION_QUEUE_TIMEOUT
+) if Config.ADMISSION_ENABLED else None
+
+# الطلبات الجارية هي مصدر صور الدفعة: حد أقل من BATCH_MAX_SIZE لا يملأ أي دفعة
+if ADMISSION is not None and Config.INFERENCE_TIER != 'remote' and Config.ADMISSION_MAX_IN_FLIGHT < Config.BATCH_MAX_SIZE:
+    print(f"⚠️ ADMISSION_MAX_IN_FLIGHT={Config.ADMISSION_MAX_IN_FLIGHT} caps micro-batches below "
+          f"BATCH_MAX_SIZE={Config.BATCH_MAX_SIZE}")
+
+ADMITTED_ENDPOINTS = {'predict.predict', 'predict.predict_batch'}
+
+
+def request_lane():
+    """priority للمستخدم المسجل (JWT صالح)، default للباقي بما فيهم التوكن غير الصالح"""
+    try:
+        return 'priority' if verify_jwt_in_request(optional=True) else 'default'
+    except Exception:
+        return 'default'
+
+
+@predict_bp.before_request
+def admit_prediction():
+    # قبل قراءة الصورة حتى لا يحجز الطلب المرفوض أي ذاكرة
+    if ADMISSION is None or request.endpoint not in ADMITTED_ENDPOINTS:
+        return
+    with g.stage_timer.stage('admission'):
+        g.admitted_at = ADMISSION.acquire(request_lane())
+
+
+@predict_bp.teardown_request
+def release_admission(error=None):
+    admitted_at = g.pop('admitted_at', None)
+    if admitted_at is not None:
+        ADMISSION.release(admitted_at)
+
+
+@predict_bp.errorhandler(Overloaded)
+def overloaded(error):
+    response = jsonify({'error': 'Server is busy, please retry', 'reason': error.reason})
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 503
+
+
+# -----------------------------------------------------------
+# 4. أخطاء الموديل وخدمة الاستدلال
+# -----------------------------------------------------------
+@predict_bp.errorhandler(ModelUnavailable)
+def model_unavailable(error):
+    # التفاصيل (مسارات الملفات على الخادم) للسجل فقط، والعميل يرى الحالة
+    print(f"❌ Model unavailable ({error.status}): {error.detail}")
+    return jsonify({
+        'error': 'Model not loaded on server',
+        'status': error.status
+    }), 503
+
+
+@predict_bp.errorhandler(InferenceTierUnavailable)
+def inference_tier_unavailable(error):
+    print(f"Inference tier error: {error}")
+    response = jsonify({'error': 'Prediction service unavailable, please retry'})
+    response.headers['Retry-After'] = '2'
+    return response, 503
+
 
 @predict_bp.route('/predict', methods=['POST'])
 def predict():
-    # التحقق من تحميل الموديل
-    if MODEL is None:
-        return jsonify({'error': 'Model not loaded on server'}), 500
-
-    if 'image' not in request.files:
+    timer = g.stage_timer
+    with timer.stage('parse'):
+        files = request.files
+    if 'image' not in files:
         return jsonify({'error': 'No image provided'}), 400
 
-    file = request.files['image']
+    file = files['image']
     if file.filename == '':
         return jsonify({'error': 'No selected file'}), 400
 
     try:
-        # 1. معالجة الصورة
-        image = Image.open(file)
-        processed_image = prepare_image(image, Config.IMG_SIZE)
-
-        # 2. التنبؤ
-        predictions = MODEL.predict(processed_image)
-        
-        # 3. استخراج النتائج
-        predicted_class_index = np.argmax(predictions[0])
-        confidence = float(np.max(predictions[0]))
-
-        # اسم المرض
-        if predicted_class_index < len(CLASS_NAMES):
-            predicted_class_name = CLASS_NAMES[predicted_class_index]
-        else:
-            predicted_class_name = "Unknown"
-
-        # التخمين الثاني
-        sorted_indices = np.argsort(predictions[0])[::-1]
-        second_class_index = sorted_indices[1]
-        second_confidence = float(predictions[0][second_class_index])
-        second_class_name = CLASS_NAMES[second_class_index] if second_class_index < len(CLASS_NAMES) else "Unknown"
-
-        # 4. إرجاع النتيجة
-        return jsonify({
-            'class': predicted_class_name,
-            'confidence': confidence,
-            'second_guess': second_class_name,
-            'second_confidence': second_confidence,
-            'description': f"Detected {predicted_class_name}.",
-            'treatment': "Consult an expert.",
-            'symptoms': "Visible spots on leaves."
-        })
+        with timer.stage('read'):
+            data = file.read()
+
+        # التنبؤ (يتم تجميعه مع الطلبات الأخرى في دفعة واحدة عبر PREDICT_BATCHER)
+        outcome, = ENGINE.run_predictions([data], timer=timer, single=True)
+        if isinstance(outcome, Exception):
+            raise outcome
 
+        result, source = outcome
+        response = jsonify(result)
+        response.headers['X-Cache'] = 'HIT' if source == 'cache' else 'MISS'
+        return response
+
+    except (ModelUnavailable, InferenceTierUnavailable):
+        raise
     except Exception as e:
         print(f"Prediction Error: {e}")
         return jsonify({'error': f"Error processing image: {str(e)}"}), 500
+
+
+@predict_bp.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    """تحليل عدة صور في طلب واحد مع الحفاظ على ترتيب المدخلات"""
+    timer = g.stage_timer
+    with timer.stage('parse'):
+        files = request.files.getlist('image')
+    if not files:
+        return jsonify({'error': 'No image provided'}), 400
+    if len(files) > Config.PREDICT_BATCH_MAX_IMAGES:
+        return jsonify({'error': f"Too many images (max {Config.PREDICT_BATCH_MAX_IMAGES})"}), 413
+
+    try:
+        # تمريرة واحدة عبر الموديل لكل الصور الصالحة
+        with timer.stage('read'):
+            blobs = [file.read() for file in files]
+        outcomes = ENGINE.run_predictions(blobs, timer=timer)
+    except (ModelUnavailable, InferenceTierUnavailable):
+        raise
+    except Exception as e:
+        print(f"Batch Prediction Error: {e}")
+        return jsonify({'error': f"Error running prediction: {str(e)}"}), 500
+
+    results = []
+    for index, (file, outcome) in enumerate(zip(files, outcomes)):
+        item = {'index': index, 'filename': file.filename}
+        if file.filename == '':
+            item.update(success=False, error='No selected file')
+        elif isinstance(outcome, Exception):
+            item.update(success=False, error=f"Error processing image: {str(outcome)}")
+        else:
+            item.update(success=True, **outcome[0])
+        results.append(item)
+
+    return jsonify({'results': results})
+
+
+# -----------------------------------------------------------
+# 5. التنبؤ غير المتزامن: job_id فوراً ثم الاستعلام (أو الانتظار الطويل) عن النتيجة
+# -----------------------------------------------------------
+def run_prediction_job(data):
+    outcome, = ENGINE.run_predictions([data], single=True)
+    if isinstance(outcome, Exception):
+        raise outcome
+    return outcome[0]
+
+
+JOBS = JobQueue(
+    run_prediction_job,
+    folder=Config.PREDICT_JOB_FOLDER,
+    workers=Config.PREDICT_JOB_WORKERS,
+    max_queue=Config.PREDICT_JOB_MAX_QUEUE,
+    ttl_seconds=Config.PREDICT_JOB_TTL,
+    stale_seconds=Config.PREDICT_JOB_STALE_SECONDS,
+    name='predict-jobs'
+)
+
+
+@predict_bp.route('/predict/jobs', methods=['POST'])
+def submit_prediction_job():
+    """رفع صورة وإرجاع job_id فوراً (202)، فلا يرتبط زمن الاتصال بزمن التنبؤ"""
+    timer = g.stage_timer
+    with timer.stage('parse'):
+        files = request.files
+    if 'image' not in files:
+        return jsonify({'error': 'No image provided'}), 400
+
+    file = files['image']
+    if file.filename == '':
+        return jsonify({'error': 'No selected file'}), 400
+
+    with timer.stage('read'):
+        data = file.read()
+    # الطابور ممتلئ => Overloaded => 503 مع Retry-After
+    job = JOBS.submit(data)
+
+    response = jsonify(job)
+    response.status_code = 202
+    response.headers['Location'] = url_for('predict.get_prediction_job', job_id=job['job_id'])
+    return response
+
+
+@predict_bp.route('/predict/jobs/<job_id>', methods=['GET'])
+def get_prediction_job(job_id):
+    """حالة المهمة ونتيجتها؛ ?wait=N ينتظر حتى N ثانية لانتهائها (Long polling)"""
+    wait = min(max(request.args.get('wait', 0, type=float), 0), Config.PREDICT_JOB_MAX_WAIT)
+    job = JOBS.wait(job_id, wait) if wait else JOBS.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found or expired'}), 404
+
+    response = jsonify(job)
+    if job['status'] not in FINISHED:
+        response.headers['Retry-After'] = '1'
+    return response
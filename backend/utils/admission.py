@@ -0,0 +1,114 @@
+import math
+import threading
+import time
+from collections import deque
+
+from backend.utils.metrics import (
+    ADMISSION_IN_FLIGHT,
+    ADMISSION_QUEUED,
+    ADMISSION_WAIT_SECONDS,
+    ADMISSION_REJECTED,
+)
+
+# Served in this order when a slot frees up
+LANES = ('priority', 'default')
+
+
+class Overloaded(Exception):
+    """Raised by AdmissionController.acquire() when a request is shed; carries a Retry-After estimate"""
+
+    def __init__(self, retry_after, reason):
+        super().__init__(f"Overloaded ({reason}), retry after {retry_after}s")
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class AdmissionController:
+    """Bound how many requests run at once and how many may wait for a slot.
+
+    Up to ``max_in_flight`` requests hold a slot; the next ``max_queue`` wait
+    at most ``queue_timeout`` seconds for one, and anything beyond that is
+    rejected immediately instead of piling up. The last ``priority_reserve``
+    queue places are kept for the priority lane, which is also served first.
+
+    Retry-After is the time the current backlog needs to drain, from an
+    exponentially weighted average of how long admitted requests hold a slot.
+    """
+
+    def __init__(self, max_in_flight=4, max_queue=16, priority_reserve=4, queue_timeout=5.0, smoothing=0.2):
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.max_queue = max(0, int(max_queue))
+        self.priority_reserve = min(self.max_queue, max(0, int(priority_reserve)))
+        self.queue_timeout = max(0.0, float(queue_timeout))
+        self.smoothing = smoothing
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._waiting = {lane: deque() for lane in LANES}
+        self._service_time = None
+
+    def _queued(self):
+        return sum(len(waiters) for waiters in self._waiting.values())
+
+    def _ahead_of(self, lane):
+        """Waiters that must be served before a new request in lane"""
+        if lane == 'priority':
+            return len(self._waiting['priority'])
+        return self._queued()
+
+    def _retry_after(self):
+        service_time = self._service_time if self._service_time is not None else 1.0
+        backlog = self._queued() + 1
+        return min(60, max(1, math.ceil(backlog * service_time / self.max_in_flight)))
+
+    def retry_after(self):
+        with self._lock:
+            return self._retry_after()
+
+    def acquire(self, lane='default'):
+        """Take a slot, waiting in lane's queue if needed; returns the admission time or raises Overloaded"""
+        with self._lock:
+            if self._in_flight < self.max_in_flight and not self._ahead_of(lane):
+                self._in_flight += 1
+                ADMISSION_IN_FLIGHT.inc()
+                return time.monotonic()
+
+            limit = self.max_queue if lane == 'priority' else self.max_queue - self.priority_reserve
+            if self._queued() >= limit:
+                ADMISSION_REJECTED.labels(lane, 'queue_full').inc()
+                raise Overloaded(self._retry_after(), 'queue_full')
+
+            waiter = threading.Event()
+            self._waiting[lane].append(waiter)
+            ADMISSION_QUEUED.labels(lane).inc()
+
+        enqueued_at = time.monotonic()
+        waiter.wait(self.queue_timeout)
+        with self._lock:
+            # release() may have handed us the slot right after the wait timed out
+            if not waiter.is_set():
+                self._waiting[lane].remove(waiter)
+                ADMISSION_QUEUED.labels(lane).dec()
+                ADMISSION_REJECTED.labels(lane, 'timeout').inc()
+                raise Overloaded(self._retry_after(), 'timeout')
+
+        admitted_at = time.monotonic()
+        ADMISSION_WAIT_SECONDS.labels(lane).observe(admitted_at - enqueued_at)
+        return admitted_at
+
+    def release(self, admitted_at):
+        """Give the slot taken at admitted_at to the next waiter, or free it"""
+        held = time.monotonic() - admitted_at
+        with self._lock:
+            if self._service_time is None:
+                self._service_time = held
+            else:
+                self._service_time += self.smoothing * (held - self._service_time)
+
+            for lane in LANES:
+                if self._waiting[lane]:
+                    # Hand the slot over directly so a new arrival cannot jump the queue
+                    self._waiting[lane].popleft().set()
+                    ADMISSION_QUEUED.labels(lane).dec()
+                    return
+            self._in_flight -= 1
+            ADMISSION_IN_FLIGHT.dec()
@@ -0,0 +1,120 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from backend.utils.metrics import (
+    INFERENCE_QUEUE_DEPTH,
+    INFERENCE_BATCH_SIZE,
+    INFERENCE_QUEUE_WAIT,
+    INFERENCE_BATCH_SECONDS,
+    INFERENCE_ERRORS,
+)
+
+
+class _PendingRequest:
+    __slots__ = ('sample', 'future', 'enqueued_at', 'started_at', 'finished_at')
+
+    def __init__(self, sample):
+        self.sample = sample
+        self.future = Future()
+        self.enqueued_at = time.monotonic()
+        self.started_at = None
+        self.finished_at = None
+
+
+class MicroBatcher:
+    """Group concurrent single-image requests into one model forward pass.
+
+    Requests that arrive within ``max_wait_ms`` of the first queued request
+    are stacked (up to ``max_batch_size``) and sent to ``predict_fn`` as one
+    batch. Each caller gets back its own row of the output.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=16, max_wait_ms=10):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def submit(self, sample, timeout=None, timer=None):
+        """Queue one preprocessed image (H, W, C) and block until its prediction is ready.
+
+        When a StageTimer is given, the time spent queued and in the batched
+        forward pass are recorded as the 'queue' and 'inference' stages.
+        """
+        self._ensure_worker()
+        request = _PendingRequest(sample)
+        self._queue.put(request)
+        INFERENCE_QUEUE_DEPTH.inc()
+        try:
+            return request.future.result(timeout=timeout)
+        finally:
+            if timer is not None and request.started_at is not None:
+                timer.add('queue', request.started_at - request.enqueued_at)
+                timer.add('inference', (request.finished_at or time.monotonic()) - request.started_at)
+
+    def _ensure_worker(self):
+        # The worker thread does not survive a fork (gunicorn), so start it
+        # lazily and restart it when we find ourselves in a new process.
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+            self._thread.start()
+
+    def _collect_batch(self):
+        first = self._queue.get()
+        batch = [first]
+        deadline = first.enqueued_at + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            INFERENCE_QUEUE_DEPTH.dec(len(batch))
+            self._process(batch)
+
+    def _process(self, batch):
+        started = time.monotonic()
+        for request in batch:
+            request.started_at = started
+            INFERENCE_QUEUE_WAIT.observe(started - request.enqueued_at)
+        INFERENCE_BATCH_SIZE.observe(len(batch))
+
+        try:
+            inputs = np.stack([request.sample for request in batch])
+            outputs = self.predict_fn(inputs)
+        except Exception as e:
+            INFERENCE_ERRORS.inc()
+            for request in batch:
+                request.finished_at = time.monotonic()
+                request.future.set_exception(e)
+            return
+        finally:
+            INFERENCE_BATCH_SECONDS.observe(time.monotonic() - started)
+
+        finished = time.monotonic()
+        for request, output in zip(batch, outputs):
+            request.finished_at = finished
+            request.future.set_result(output)
@@ -1,19 +1,228 @@
+import os
+import queue
+import threading
+import time
 import mysql.connector
 from backend.config import Config
+from backend.utils.metrics import (
+    DB_CONNECT_SECONDS, DB_CONNECT_ERRORS, DB_QUERY_SECONDS,
+    DB_POOL_CHECKOUT_SECONDS, DB_POOL_TIMEOUTS, DB_POOL_IN_USE, DB_POOL_IDLE, DB_POOL_SIZE
+)
+
+
+class DatabaseBusy(Exception):
+    """لم يتوفر اتصال في المجمّع خلال DB_POOL_TIMEOUT (يُحوَّل إلى 503 في app.py)"""
+
+
+class DatabaseUnavailable(Exception):
+    """تعذر الاتصال بخادم MySQL"""
+
+
+def is_outage(error):
+    """هل الخطأ انقطاع مؤقت في MySQL (يستحق التخزين المحلي وإعادة المحاولة) وليس خطأ في البيانات؟"""
+    return isinstance(error, (
+        DatabaseBusy,
+        DatabaseUnavailable,
+        mysql.connector.errors.OperationalError,
+        mysql.connector.errors.InterfaceError,
+    ))
+
+
+class TimedCursor:
+    """غلاف حول المؤشر يقيس زمن كل استعلام حسب نوعه (SELECT / INSERT / ...)"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    @staticmethod
+    def _operation(statement):
+        words = str(statement).split(None, 1)
+        return words[0].upper() if words else 'UNKNOWN'
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._cursor.execute(operation, params, *args, **kwargs)
+        finally:
+            DB_QUERY_SECONDS.labels(self._operation(operation)).observe(time.perf_counter() - started)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._cursor.executemany(operation, seq_params, *args, **kwargs)
+        finally:
+            DB_QUERY_SECONDS.labels(self._operation(operation)).observe(time.perf_counter() - started)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class TimedConnection:
+    """غلاف حول الاتصال يرجع مؤشرات مقاسة الزمن"""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self, *args, **kwargs):
+        return TimedCursor(self._conn.cursor(*args, **kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class PooledConnection(TimedConnection):
+    """اتصال مستعار من المجمّع: close() تعيده إلى المجمّع بدلاً من إغلاقه"""
+
+    def __init__(self, pool, conn):
+        super().__init__(conn)
+        self._pool = pool
+        self._returned = False
+
+    def close(self):
+        if not self._returned:
+            self._returned = True
+            self._pool.release(self._conn)
+
+    def invalidate(self):
+        """إغلاق الاتصال فعلياً بدلاً من إعادته (مثلاً عند بقاء نتائج غير مقروءة من مؤشر غير مخزّن)"""
+        if not self._returned:
+            self._returned = True
+            self._pool.discard(self._conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ConnectionPool:
+    """مجمّع اتصالات MySQL مشترك بين كل المسارات داخل العملية الواحدة.
+
+    - الحجم الأقصى DB_POOL_SIZE، والانتظار DB_POOL_TIMEOUT ثم DatabaseBusy
+    - فحص الاتصال (ping) عند الاستعارة إذا كان خاملاً أكثر من DB_POOL_PING_IDLE
+    - إعادة تدوير الاتصالات الخاملة لأكثر من DB_POOL_RECYCLE ثانية
+    """
+
+    def __init__(self, size, checkout_timeout, recycle_seconds, ping_idle_seconds):
+        self.size = max(1, int(size))
+        self.checkout_timeout = checkout_timeout
+        self.recycle_seconds = recycle_seconds
+        self.ping_idle_seconds = ping_idle_seconds
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        # الاتصالات لا تُشارك بين العمليات: نبدأ مجمّعاً جديداً بعد fork
+        self._pid = os.getpid()
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        DB_POOL_SIZE.set(self.size)
+
+    def _connect(self):
+        started = time.perf_counter()
+        try:
+            conn = mysql.connector.connect(
+                host=Config.MYSQL_HOST,
+                user=Config.MYSQL_USER,
+                password=Config.MYSQL_PASSWORD,
+                database=Config.MYSQL_DB,
+                port=Config.MYSQL_PORT,
+                connection_timeout=Config.DB_CONNECT_TIMEOUT
+            )
+        except mysql.connector.Error:
+            DB_CONNECT_ERRORS.inc()
+            raise
+        DB_CONNECT_SECONDS.observe(time.perf_counter() - started)
+        return conn
+
+    @staticmethod
+    def _discard(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _take_idle(self):
+        """أعد اتصالاً خاملاً سليماً أو None"""
+        while True:
+            try:
+                conn, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                return None
+            DB_POOL_IDLE.dec()
+            idle_for = time.monotonic() - last_used
+            if idle_for > self.recycle_seconds:
+                self._discard(conn)
+                continue
+            if idle_for > self.ping_idle_seconds:
+                try:
+                    conn.ping(reconnect=False)
+                except Exception:
+                    self._discard(conn)
+                    continue
+            return conn
+
+    def checkout(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset()
+
+        started = time.perf_counter()
+        if not self._slots.acquire(timeout=self.checkout_timeout):
+            DB_POOL_TIMEOUTS.inc()
+            raise DatabaseBusy(f"No database connection available within {self.checkout_timeout}s")
+        try:
+            conn = self._take_idle() or self._connect()
+        except Exception:
+            self._slots.release()
+            raise
+        DB_POOL_CHECKOUT_SECONDS.observe(time.perf_counter() - started)
+        DB_POOL_IN_USE.inc()
+        return PooledConnection(self, conn)
+
+    def release(self, conn):
+        DB_POOL_IN_USE.dec()
+        try:
+            # لا نعيد اتصالاً بمعاملة مفتوحة إلى المجمّع
+            if getattr(conn, 'in_transaction', True):
+                conn.rollback()
+            self._idle.put((conn, time.monotonic()))
+            DB_POOL_IDLE.inc()
+        except Exception:
+            self._discard(conn)
+        finally:
+            self._slots.release()
+
+    def discard(self, conn):
+        DB_POOL_IN_USE.dec()
+        try:
+            self._discard(conn)
+        finally:
+            self._slots.release()
+
+
+POOL = ConnectionPool(
+    size=Config.DB_POOL_SIZE,
+    checkout_timeout=Config.DB_POOL_TIMEOUT,
+    recycle_seconds=Config.DB_POOL_RECYCLE,
+    ping_idle_seconds=Config.DB_POOL_PING_IDLE
+)
+
 
 def get_db_connection():
     """
-    إنشاء اتصال جديد بقاعدة بيانات MySQL
+    استعارة اتصال من مجمّع MySQL المشترك (أغلقه بـ close() لإعادته)
+
+    ترجع None إذا تعذر الاتصال بالخادم، وترفع DatabaseBusy إذا كانت كل
+    الاتصالات مشغولة طوال DB_POOL_TIMEOUT.
     """
     try:
-        conn = mysql.connector.connect(
-            host=Config.MYSQL_HOST,
-            user=Config.MYSQL_USER,
-            password=Config.MYSQL_PASSWORD,
-            database=Config.MYSQL_DB,
-            port=Config.MYSQL_PORT
-        )
-        return conn
+        return POOL.checkout()
     except mysql.connector.Error as err:
         print(f"❌ Error connecting to MySQL: {err}")
         return None
@@ -0,0 +1,181 @@
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: every process sweeps on its own
+    fcntl = None
+
+# A hit refreshes the file's mtime at most this often; the mtime is the LRU
+# order every worker (and the sweeper) sees
+TOUCH_INTERVAL = 60
+# Eviction works on mtime buckets of this width instead of a per-file index
+_BUCKET_SECONDS = 60
+_LOCK_NAME = '.sweep.lock'
+# Temporary files younger than this may still be written by a worker
+_TMP_GRACE_SECONDS = 300
+
+
+class DiskLRU:
+    """Size cap for a directory of derived files shared by every worker process.
+
+    Nothing is indexed in memory and the request path never walks the tree:
+    ``record()`` adds a new file's bytes to a running estimate and ``touch()``
+    bumps a hit's mtime. A background sweeper re-counts the directory every
+    ``sweep_interval`` seconds (sooner once the estimate passes ``max_bytes``)
+    and, when over the cap, deletes the least recently used files until the
+    total is back under ``low_water * max_bytes``. The sweep takes two passes:
+    the first sums bytes per one-minute mtime bucket, the second removes the
+    files of the oldest buckets. A lock file makes one process at a time sweep.
+    """
+
+    def __init__(self, root, max_bytes, name='disk-lru', sweep_interval=60, low_water=0.9,
+                 bytes_gauge=None, evictions_counter=None):
+        self.root = root
+        self.max_bytes = int(max_bytes)
+        self.name = name
+        self.sweep_interval = sweep_interval
+        self.low_water = low_water
+        self.bytes_gauge = bytes_gauge
+        self.evictions_counter = evictions_counter
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._bytes = None
+        self._thread = None
+        self._pid = None
+
+    # -----------------------------------------------
+    # Request path (no directory walks)
+    # -----------------------------------------------
+    def record(self, path, size):
+        """Account for a file just written under root"""
+        self._ensure_sweeper()
+        with self._lock:
+            if self._bytes is not None:
+                self._bytes += size
+                over = self._bytes > self.max_bytes
+            else:
+                over = False
+        if over:
+            self._wake.set()
+
+    def touch(self, path):
+        """Mark a hit as recently used"""
+        self._ensure_sweeper()
+        try:
+            if time.time() - os.path.getmtime(path) > TOUCH_INTERVAL:
+                os.utime(path)
+        except OSError:
+            pass
+
+    # -----------------------------------------------
+    # Sweeper
+    # -----------------------------------------------
+    def _ensure_sweeper(self):
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._wake = threading.Event()
+            self._thread = threading.Thread(target=self._run, name=f"{self.name}-sweeper", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"⚠️ {self.name}: sweep failed: {e}")
+            self._wake.wait(self.sweep_interval)
+            self._wake.clear()
+
+    def _files(self):
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if name == _LOCK_NAME:
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield path, stat.st_mtime, stat.st_size
+
+    def _try_lock(self):
+        """Open and lock the sweep lock file; None when another process holds it"""
+        os.makedirs(self.root, exist_ok=True)
+        handle = open(os.path.join(self.root, _LOCK_NAME), 'a')
+        if fcntl is None:
+            return handle
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return None
+        return handle
+
+    def sweep(self):
+        """Re-count the directory and evict down to the low-water mark; returns the files removed"""
+        handle = self._try_lock()
+        if handle is None:
+            return 0
+        try:
+            buckets = {}
+            total = 0
+            for _, mtime, size in self._files():
+                bucket = int(mtime // _BUCKET_SECONDS)
+                buckets[bucket] = buckets.get(bucket, 0) + size
+                total += size
+
+            evicted = 0
+            if total > self.max_bytes:
+                # Older buckets go entirely; the cutoff bucket only until enough is freed
+                excess = total - int(self.max_bytes * self.low_water)
+                cutoff = None
+                for bucket in sorted(buckets):
+                    if buckets[bucket] >= excess:
+                        cutoff = bucket
+                        break
+                    excess -= buckets[bucket]
+                now = time.time()
+                for path, mtime, size in self._files():
+                    bucket = int(mtime // _BUCKET_SECONDS)
+                    if bucket > cutoff or (bucket == cutoff and excess <= 0):
+                        continue
+                    if path.endswith('.tmp') and now - mtime < _TMP_GRACE_SECONDS:
+                        continue
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        continue
+                    total -= size
+                    evicted += 1
+                    if bucket == cutoff:
+                        excess -= size
+        finally:
+            handle.close()
+
+        with self._lock:
+            self._bytes = total
+        if self.bytes_gauge is not None:
+            self.bytes_gauge.set(total)
+        if evicted and self.evictions_counter is not None:
+            self.evictions_counter.inc(evicted)
+        return evicted
+
+
+_SHARED = {}
+_SHARED_LOCK = threading.Lock()
+
+
+def shared_disk_lru(root, max_bytes, **kwargs):
+    """One DiskLRU per directory and process, for callers that build short-lived stores"""
+    with _SHARED_LOCK:
+        lru = _SHARED.get(root)
+        if lru is None:
+            lru = _SHARED[root] = DiskLRU(root, max_bytes, **kwargs)
+        lru.max_bytes = int(max_bytes)
+        return lru
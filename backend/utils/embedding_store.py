@@ -0,0 +1,138 @@
+import os
+import sys
+import json
+import tempfile
+
+import numpy as np
+
+from backend.config import Config
+from backend.utils.disk_lru import shared_disk_lru
+from backend.utils.metrics import (
+    EMBEDDING_STORE_HITS,
+    EMBEDDING_STORE_MISSES,
+    EMBEDDING_STORE_BYTES,
+    EMBEDDING_STORE_EVICTIONS,
+)
+
+
+class EmbeddingStore:
+    """On-disk store of pooled backbone embeddings keyed by image content hash.
+
+    Each embedding is a float16 ``.npy`` file (4 KB for 2048-d) under
+    ``<root>/<namespace>/<hash[:2]>/<hash>.npy``. Writes go through a temp file
+    and ``os.replace`` so concurrent workers never see a partial file. The
+    namespace identifies the backbone, so a head retrain keeps every entry
+    valid while a backbone change starts a fresh namespace. The folder is
+    capped at ``max_bytes`` (EMBEDDING_STORE_MAX_MB) by a background
+    ``DiskLRU`` sweeper; an evicted embedding is simply recomputed.
+    """
+
+    def __init__(self, root=None, namespace=None, max_bytes=None):
+        base = root or Config.EMBEDDING_FOLDER
+        self.root = os.path.join(base, namespace or Config.EMBEDDING_NAMESPACE)
+        if max_bytes is None:
+            max_bytes = Config.EMBEDDING_STORE_MAX_MB * 1024 * 1024
+        # One cap for the whole folder: retired backbone namespaces are never read again and age out first
+        self._lru = shared_disk_lru(
+            base, max_bytes, name='embedding-store',
+            bytes_gauge=EMBEDDING_STORE_BYTES, evictions_counter=EMBEDDING_STORE_EVICTIONS
+        ) if max_bytes else None
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], f"{key}.npy")
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(key))
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            embedding = np.load(path)
+        except (OSError, ValueError):
+            EMBEDDING_STORE_MISSES.inc()
+            return None
+        EMBEDDING_STORE_HITS.inc()
+        if self._lru is not None:
+            self._lru.touch(path)
+        return embedding.astype(np.float32)
+
+    def put(self, key, embedding):
+        path = self._path(key)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, np.asarray(embedding, dtype=np.float16))
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        if self._lru is not None:
+            self._lru.record(path, os.path.getsize(path))
+
+    def load_matrix(self, keys):
+        """Stack the embeddings of ``keys`` into one (N, D) float32 matrix"""
+        return np.stack([np.load(self._path(key)) for key in keys]).astype(np.float32)
+
+
+# ---------------------------------------------------
+# CLI: re-score the uploads archive with the current head
+#   python -m backend.utils.embedding_store rescore
+# ---------------------------------------------------
+def rescore_uploads(model, store, upload_folder=None, batch_size=32):
+    """Yield {filename, hash, class, confidence} for every upload.
+
+    Only uploads without a stored embedding go through the backbone. Everything
+    else is a single matrix multiply through the current head.
+    """
+    from backend.utils.prediction_cache import content_hash
+
+    upload_folder = upload_folder or Config.UPLOAD_FOLDER
+    entries = []
+    for filename in sorted(os.listdir(upload_folder)):
+        path = os.path.join(upload_folder, filename)
+        if not os.path.isfile(path):
+            continue
+        with open(path, 'rb') as f:
+            entries.append((filename, content_hash(f.read())))
+
+    # 1. Backfill missing embeddings in batches
+    missing = [(filename, key) for filename, key in entries if key not in store]
+    for start in range(0, len(missing), batch_size):
+        chunk, images = [], []
+        for filename, key in missing[start:start + batch_size]:
+            try:
+                images.append(model.preprocess_image(os.path.join(upload_folder, filename)))
+                chunk.append(key)
+            except Exception as e:
+                print(f"⚠️ Skipping {filename}: {e}", file=sys.stderr)
+        if images:
+            for key, embedding in zip(chunk, model.embed_batch(np.stack(images))):
+                store.put(key, embedding)
+
+    # 2. Head-only re-scoring
+    scored = [(filename, key) for filename, key in entries if key in store]
+    if not scored:
+        return
+    probabilities = model.classify_embeddings(store.load_matrix([key for _, key in scored]))
+    for (filename, key), row in zip(scored, probabilities):
+        (class_name, confidence), = model.top_k(row, k=1)
+        yield {'filename': filename, 'hash': key, 'class': class_name, 'confidence': confidence}
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] != 'rescore':
+        print("usage: python -m backend.utils.embedding_store rescore [upload_folder]", file=sys.stderr)
+        sys.exit(2)
+
+    from backend.utils.model_registry import get_model
+
+    model = get_model()
+    if not model.supports_embeddings:
+        print(f"❌ Model unavailable for embeddings ({model.status}: {model.error})", file=sys.stderr)
+        sys.exit(1)
+    for row in rescore_uploads(model, EmbeddingStore(namespace=model.embedding_namespace), sys.argv[2] if len(sys.argv) > 2 else None):
+        print(json.dumps(row))
@@ -0,0 +1,41 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+_FILE_ETAGS = OrderedDict()
+_FILE_ETAGS_MAX = 4096
+_LOCK = threading.Lock()
+
+
+def version_etag(*parts):
+    """Strong ETag value from the parts that identify a response version"""
+    return hashlib.sha1('|'.join(map(str, parts)).encode('utf-8')).hexdigest()
+
+
+def file_etag(path):
+    """Strong ETag value from a file's content hash.
+
+    The hash is memoized per (path, mtime, size) so a file is only read
+    again when it actually changes on disk.
+    """
+    stat = os.stat(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with _LOCK:
+        cached = _FILE_ETAGS.get(path)
+        if cached is not None and cached[0] == signature:
+            _FILE_ETAGS.move_to_end(path)
+            return cached[1]
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    etag = digest.hexdigest()
+
+    with _LOCK:
+        _FILE_ETAGS[path] = (signature, etag)
+        _FILE_ETAGS.move_to_end(path)
+        while len(_FILE_ETAGS) > _FILE_ETAGS_MAX:
+            _FILE_ETAGS.popitem(last=False)
+    return etag
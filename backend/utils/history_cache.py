@@ -0,0 +1,129 @@
+import os
+import uuid
+import hashlib
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from backend.utils.metrics import HISTORY_CACHE_HITS, HISTORY_CACHE_MISSES, HISTORY_CACHE_ENTRIES
+
+
+class VersionStamps:
+    """Per-user version stamps in a folder shared by every worker process.
+
+    The history write path calls ``bump(user_id)`` after its commit, which
+    atomically replaces the user's stamp file with a fresh random token;
+    ``read(user_id)`` returns the current token ('' before the first write)
+    without touching MySQL.
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+
+    def _path(self, user_id):
+        return os.path.join(self.folder, hashlib.sha1(str(user_id).encode()).hexdigest())
+
+    def read(self, user_id):
+        try:
+            with open(self._path(user_id), 'r') as f:
+                return f.read()
+        except FileNotFoundError:
+            return ''
+
+    def bump(self, user_id):
+        os.makedirs(self.folder, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.folder, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(uuid.uuid4().hex)
+            os.replace(tmp_path, self._path(user_id))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+class HistoryCache:
+    """Bounded in-process LRU of rendered history pages, keyed by user + query.
+
+    Each page is stored with the version it was rendered for, and ``get``
+    only returns it while the caller's current version still matches. The
+    version is the user's ``VersionStamps`` token, so a write made by any
+    worker process is seen on the next read without a query. Writes in this
+    process also call ``invalidate(user_id)``, which drops that user's pages
+    and bumps a per-user generation; a page read from MySQL is only stored
+    if the generation is still the one seen before the query. Pages expire
+    after ``ttl_seconds`` whatever the version, which bounds how long a
+    write that bypassed the stamps (another host, a manual fix) stays hidden.
+    """
+
+    def __init__(self, max_entries=2048, ttl_seconds=30):
+        self.max_entries = max(0, int(max_entries))
+        self.ttl = float(ttl_seconds or 0)
+        self._entries = OrderedDict()
+        self._user_keys = {}
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def generation(self, user_id):
+        with self._lock:
+            return self._generations.get(str(user_id), 0)
+
+    def _remove(self, key):
+        self._entries.pop(key, None)
+        keys = self._user_keys.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._user_keys[key[0]]
+
+    def get(self, user_id, query_key, version=None):
+        key = (str(user_id), query_key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, stored_version, stored_at = entry
+                if stored_version != version or (self.ttl and time.monotonic() - stored_at > self.ttl):
+                    self._remove(key)
+                    entry = None
+                else:
+                    self._entries.move_to_end(key)
+            size = len(self._entries)
+
+        HISTORY_CACHE_ENTRIES.set(size)
+        if entry is None:
+            HISTORY_CACHE_MISSES.inc()
+            return None
+        HISTORY_CACHE_HITS.inc()
+        return value
+
+    def put(self, user_id, query_key, value, generation, version=None):
+        if not self.max_entries:
+            return
+        key = (str(user_id), query_key)
+        with self._lock:
+            if self._generations.get(key[0], 0) != generation:
+                return
+            self._entries[key] = (value, version, time.monotonic())
+            self._entries.move_to_end(key)
+            self._user_keys.setdefault(key[0], set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+            size = len(self._entries)
+        HISTORY_CACHE_ENTRIES.set(size)
+
+    def invalidate(self, user_id):
+        user = str(user_id)
+        with self._lock:
+            self._generations[user] = self._generations.get(user, 0) + 1
+            for key in list(self._user_keys.get(user, ())):
+                self._remove(key)
+            size = len(self._entries)
+        HISTORY_CACHE_ENTRIES.set(size)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._user_keys.clear()
+        HISTORY_CACHE_ENTRIES.set(0)
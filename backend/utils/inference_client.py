@@ -0,0 +1,78 @@
+import http.client
+import socket
+import threading
+import time
+from urllib.parse import urlsplit
+
+from backend.utils.inference_protocol import (
+    BLOB_SIZES_HEADER, MODE_HEADER, InferenceTierUnavailable, decode_response, encode_request,
+)
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path, timeout):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+
+class RemoteInference:
+    """Client for the inference tier (``backend/inference_app.py``).
+
+    ``url`` is ``unix:///path/to.sock`` or ``http://host:port``. One
+    keep-alive connection is kept per API thread.
+    """
+
+    def __init__(self, url, timeout=30):
+        self.url = url
+        self.timeout = timeout
+        parts = urlsplit(url)
+        if parts.scheme == 'unix':
+            self._factory = lambda: _UnixHTTPConnection(parts.path, timeout)
+        elif parts.scheme == 'http':
+            self._factory = lambda: http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=timeout)
+        else:
+            raise ValueError(f"Unsupported INFERENCE_URL scheme: {url}")
+        self._local = threading.local()
+
+    def _request(self, body, headers):
+        for attempt in (0, 1):
+            conn = getattr(self._local, 'conn', None)
+            reused = conn is not None
+            if conn is None:
+                conn = self._local.conn = self._factory()
+            sent = False
+            try:
+                conn.request('POST', '/internal/infer', body=body, headers=headers)
+                sent = True
+                response = conn.getresponse()
+                return response.status, response.read()
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                self._local.conn = None
+                # Retry only a reused keep-alive connection the server had already closed:
+                # the send failed, or it hung up before any response bytes. Never after a
+                # timeout, since the tier may still be running the first request.
+                stale = isinstance(e, http.client.RemoteDisconnected) or (
+                    not sent and isinstance(e, (ConnectionResetError, BrokenPipeError)))
+                if attempt or not (reused and stale):
+                    raise InferenceTierUnavailable(f"Inference service unreachable at {self.url}: {e}") from e
+
+    def run_predictions(self, blobs, timer=None, single=False):
+        """Same contract as inference_engine.run_predictions, over the wire"""
+        body, sizes = encode_request(blobs)
+        headers = {
+            'Content-Type': 'application/octet-stream',
+            BLOB_SIZES_HEADER: sizes,
+            MODE_HEADER: 'single' if single else 'batch',
+        }
+        started = time.perf_counter()
+        status, payload = self._request(body, headers)
+        if timer is not None:
+            timer.add('remote', time.perf_counter() - started)
+        return decode_response(status, payload)
@@ -0,0 +1,149 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from backend.config import Config
+from backend.utils.batching import MicroBatcher
+from backend.utils.embedding_store import EmbeddingStore
+from backend.utils.inference_protocol import ModelUnavailable
+from backend.utils.model_registry import get_model, on_model_swap
+from backend.utils.prediction_cache import PredictionCache, content_hash
+from backend.utils.timing import timed
+
+
+# -----------------------------------------------------------
+# The shared batcher and caches (one set per inference process).
+# The model itself loads on first use or via model_registry.start_warmup().
+# -----------------------------------------------------------
+def model_forward(batch):
+    """Backbone embeddings when available, otherwise class probabilities"""
+    model = get_model()
+    if not model.supports_embeddings:
+        return model.predict_batch(batch)
+    return model.embed_batch(batch)
+
+
+# Concurrent single-image requests share one forward pass
+PREDICT_BATCHER = MicroBatcher(
+    model_forward,
+    max_batch_size=Config.BATCH_MAX_SIZE,
+    max_wait_ms=Config.BATCH_MAX_WAIT_MS
+)
+
+# Parallel decode for multi-image requests
+DECODE_POOL = ThreadPoolExecutor(max_workers=Config.DECODE_WORKERS, thread_name_prefix='decode')
+
+# Results keyed by image hash + model version
+PREDICTION_CACHE = PredictionCache(
+    max_entries=Config.PREDICTION_CACHE_SIZE,
+    ttl_seconds=Config.PREDICTION_CACHE_TTL
+)
+on_model_swap(lambda name, old_model, new_model: PREDICTION_CACHE.clear())
+
+
+def format_prediction(model, predictions):
+    """Shape one image's class probabilities into the API response"""
+    (predicted_class_name, confidence), (second_class_name, second_confidence) = model.top_k(predictions, k=2)
+    return {
+        'class': predicted_class_name,
+        'confidence': confidence,
+        'second_guess': second_class_name,
+        'second_confidence': second_confidence,
+        'description': f"Detected {predicted_class_name}.",
+        'treatment': "Consult an expert.",
+        'symptoms': "Visible spots on leaves."
+    }
+
+
+def predict_images(model, blobs, forward, timer=None):
+    """Classify a list of images (bytes), preserving order.
+
+    Each item of the result is either ``(result, source)`` where source is
+    'cache', 'embedding' or 'model', or the exception for that image alone.
+    ``forward`` takes a list of preprocessed images and returns one row each.
+    """
+    results = [None] * len(blobs)
+    with timed(timer, 'hash'):
+        hashes = [content_hash(data) for data in blobs]
+    cache_keys = [PredictionCache.make_key(data_hash, model.version) for data_hash in hashes]
+    # Stored backbone embeddings: re-classification only needs the head
+    use_embeddings = Config.EMBEDDING_STORE_ENABLED and model.supports_embeddings
+    store = EmbeddingStore(namespace=model.embedding_namespace) if use_embeddings else None
+
+    # 1. Result cache, then the embedding store
+    embeddings, pending = {}, []
+    with timed(timer, 'cache'):
+        for index, cache_key in enumerate(cache_keys):
+            cached = PREDICTION_CACHE.get(cache_key)
+            if cached is not None:
+                results[index] = (cached, 'cache')
+                continue
+            embedding = store.get(hashes[index]) if use_embeddings else None
+            if embedding is not None:
+                embeddings[index] = embedding
+            else:
+                pending.append(index)
+
+    # 2. Decode the remaining images (in parallel when there are several)
+    def decode(index):
+        return model.preprocess_image(io.BytesIO(blobs[index]), timer=timer)
+
+    if len(pending) > 1:
+        futures = [DECODE_POOL.submit(decode, index) for index in pending]
+    else:
+        futures = None
+    decoded, images = [], []
+    for position, index in enumerate(pending):
+        try:
+            images.append(futures[position].result() if futures else decode(index))
+            decoded.append(index)
+        except Exception as e:
+            results[index] = e
+
+    # 3. Model pass for new images only
+    probabilities = {}
+    if images:
+        outputs = forward(images)
+        with timed(timer, 'embedding_store'):
+            for index, output in zip(decoded, outputs):
+                if not model.supports_embeddings:
+                    probabilities[index] = output
+                else:
+                    embeddings[index] = output
+                    if use_embeddings:
+                        store.put(hashes[index], output)
+
+    # 4. Head over every embedding at once (a single matrix product)
+    with timed(timer, 'postprocess'):
+        if embeddings:
+            indices = list(embeddings)
+            rows = model.classify_embeddings(np.stack([embeddings[index] for index in indices]))
+            probabilities.update(zip(indices, rows))
+
+        for index, row in probabilities.items():
+            result = format_prediction(model, row)
+            PREDICTION_CACHE.put(cache_keys[index], result)
+            results[index] = (result, 'model' if index in decoded else 'embedding')
+    return results
+
+
+def run_predictions(blobs, timer=None, single=False):
+    """Entry point shared by the in-process API and the inference tier.
+
+    ``single`` requests go through the micro-batcher so concurrent callers
+    share a forward pass; multi-image requests run as one stacked batch.
+    """
+    model = get_model()
+    if not model.loaded:
+        raise ModelUnavailable(model.status, model.error)
+
+    if single:
+        def forward(images):
+            return [PREDICT_BATCHER.submit(image, timer=timer) for image in images]
+    else:
+        def forward(images):
+            with timed(timer, 'inference'):
+                return model_forward(np.stack(images))
+
+    return predict_images(model, blobs, forward, timer=timer)
@@ -0,0 +1,76 @@
+import json
+
+# Wire format between the API tier and the inference tier:
+#   request:  POST /internal/infer, body = the raw images concatenated,
+#             X-Blob-Sizes = comma-separated byte length of each image,
+#             X-Inference-Mode = single | batch
+#   response: 200 {"items": [{"result": {...}, "source": "cache"} | {"error": "..."}]}
+#             503 {"status": ..., "detail": ...} when the model is not loaded
+# No multipart parsing or base64 on either side.
+BLOB_SIZES_HEADER = 'X-Blob-Sizes'
+MODE_HEADER = 'X-Inference-Mode'
+
+
+class ModelUnavailable(Exception):
+    """The model is not loaded (status / detail come from the model registry)"""
+
+    def __init__(self, status, detail=None):
+        super().__init__(f"Model not loaded ({status})")
+        self.status = status
+        self.detail = detail
+
+
+class InferenceTierUnavailable(Exception):
+    """The inference service could not be reached or returned an unusable response"""
+
+
+class ImageError(Exception):
+    """A single image failed on the inference tier (bad data, decode error, ...)"""
+
+
+def encode_request(blobs):
+    return b''.join(blobs), ','.join(str(len(data)) for data in blobs)
+
+
+def decode_request(body, sizes):
+    if not sizes:
+        raise ValueError(f"missing {BLOB_SIZES_HEADER}")
+    lengths = [int(size) for size in sizes.split(',')]
+    if any(length < 0 for length in lengths) or sum(lengths) != len(body):
+        raise ValueError(f"{BLOB_SIZES_HEADER} does not match the body")
+    blobs, offset = [], 0
+    for length in lengths:
+        blobs.append(body[offset:offset + length])
+        offset += length
+    return blobs
+
+
+def encode_outcomes(outcomes):
+    items = []
+    for outcome in outcomes:
+        if isinstance(outcome, Exception):
+            items.append({'error': str(outcome)})
+        else:
+            result, source = outcome
+            items.append({'result': result, 'source': source})
+    return {'items': items}
+
+
+def decode_response(status, payload):
+    try:
+        data = json.loads(payload)
+    except ValueError as e:
+        raise InferenceTierUnavailable(f"Invalid response from inference service (HTTP {status})") from e
+    if not isinstance(data, dict):
+        raise InferenceTierUnavailable(f"Invalid response from inference service (HTTP {status})")
+    if status == 503 and 'status' in data:
+        raise ModelUnavailable(data['status'], data.get('detail'))
+    if status != 200:
+        raise InferenceTierUnavailable(data.get('error') or f"Inference service returned HTTP {status}")
+    try:
+        return [
+            ImageError(item['error']) if 'error' in item else (item['result'], item['source'])
+            for item in data['items']
+        ]
+    except (KeyError, TypeError) as e:
+        raise InferenceTierUnavailable(f"Malformed response from inference service: {e!r}") from e
@@ -0,0 +1,210 @@
+import json
+import math
+import os
+import queue
+import re
+import tempfile
+import threading
+import time
+import uuid
+
+from backend.utils.admission import Overloaded
+from backend.utils.metrics import PREDICT_JOB_QUEUE_DEPTH, PREDICT_JOBS, PREDICT_JOB_WAIT_SECONDS
+
+FINISHED = ('done', 'failed')
+_JOB_ID = re.compile(r'^[0-9a-f]{32}$')
+
+
+class JobQueue:
+    """Run jobs on a pool of background threads and keep their state on disk.
+
+    ``submit()`` stores the payload as ``<id>.bin`` next to a ``<id>.json``
+    state file and queues the id for the worker threads of this process. The
+    state goes from 'queued' to 'running' to 'done' (with the value returned
+    by ``run_fn``) or 'failed' (with the error). Because the state lives in
+    files, any gunicorn worker sharing the folder can answer a poll.
+
+    Files are deleted ``ttl_seconds`` after their last update. Unfinished jobs
+    not updated for ``stale_seconds`` are reported as failed: the worker that
+    owned them exited.
+    """
+
+    def __init__(self, run_fn, folder, workers=2, max_queue=100, ttl_seconds=3600, stale_seconds=300,
+                 poll_interval=0.25, name='jobs'):
+        self.run_fn = run_fn
+        self.folder = folder
+        self.workers = max(1, int(workers))
+        self.max_queue = max(1, int(max_queue))
+        self.ttl = float(ttl_seconds)
+        self.stale_seconds = float(stale_seconds)
+        self.poll_interval = poll_interval
+        self.name = name
+        self._queue = queue.Queue(maxsize=self.max_queue)
+        self._lock = threading.Lock()
+        self._threads = []
+        self._pid = None
+        self._finished = {}
+        self._run_time = None
+        self._last_purge = 0.0
+
+    def _path(self, job_id, extension):
+        return os.path.join(self.folder, f"{job_id}.{extension}")
+
+    def _write(self, path, data):
+        fd, tmp_path = tempfile.mkstemp(dir=self.folder, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _save(self, state):
+        state['updated_at'] = time.time()
+        self._write(self._path(state['job_id'], 'json'), json.dumps(state).encode('utf-8'))
+
+    def _remove(self, job_id, *extensions):
+        for extension in extensions:
+            try:
+                os.remove(self._path(job_id, extension))
+            except FileNotFoundError:
+                pass
+
+    def _ensure_workers(self):
+        if self._pid == os.getpid() and all(thread.is_alive() for thread in self._threads):
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                # Threads and queued ids do not survive a fork
+                self._queue = queue.Queue(maxsize=self.max_queue)
+                self._finished = {}
+                self._threads = []
+                self._pid = os.getpid()
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._run, name=f"{self.name}-{len(self._threads)}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _retry_after(self):
+        run_time = self._run_time if self._run_time is not None else 1.0
+        return min(60, max(1, math.ceil(self._queue.qsize() * run_time / self.workers)))
+
+    # -----------------------------------------------
+    # Submit and poll
+    # -----------------------------------------------
+    def submit(self, payload):
+        """Queue one job and return its initial state; raises Overloaded when the queue is full"""
+        self._ensure_workers()
+        os.makedirs(self.folder, exist_ok=True)
+        job_id = uuid.uuid4().hex
+        state = {'job_id': job_id, 'status': 'queued', 'created_at': time.time()}
+        self._write(self._path(job_id, 'bin'), payload)
+        self._save(state)
+
+        self._finished[job_id] = threading.Event()
+        try:
+            self._queue.put_nowait((job_id, time.monotonic()))
+        except queue.Full:
+            self._finished.pop(job_id, None)
+            self._remove(job_id, 'bin', 'json')
+            PREDICT_JOBS.labels('rejected').inc()
+            raise Overloaded(self._retry_after(), 'job_queue_full')
+        PREDICT_JOB_QUEUE_DEPTH.inc()
+        PREDICT_JOBS.labels('submitted').inc()
+        return state
+
+    def get(self, job_id):
+        """Current state of a job, or None when it is unknown or has expired"""
+        if not _JOB_ID.match(job_id):
+            return None
+        try:
+            with open(self._path(job_id, 'json'), 'r') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        age = time.time() - state['updated_at']
+        if age > self.ttl:
+            return None
+        if state['status'] not in FINISHED and age > self.stale_seconds:
+            state.update(status='failed', error='Job was lost, please submit it again')
+        return state
+
+    def wait(self, job_id, timeout):
+        """Like get(), but block up to timeout seconds for the job to finish (long polling)"""
+        deadline = time.monotonic() + timeout
+        finished = self._finished.get(job_id)
+        while True:
+            state = self.get(job_id)
+            remaining = deadline - time.monotonic()
+            if state is None or state['status'] in FINISHED or remaining <= 0:
+                return state
+            if finished is not None:
+                # Submitted by this process: woken as soon as it finishes
+                finished.wait(remaining)
+            else:
+                time.sleep(min(self.poll_interval, remaining))
+
+    # -----------------------------------------------
+    # Worker threads
+    # -----------------------------------------------
+    def _run(self):
+        while True:
+            try:
+                job_id, enqueued_at = self._queue.get(timeout=60)
+            except queue.Empty:
+                self._purge_expired()
+                continue
+            PREDICT_JOB_QUEUE_DEPTH.dec()
+            PREDICT_JOB_WAIT_SECONDS.observe(time.monotonic() - enqueued_at)
+            try:
+                self._process(job_id)
+            except Exception as e:
+                print(f"❌ Job {job_id} could not be processed: {e}")
+            finally:
+                finished = self._finished.pop(job_id, None)
+                if finished is not None:
+                    finished.set()
+            self._purge_expired()
+
+    def _process(self, job_id):
+        state = self.get(job_id)
+        if state is None:
+            return
+        with open(self._path(job_id, 'bin'), 'rb') as f:
+            payload = f.read()
+        state['status'] = 'running'
+        self._save(state)
+
+        started = time.monotonic()
+        try:
+            state.update(status='done', result=self.run_fn(payload))
+        except Exception as e:
+            state.update(status='failed', error=str(e))
+        finally:
+            self._remove(job_id, 'bin')
+
+        elapsed = time.monotonic() - started
+        self._run_time = elapsed if self._run_time is None else self._run_time + 0.2 * (elapsed - self._run_time)
+        self._save(state)
+        PREDICT_JOBS.labels(state['status']).inc()
+
+    def _purge_expired(self):
+        now = time.time()
+        if now - self._last_purge < 60:
+            return
+        self._last_purge = now
+        try:
+            names = os.listdir(self.folder)
+        except FileNotFoundError:
+            return
+        for name in names:
+            path = os.path.join(self.folder, name)
+            try:
+                if now - os.path.getmtime(path) > self.ttl:
+                    os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,398 @@
+import os
+import time
+from prometheus_client import (
+    Counter, Gauge, Histogram, CollectorRegistry, CONTENT_TYPE_LATEST, generate_latest, multiprocess
+)
+
+# ملاحظة: مع gunicorn (عدة عمليات) يجب ضبط PROMETHEUS_MULTIPROC_DIR قبل استيراد
+# هذا الملف (يتم ذلك في gunicorn.conf.py) حتى تُجمع مقاييس كل العمليات معاً.
+
+# ---------------------------------------------------
+# مقاييس HTTP
+# ---------------------------------------------------
+HTTP_REQUESTS = Counter(
+    'plantpal_http_requests_total',
+    'HTTP requests by blueprint route',
+    ['method', 'route', 'status']
+)
+
+HTTP_LATENCY = Histogram(
+    'plantpal_http_request_seconds',
+    'HTTP request latency by blueprint route',
+    ['method', 'route'],
+    buckets=(.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30)
+)
+
+HTTP_IN_FLIGHT = Gauge(
+    'plantpal_http_requests_in_flight',
+    'HTTP requests currently being served',
+    multiprocess_mode='livesum'
+)
+
+# ---------------------------------------------------
+# مقاييس قاعدة البيانات (MySQL)
+# ---------------------------------------------------
+DB_CONNECT_SECONDS = Histogram(
+    'plantpal_db_connect_seconds',
+    'Time to open a new MySQL connection',
+    buckets=(.001, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5)
+)
+
+DB_CONNECT_ERRORS = Counter(
+    'plantpal_db_connect_errors_total',
+    'Failed attempts to obtain a MySQL connection'
+)
+
+DB_POOL_CHECKOUT_SECONDS = Histogram(
+    'plantpal_db_pool_checkout_seconds',
+    'Time to check a connection out of the pool (wait + health check + connect)',
+    buckets=(.0005, .001, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5)
+)
+
+DB_POOL_TIMEOUTS = Counter(
+    'plantpal_db_pool_timeouts_total',
+    'Checkouts that timed out because every pooled connection was busy'
+)
+
+DB_POOL_IN_USE = Gauge(
+    'plantpal_db_pool_connections_in_use',
+    'Pooled MySQL connections currently checked out',
+    multiprocess_mode='livesum'
+)
+
+DB_POOL_IDLE = Gauge(
+    'plantpal_db_pool_connections_idle',
+    'Open MySQL connections waiting in the pool',
+    multiprocess_mode='livesum'
+)
+
+DB_POOL_SIZE = Gauge(
+    'plantpal_db_pool_size',
+    'Maximum connections per worker pool',
+    multiprocess_mode='livesum'
+)
+
+DB_QUERY_SECONDS = Histogram(
+    'plantpal_db_query_seconds',
+    'MySQL statement execution time by statement type',
+    ['operation'],
+    buckets=(.001, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5)
+)
+
+# ---------------------------------------------------
+# مقاييس العملية والموديل
+# ---------------------------------------------------
+PROCESS_RSS_BYTES = Gauge(
+    'plantpal_process_resident_memory_bytes',
+    'Resident set size of each worker process',
+    multiprocess_mode='liveall'
+)
+
+MODEL_LOAD_SECONDS = Gauge(
+    'plantpal_model_load_seconds',
+    'Time taken by the last model load (including warm-up)',
+    ['backend'],
+    multiprocess_mode='max'
+)
+
+# ---------------------------------------------------
+# مقاييس محرك التنبؤ (Inference engine)
+# ---------------------------------------------------
+INFERENCE_QUEUE_DEPTH = Gauge(
+    'plantpal_inference_queue_depth',
+    'Prediction requests waiting for the next batch',
+    multiprocess_mode='livesum'
+)
+
+INFERENCE_BATCH_SIZE = Histogram(
+    'plantpal_inference_batch_size',
+    'Number of images per model forward pass',
+    buckets=(1, 2, 4, 8, 16, 32, 64)
+)
+
+INFERENCE_QUEUE_WAIT = Histogram(
+    'plantpal_inference_queue_wait_seconds',
+    'Time a prediction request waited before its batch started',
+    buckets=(.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1)
+)
+
+INFERENCE_BATCH_SECONDS = Histogram(
+    'plantpal_inference_batch_seconds',
+    'Duration of one batched model forward pass'
+)
+
+INFERENCE_ERRORS = Counter(
+    'plantpal_inference_errors_total',
+    'Batches whose forward pass raised an exception'
+)
+
+# ---------------------------------------------------
+# مقاييس ذاكرة التخزين المؤقت للتنبؤات (Prediction cache)
+# ---------------------------------------------------
+PREDICTION_CACHE_HITS = Counter(
+    'plantpal_prediction_cache_hits_total',
+    'Predictions served from the content-hash cache'
+)
+
+PREDICTION_CACHE_MISSES = Counter(
+    'plantpal_prediction_cache_misses_total',
+    'Predictions that had to run the model'
+)
+
+PREDICTION_CACHE_ENTRIES = Gauge(
+    'plantpal_prediction_cache_entries',
+    'Entries currently held in the prediction cache',
+    multiprocess_mode='livesum'
+)
+
+HISTORY_CACHE_HITS = Counter(
+    'plantpal_history_cache_hits_total',
+    'History pages served from the per-user read cache'
+)
+
+HISTORY_CACHE_MISSES = Counter(
+    'plantpal_history_cache_misses_total',
+    'History pages that had to query MySQL'
+)
+
+HISTORY_CACHE_ENTRIES = Gauge(
+    'plantpal_history_cache_entries',
+    'History pages currently held in the read cache',
+    multiprocess_mode='livesum'
+)
+
+EMBEDDING_STORE_HITS = Counter(
+    'plantpal_embedding_store_hits_total',
+    'Predictions that reused a stored backbone embedding (head only)'
+)
+
+EMBEDDING_STORE_MISSES = Counter(
+    'plantpal_embedding_store_misses_total',
+    'Embedding lookups that required a full backbone pass'
+)
+
+EMBEDDING_STORE_BYTES = Gauge(
+    'plantpal_embedding_store_bytes',
+    'Bytes of stored embeddings on disk as seen by this worker',
+    multiprocess_mode='max'
+)
+
+EMBEDDING_STORE_EVICTIONS = Counter(
+    'plantpal_embedding_store_evictions_total',
+    'Embeddings removed to keep the store under its size cap'
+)
+
+# ---------------------------------------------------
+# مقاييس الكتابة المؤجلة لسجل الفحوصات (Write-behind)
+# ---------------------------------------------------
+WRITE_BEHIND_QUEUE_DEPTH = Gauge(
+    'plantpal_write_behind_queue_depth',
+    'History records accepted but not yet committed to MySQL',
+    multiprocess_mode='livesum'
+)
+
+WRITE_BEHIND_LAG_SECONDS = Histogram(
+    'plantpal_write_behind_lag_seconds',
+    'Time from accepting a history record to committing it',
+    buckets=(.01, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60)
+)
+
+WRITE_BEHIND_BATCH_SIZE = Histogram(
+    'plantpal_write_behind_batch_size',
+    'Records per coalesced history insert',
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500)
+)
+
+WRITE_BEHIND_FLUSHED = Counter(
+    'plantpal_write_behind_flushed_total',
+    'History records committed by the write-behind flusher'
+)
+
+WRITE_BEHIND_ERRORS = Counter(
+    'plantpal_write_behind_errors_total',
+    'Failed write-behind flush attempts'
+)
+
+WRITE_BEHIND_DROPPED = Counter(
+    'plantpal_write_behind_dropped_total',
+    'History records dropped after every flush retry failed'
+)
+
+# ---------------------------------------------------
+# مقاييس الملف المحلي للكتابات أثناء انقطاع MySQL (Spool)
+# ---------------------------------------------------
+SPOOL_RECORDS = Gauge(
+    'plantpal_spool_records',
+    'History records waiting in the local spool for MySQL to come back',
+    multiprocess_mode='max'
+)
+
+SPOOL_OLDEST_SECONDS = Gauge(
+    'plantpal_spool_oldest_record_age_seconds',
+    'Age of the oldest record in the local spool',
+    multiprocess_mode='max'
+)
+
+SPOOL_APPENDED = Counter(
+    'plantpal_spool_appended_total',
+    'History records written to the local spool during a database outage'
+)
+
+SPOOL_REPLAYED = Counter(
+    'plantpal_spool_replayed_total',
+    'Spooled history records replayed into MySQL'
+)
+
+SPOOL_REPLAY_ERRORS = Counter(
+    'plantpal_spool_replay_errors_total',
+    'Failed spool replay attempts (each one backs off)'
+)
+
+SPOOL_DISCARDED = Counter(
+    'plantpal_spool_discarded_total',
+    'Spooled records MySQL rejected permanently (e.g. unknown user)'
+)
+
+# ---------------------------------------------------
+# مقاييس الصور المصغرة (Thumbnails)
+# ---------------------------------------------------
+THUMBNAIL_REQUESTS = Counter(
+    'plantpal_thumbnail_requests_total',
+    'Thumbnail lookups by outcome (hit, render, coalesced)',
+    ['outcome']
+)
+
+THUMBNAIL_RENDER_SECONDS = Histogram(
+    'plantpal_thumbnail_render_seconds',
+    'Time to decode, resize and encode one thumbnail',
+    ['format'],
+    buckets=(.005, .01, .025, .05, .1, .25, .5, 1, 2.5)
+)
+
+THUMBNAIL_CACHE_BYTES = Gauge(
+    'plantpal_thumbnail_cache_bytes',
+    'Bytes of thumbnails on disk as seen by this worker',
+    multiprocess_mode='max'
+)
+
+THUMBNAIL_EVICTIONS = Counter(
+    'plantpal_thumbnail_evictions_total',
+    'Thumbnails removed to keep the cache under its size cap'
+)
+
+# ---------------------------------------------------
+# مقاييس التحكم في القبول (طلبات التنبؤ الجارية والمنتظرة والمرفوضة)
+# ---------------------------------------------------
+ADMISSION_IN_FLIGHT = Gauge(
+    'plantpal_admission_in_flight',
+    'Prediction requests holding an admission slot',
+    multiprocess_mode='livesum'
+)
+
+ADMISSION_QUEUED = Gauge(
+    'plantpal_admission_queued',
+    'Prediction requests waiting for an admission slot',
+    ['lane'],
+    multiprocess_mode='livesum'
+)
+
+ADMISSION_WAIT_SECONDS = Histogram(
+    'plantpal_admission_wait_seconds',
+    'Time queued prediction requests waited for a slot',
+    ['lane'],
+    buckets=(.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+)
+
+ADMISSION_REJECTED = Counter(
+    'plantpal_admission_rejected_total',
+    'Prediction requests shed with 503 (queue_full or timeout)',
+    ['lane', 'reason']
+)
+
+# ---------------------------------------------------
+# مقاييس التنبؤ غير المتزامن (/api/predict/jobs)
+# ---------------------------------------------------
+PREDICT_JOB_QUEUE_DEPTH = Gauge(
+    'plantpal_predict_job_queue_depth',
+    'Prediction jobs waiting for a job worker thread',
+    multiprocess_mode='livesum'
+)
+
+PREDICT_JOBS = Counter(
+    'plantpal_predict_jobs_total',
+    'Prediction jobs by outcome (submitted, rejected, done, failed)',
+    ['outcome']
+)
+
+PREDICT_JOB_WAIT_SECONDS = Histogram(
+    'plantpal_predict_job_wait_seconds',
+    'Time prediction jobs spent queued before a worker picked them up',
+    buckets=(.01, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60, 120)
+)
+
+# ---------------------------------------------------
+# زمن كل مرحلة من مراحل التنبؤ (parse / decode / resize / ...)
+# ---------------------------------------------------
+PREDICT_STAGE_SECONDS = Histogram(
+    'plantpal_predict_stage_seconds',
+    'Time spent in each stage of the prediction pipeline',
+    ['endpoint', 'stage'],
+    buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5)
+)
+
+
+def _read_rss_bytes():
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+_last_rss_update = 0.0
+
+
+def update_process_metrics(min_interval=1.0):
+    """Refresh the RSS gauge of this worker (at most once per min_interval seconds)"""
+    global _last_rss_update
+    now = time.monotonic()
+    if now - _last_rss_update >= min_interval:
+        _last_rss_update = now
+        PROCESS_RSS_BYTES.set(_read_rss_bytes())
+
+
+def instrument_app(app):
+    """تسجيل عدد الطلبات وزمنها والطلبات الجارية لكل مسار"""
+    from flask import g, request
+
+    @app.before_request
+    def _start_http_timer():
+        g._http_started = time.perf_counter()
+        g._http_in_flight = True
+        HTTP_IN_FLIGHT.inc()
+
+    @app.after_request
+    def _observe_http_request(response):
+        started = g.pop('_http_started', None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            HTTP_LATENCY.labels(request.method, route).observe(time.perf_counter() - started)
+            HTTP_REQUESTS.labels(request.method, route, str(response.status_code)).inc()
+        update_process_metrics()
+        return response
+
+    @app.teardown_request
+    def _end_http_request(exc):
+        if g.pop('_http_in_flight', False):
+            HTTP_IN_FLIGHT.dec()
+
+
+def render_metrics():
+    """إرجاع المقاييس بصيغة Prometheus النصية (مجمعة من كل عمليات gunicorn إن وجدت)"""
+    update_process_metrics(min_interval=0)
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
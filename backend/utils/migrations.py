@@ -0,0 +1,154 @@
+import time
+
+from backend.utils.db import get_db_connection, DatabaseUnavailable
+
+# Serialises concurrent runs (two deploys, or a deploy racing a manual run)
+MIGRATION_LOCK = 'plantpal_schema_migrations'
+
+
+def _column_exists(cursor, table, column):
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+    """, (table, column))
+    return cursor.fetchone()[0] > 0
+
+
+def _index_exists(cursor, table, index):
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+    """, (table, index))
+    return cursor.fetchone()[0] > 0
+
+
+# ---------------------------------------------------
+# Migrations: append only, never edit one that has shipped.
+# Each step is idempotent so databases created by the old
+# import-time init_db()/init_users_table() adopt cleanly.
+# ---------------------------------------------------
+def _001_create_users(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            username VARCHAR(255) UNIQUE NOT NULL,
+            password VARCHAR(255) NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def _002_create_history(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS history (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            user_id INT NOT NULL,
+            image_path VARCHAR(500),
+            disease_name VARCHAR(255),
+            confidence FLOAT,
+            date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+    """)
+
+
+def _003_history_record_id(cursor):
+    # Idempotent replay of spooled writes (see utils/spool.py)
+    if not _column_exists(cursor, 'history', 'record_id'):
+        cursor.execute("""
+            ALTER TABLE history
+            ADD COLUMN record_id CHAR(36) NULL,
+            ADD UNIQUE KEY uq_history_record_id (record_id),
+            ALGORITHM=INPLACE, LOCK=NONE
+        """)
+
+
+def _004_history_user_date_index(cursor):
+    # Keyset pagination: WHERE user_id = ? ORDER BY date DESC, id DESC
+    if not _index_exists(cursor, 'history', 'idx_history_user_date_id'):
+        cursor.execute("""
+            ALTER TABLE history
+            ADD INDEX idx_history_user_date_id (user_id, date, id),
+            ALGORITHM=INPLACE, LOCK=NONE
+        """)
+
+
+MIGRATIONS = [
+    (1, 'create users table', _001_create_users),
+    (2, 'create history table', _002_create_history),
+    (3, 'add history.record_id', _003_history_record_id),
+    (4, 'add history (user_id, date, id) index', _004_history_user_date_index),
+]
+
+
+def _ensure_migrations_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            description VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            duration_ms INT NOT NULL
+        )
+    """)
+
+
+def applied_versions(cursor):
+    _ensure_migrations_table(cursor)
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def pending_migrations(cursor, target=None):
+    done = applied_versions(cursor)
+    return [m for m in MIGRATIONS if m[0] not in done and (target is None or m[0] <= target)]
+
+
+def migrate(target=None, dry_run=False, lock_timeout=60):
+    """Apply pending migrations in order and return the versions applied (or that would be)"""
+    conn = get_db_connection()
+    if not conn:
+        raise DatabaseUnavailable("Database connection failed")
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT GET_LOCK(%s, %s)", (MIGRATION_LOCK, lock_timeout))
+        if cursor.fetchone()[0] != 1:
+            raise RuntimeError(f"Another migration run holds the {MIGRATION_LOCK} lock")
+        try:
+            pending = pending_migrations(cursor, target)
+            if dry_run:
+                return [version for version, _, _ in pending]
+            applied = []
+            for version, description, step in pending:
+                print(f"🔄 Applying {version:03d} {description}")
+                started = time.monotonic()
+                step(cursor)
+                duration_ms = int((time.monotonic() - started) * 1000)
+                # DDL commits implicitly; record each version as soon as it lands
+                cursor.execute(
+                    "INSERT INTO schema_migrations (version, description, duration_ms) VALUES (%s, %s, %s)",
+                    (version, description, duration_ms))
+                conn.commit()
+                applied.append(version)
+                print(f"✅ Applied {version:03d} in {duration_ms} ms")
+            return applied
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (MIGRATION_LOCK,))
+            cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def status():
+    """[(version, description, applied)] for every known migration"""
+    conn = get_db_connection()
+    if not conn:
+        raise DatabaseUnavailable("Database connection failed")
+    cursor = conn.cursor()
+    try:
+        done = applied_versions(cursor)
+        conn.commit()
+        return [(version, description, version in done) for version, description, _ in MIGRATIONS]
+    finally:
+        cursor.close()
+        conn.close()
@@ -0,0 +1,539 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import numpy as np
+from PIL import Image
+from backend.config import Config
+from backend.utils.metrics import MODEL_LOAD_SECONDS
+from backend.utils.timing import timed
+
+# Fallback class names, used when models/metadata.json does not list them
+DEFAULT_CLASS_NAMES = [
+    'Apple___Apple_scab', 'Apple___Black_rot', 'Apple___Cedar_apple_rust', 'Apple___healthy',
+    'Blueberry___healthy', 'Cherry_(including_sour)___Powdery_mildew', 'Cherry_(including_sour)___healthy',
+    'Corn_(maize)___Cercospora_leaf_spot Gray_leaf_spot', 'Corn_(maize)___Common_rust_',
+    'Corn_(maize)___Northern_Leaf_Blight', 'Corn_(maize)___healthy', 'Grape___Black_rot',
+    'Grape___Esca_(Black_Measles)', 'Grape___Leaf_blight_(Isariopsis_Leaf_Spot)', 'Grape___healthy',
+    'Orange___Haunglongbing_(Citrus_greening)', 'Peach___Bacterial_spot', 'Peach___healthy',
+    'Pepper,_bell___Bacterial_spot', 'Pepper,_bell___healthy', 'Potato___Early_blight',
+    'Potato___Late_blight', 'Potato___healthy', 'Raspberry___healthy', 'Soybean___healthy',
+    'Squash___Powdery_mildew', 'Strawberry___Leaf_scorch', 'Strawberry___healthy',
+    'Tomato___Bacterial_spot', 'Tomato___Early_blight', 'Tomato___Late_blight',
+    'Tomato___Leaf_Mold', 'Tomato___Septoria_leaf_spot', 'Tomato___Spider_mites Two-spotted_spider_mite',
+    'Tomato___Target_Spot', 'Tomato___Tomato_Yellow_Leaf_Curl_Virus', 'Tomato___Tomato_mosaic_virus',
+    'Tomato___healthy'
+]
+DEFAULT_NUM_CLASSES = 39
+
+
+class ModelArtifactsMissing(Exception):
+    """Raised when neither a full model nor architecture + weights exist locally"""
+
+
+class ModelLoadError(Exception):
+    """Raised by get_model() when MODEL_REQUIRED is set and the model could not be loaded"""
+
+
+def _read_json(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+class PlantDiseaseModel:
+    """The trained plant disease model together with its class names and input size"""
+
+    def __init__(self, model_path=None):
+        self.model_path = model_path or Config.MODEL_PATH
+        self.model = None
+        self.class_names = list(DEFAULT_CLASS_NAMES)
+        self.num_classes = DEFAULT_NUM_CLASSES
+        self.img_size = Config.IMG_SIZE
+        self.status = 'not_loaded'
+        self.error = None
+        self.version = None
+        self.backbone = None
+        self.head_weights = None
+        self.backend = None
+        self.embedding_namespace = Config.EMBEDDING_NAMESPACE
+        self._forward_fn = None
+        self._interpreter = None
+        self._interpreter_lock = threading.Lock()
+        self._interpreter_batch = None
+        self.load_model()
+
+    @property
+    def loaded(self):
+        return self.backend is not None
+
+    @property
+    def supports_embeddings(self):
+        """True when the backbone and the Dense head can be run separately"""
+        return self.loaded and self.head_weights is not None
+
+    def load_metadata(self):
+        """Read class names from models/metadata.json and the input size from models/config.json"""
+        metadata = _read_json(os.path.join(self.model_path, 'metadata.json'))
+        if metadata.get('class_names'):
+            self.class_names = list(metadata['class_names'])
+            self.num_classes = len(self.class_names)
+
+        config = _read_json(os.path.join(self.model_path, 'config.json'))
+        if 'img_size' in config:
+            self.img_size = tuple(config['img_size'])
+        else:
+            input_shape = config.get('build_config', {}).get('input_shape')
+            if input_shape and len(input_shape) == 4 and input_shape[1] and input_shape[2]:
+                self.img_size = (input_shape[1], input_shape[2])
+
+    def load_model(self):
+        """Load the trained model and metadata from local artifacts only (no downloads)"""
+        self.status = 'loading'
+        self.error = None
+        self.backend = None
+        started = time.monotonic()
+        try:
+            self.load_metadata()
+            if Config.INFERENCE_BACKEND == 'tflite':
+                self._load_quantized()
+            if self.backend is None:
+                self._load_keras()
+            self.version = self._artifact_version()
+            if Config.MODEL_WARMUP:
+                self.warmup()
+            self.status = 'ready'
+            MODEL_LOAD_SECONDS.labels(self.backend).set(time.monotonic() - started)
+
+        except ModelArtifactsMissing as e:
+            print(f"❌ Model artifacts missing: {e}")
+            self._unload()
+            self.status = 'missing_artifacts'
+            self.error = str(e)
+        except Exception as e:
+            print(f"❌ Error loading model: {e}")
+            self._unload()
+            self.status = 'failed'
+            self.error = str(e)
+
+    def _unload(self):
+        self.embedding_namespace = Config.EMBEDDING_NAMESPACE
+        self.model = None
+        self.backbone = None
+        self.head_weights = None
+        self.backend = None
+        self._forward_fn = None
+        self._interpreter = None
+
+    def _load_keras(self):
+        self.model = self._build_from_artifacts()
+        self._split_backbone_and_head()
+        self._compile_forward()
+        self.backend = 'tensorflow'
+        print(f"✅ Model loaded with {self.model.output_shape[-1]} classes")
+
+    def _load_quantized(self):
+        """Quantized TFLite backbone + float32 head, only once its accuracy report passes the gate"""
+        from backend.utils.quantization import check_quantization_gate, read_quantization_report, load_interpreter
+
+        reason = check_quantization_gate(self.model_path)
+        if reason is not None:
+            print(f"⚠️ Warning: Quantized backend disabled ({reason}), using float32 model")
+            return
+
+        report = read_quantization_report(self.model_path)
+        tflite_path = os.path.join(self.model_path, Config.TFLITE_MODEL)
+        shared = _shared_buffer(tflite_path)
+        if shared is not None:
+            self._interpreter = load_interpreter(model_content=shared, default_delegates=False)
+        else:
+            self._interpreter = load_interpreter(model_path=tflite_path)
+        self._interpreter_batch = None
+        head = np.load(os.path.join(self.model_path, Config.TFLITE_HEAD))
+        self.head_weights = (head['kernel'].astype(np.float32), head['bias'].astype(np.float32))
+        # The gate already checked the report's sha256 against the file
+        self.embedding_namespace = f"{Config.EMBEDDING_NAMESPACE}-tflite-{report['tflite_sha256'][:16]}"
+        self.backend = 'tflite'
+        print(f"✅ Quantized model loaded ({report['mode']}, top-1 agreement {report['top1_agreement']:.4f})")
+
+    def _artifact_version(self):
+        """Short fingerprint of the artifacts on disk; changes whenever the model is replaced"""
+        digest = hashlib.sha1()
+        digest.update(f"{self.backend};".encode())
+        filenames = [Config.MODEL_FULL_ARTIFACT, 'model.weights.h5', 'config.json', 'metadata.json']
+        if self.backend == 'tflite':
+            filenames = [Config.TFLITE_MODEL, Config.TFLITE_HEAD, 'metadata.json']
+        for filename in filenames:
+            path = os.path.join(self.model_path, filename)
+            if os.path.exists(path):
+                stat = os.stat(path)
+                digest.update(f"{filename}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+        return digest.hexdigest()[:12]
+
+    def _build_from_artifacts(self):
+        full_model_path = os.path.join(self.model_path, Config.MODEL_FULL_ARTIFACT)
+        weights_path = os.path.join(self.model_path, 'model.weights.h5')
+        # Checked before importing TensorFlow, which alone takes seconds
+        if not os.path.exists(full_model_path) and not os.path.exists(weights_path):
+            raise ModelArtifactsMissing(
+                f"neither {Config.MODEL_FULL_ARTIFACT} nor model.weights.h5 found in {self.model_path}"
+            )
+
+        import tensorflow as tf  # noqa: F401  (initialises the TF runtime for keras)
+        import keras
+
+        # 1. A full saved model (architecture + weights) needs nothing else
+        if os.path.exists(full_model_path):
+            print(f"🔄 Loading full model from: {full_model_path}")
+            return keras.models.load_model(full_model_path, compile=False)
+
+        # 2. Otherwise: architecture from config.json + trained weights
+
+        model = self._build_architecture()
+        model.load_weights(weights_path)
+        print("✅ Model weights loaded successfully")
+        return model
+
+    def _build_architecture(self):
+        """Rebuild the untrained architecture without fetching ImageNet weights"""
+        import keras
+
+        config_path = os.path.join(self.model_path, 'config.json')
+        if os.path.exists(config_path):
+            try:
+                with open(config_path, 'r') as f:
+                    return keras.models.model_from_json(f.read())
+            except Exception as e:
+                # config.json is tied to the keras version it was saved with
+                print(f"⚠️ Warning: Could not rebuild model from config.json ({e}), using the built-in architecture")
+
+        # Same topology as training, with randomly initialised weights
+        base_model = keras.applications.ResNet50V2(
+            weights=None,
+            include_top=False,
+            input_shape=(self.img_size[0], self.img_size[1], 3)
+        )
+        base_model.trainable = False
+
+        return keras.models.Sequential([
+            base_model,
+            keras.layers.GlobalAveragePooling2D(),
+            keras.layers.Dense(self.num_classes, activation="softmax")
+        ])
+
+    def _split_backbone_and_head(self):
+        """Expose the pooled-embedding backbone and the softmax Dense head separately"""
+        import keras
+
+        head = self.model.layers[-1]
+        if not isinstance(head, keras.layers.Dense) or getattr(head.activation, '__name__', '') != 'softmax':
+            print("⚠️ Warning: Model does not end in a softmax Dense head, embeddings disabled")
+            self.backbone = None
+            self.head_weights = None
+            return
+
+        self.backbone = keras.Model(inputs=self.model.inputs, outputs=self.model.layers[-2].output)
+        kernel, bias = head.get_weights()
+        self.head_weights = (kernel.astype(np.float32), bias.astype(np.float32))
+        self.embedding_namespace = f"{Config.EMBEDDING_NAMESPACE}-{self._backbone_fingerprint()}"
+
+    def _backbone_fingerprint(self):
+        """sha256 of the backbone weights only, so a head retrain keeps stored embeddings valid"""
+        digest = hashlib.sha256()
+        for weights in self.backbone.get_weights():
+            digest.update(str(weights.shape).encode())
+            digest.update(np.ascontiguousarray(weights).tobytes())
+        return digest.hexdigest()[:16]
+
+    def _compile_forward(self):
+        """Trace the forward pass once with a fixed (None, H, W, 3) float32 signature.
+
+        Calling the traced function skips the per-call data adapter and
+        callback machinery of model.predict(), which dominates at batch size 1.
+        """
+        self._forward_fn = None
+        if Config.INFERENCE_MODE != 'compiled':
+            return
+
+        import tensorflow as tf
+
+        target = self.backbone if self.backbone is not None else self.model
+        signature = [tf.TensorSpec([None, self.img_size[0], self.img_size[1], 3], tf.float32)]
+        self._forward_fn = tf.function(
+            lambda images: target(images, training=False),
+            input_signature=signature,
+            jit_compile=Config.MODEL_XLA
+        )
+
+    def _batch_buckets(self):
+        """Padded batch sizes used under XLA, which compiles one program per input shape"""
+        buckets, size = [], 1
+        while size < Config.BATCH_MAX_SIZE:
+            buckets.append(size)
+            size *= 2
+        buckets.append(max(1, Config.BATCH_MAX_SIZE))
+        return buckets
+
+    def _forward_quantized(self, batch):
+        # A TFLite interpreter is not thread-safe; resize only when the batch size changes
+        with self._interpreter_lock:
+            input_index = self._interpreter.get_input_details()[0]['index']
+            if self._interpreter_batch != len(batch):
+                self._interpreter.resize_tensor_input(input_index, list(batch.shape))
+                self._interpreter.allocate_tensors()
+                self._interpreter_batch = len(batch)
+            self._interpreter.set_tensor(input_index, batch)
+            self._interpreter.invoke()
+            return self._interpreter.get_tensor(self._interpreter.get_output_details()[0]['index']).copy()
+
+    def _forward(self, batch):
+        """Backbone embeddings when the head is split off, otherwise class probabilities"""
+        if self.backend == 'tflite':
+            return self._forward_quantized(np.asarray(batch, dtype=np.float32))
+
+        target = self.backbone if self.backbone is not None else self.model
+        if self._forward_fn is None:
+            return target.predict(batch, verbose=0)
+
+        batch = np.asarray(batch, dtype=np.float32)
+        if not Config.MODEL_XLA:
+            return self._forward_fn(batch).numpy()
+
+        # Pad to a fixed bucket so XLA reuses the programs compiled at warm-up
+        largest = self._batch_buckets()[-1]
+        outputs = []
+        for start in range(0, len(batch), largest):
+            chunk = batch[start:start + largest]
+            bucket = next(size for size in self._batch_buckets() if size >= len(chunk))
+            if bucket > len(chunk):
+                padding = np.zeros((bucket - len(chunk),) + chunk.shape[1:], dtype=np.float32)
+                chunk = np.concatenate([chunk, padding])
+            outputs.append(self._forward_fn(chunk).numpy()[:len(batch) - start])
+        return np.concatenate(outputs)
+
+    def warmup(self):
+        """Run dummy batches so the first user request does not pay the trace/compile cost"""
+        started = time.monotonic()
+        sizes = self._batch_buckets() if self._forward_fn is not None and Config.MODEL_XLA else [1]
+        for size in sizes:
+            self._forward(np.zeros((size, self.img_size[0], self.img_size[1], 3), dtype=np.float32))
+        print(f"🔥 Model warmed up in {time.monotonic() - started:.2f}s (batch sizes {sizes})")
+
+    def preprocess_image(self, image, timer=None):
+        """Turn a PIL image, path or file object into a normalised (H, W, 3) float32 array"""
+        with timed(timer, 'decode'):
+            if not isinstance(image, Image.Image):
+                image = Image.open(image)
+            image.load()
+            if image.mode != 'RGB':
+                image = image.convert('RGB')
+        with timed(timer, 'resize'):
+            image = image.resize(self.img_size)
+        with timed(timer, 'normalize'):
+            return np.asarray(image, dtype=np.float32) / 255.0
+
+    def predict_batch(self, batch):
+        """Run the model on a stacked (N, H, W, 3) batch and return class probabilities"""
+        if self.head_weights is None:
+            return self._forward(batch)
+        return self.classify_embeddings(self.embed_batch(batch))
+
+    def embed_batch(self, batch):
+        """Run only the frozen backbone and return the (N, D) pooled embeddings"""
+        return self._forward(batch)
+
+    def classify_embeddings(self, embeddings):
+        """Apply the Dense softmax head to (N, D) embeddings: one matrix multiply, no CNN pass"""
+        kernel, bias = self.head_weights
+        logits = np.asarray(embeddings, dtype=np.float32) @ kernel + bias
+        logits -= logits.max(axis=1, keepdims=True)
+        exp = np.exp(logits)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def class_name(self, index):
+        if index < len(self.class_names):
+            return self.class_names[index]
+        return "Unknown"
+
+    def top_k(self, probabilities, k=2):
+        """Return the k most likely (class_name, confidence) pairs for one image"""
+        indices = np.argsort(probabilities)[::-1][:k]
+        return [(self.class_name(int(i)), float(probabilities[i])) for i in indices]
+
+
+# ---------------------------------------------------
+# Registry: each model is loaded once per process
+# ---------------------------------------------------
+_MODELS = {}
+_LOCK = threading.Lock()
+_SWAP_LISTENERS = []
+_LOADING = set()
+_WARMUP_THREADS = {}
+# name -> (failed attempts, monotonic time of the next allowed retry)
+_FAILURES = {}
+
+# Pre-fork serving (GUNICORN_PRELOAD): TensorFlow must not start in the master,
+# so warm-ups are deferred until after_fork() and only raw weight bytes are
+# read before fork, to be shared copy-on-write by every worker.
+_SHARED_BUFFERS = {}
+_DEFERRED_WARMUPS = []
+_FORKED = False
+
+
+def _file_key(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def share_weights(model_path=None):
+    """Read the quantized backbone into memory so forked workers map the same pages.
+
+    Only the TFLite backend can run from a shared buffer: Keras copies the
+    weights into TensorFlow-owned tensors in each process.
+    """
+    from backend.utils.quantization import check_quantization_gate
+
+    model_path = model_path or Config.MODEL_PATH
+    if Config.INFERENCE_BACKEND != 'tflite' or not Config.TFLITE_SHARE_WEIGHTS:
+        print("⚠️ Warning: Weights are only shared with INFERENCE_BACKEND=tflite, each worker loads its own copy")
+        return None
+    reason = check_quantization_gate(model_path)
+    if reason is not None:
+        print(f"⚠️ Warning: Weights not shared ({reason}), each worker loads its own copy")
+        return None
+
+    path = os.path.join(model_path, Config.TFLITE_MODEL)
+    key = _file_key(path)
+    with open(path, 'rb') as f:
+        _SHARED_BUFFERS[path] = (key, f.read())
+    print(f"✅ Shared {key[1] / 1e6:.1f} MB of model weights with all workers")
+    return path
+
+
+def _shared_buffer(path):
+    """The pre-fork buffer for path, unless the file was replaced since it was read"""
+    entry = _SHARED_BUFFERS.get(path)
+    if entry is None or not os.path.exists(path) or _file_key(path) != entry[0]:
+        return None
+    return entry[1]
+
+
+def _load(name):
+    model = PlantDiseaseModel()
+    # Fail fast instead of booting a worker that can only answer errors
+    if not model.loaded and Config.MODEL_REQUIRED:
+        raise ModelLoadError(f"Model '{name}' {model.status}: {model.error}")
+    return model
+
+
+def _retry_due(name):
+    failure = _FAILURES.get(name)
+    return failure is None or time.monotonic() >= failure[1]
+
+
+def _record_attempt(name, model):
+    """Reset the backoff after a successful load, otherwise double it (up to MODEL_RETRY_MAX_SECONDS)"""
+    if model.loaded:
+        _FAILURES.pop(name, None)
+        return
+    attempts = _FAILURES.get(name, (0, 0.0))[0] + 1
+    delay = min(Config.MODEL_RETRY_MAX_SECONDS, Config.MODEL_RETRY_SECONDS * 2 ** (attempts - 1))
+    _FAILURES[name] = (attempts, time.monotonic() + delay)
+    print(f"🔄 Model '{name}' load attempt {attempts} failed, next retry in {delay:.0f}s")
+
+
+def get_model(name='default'):
+    """Return the shared PlantDiseaseModel instance, loading it on first use.
+
+    A failed load is kept (callers check ``model.loaded``) and retried on the
+    first call after its backoff expires, so fixing the artifacts does not
+    need a restart.
+    """
+    model = _MODELS.get(name)
+    if model is not None and (model.loaded or not _retry_due(name)):
+        return model
+    with _LOCK:
+        model = _MODELS.get(name)
+        if model is None or (not model.loaded and _retry_due(name)):
+            _LOADING.add(name)
+            try:
+                model = _MODELS[name] = _load(name)
+            finally:
+                _LOADING.discard(name)
+            _record_attempt(name, model)
+        return model
+
+
+def model_state(name='default'):
+    """Status of a model without loading it or waiting for a load in progress.
+
+    'not_loaded' before the first load, 'loading' while a load or retry runs,
+    then the instance's own status ('ready', 'missing_artifacts', 'failed').
+    """
+    if name in _LOADING:
+        return 'loading'
+    model = _MODELS.get(name)
+    return model.status if model is not None else 'not_loaded'
+
+
+def start_warmup(name='default', background=False):
+    """Load and warm the model in a background thread (once per process); returns immediately.
+
+    Does nothing while the model is loaded, loading, or a failed load is
+    still backing off. With MODEL_REQUIRED the load runs in the caller
+    instead, so a worker without a model still fails at boot rather than
+    serving 503s; background=True (readiness probes) never blocks.
+    """
+    if Config.GUNICORN_PRELOAD and not _FORKED:
+        if name not in _DEFERRED_WARMUPS:
+            share_weights()
+            _DEFERRED_WARMUPS.append(name)
+        return None
+    if Config.MODEL_REQUIRED and not background:
+        get_model(name)
+        return None
+    thread = _WARMUP_THREADS.get((name, os.getpid()))
+    model = _MODELS.get(name)
+    if (thread is not None and thread.is_alive()) or name in _LOADING:
+        return thread
+    if model is not None and (model.loaded or not _retry_due(name)):
+        return thread
+
+    def warm():
+        try:
+            get_model(name)
+        except ModelLoadError as e:
+            print(f"❌ {e}")
+
+    thread = threading.Thread(target=warm, name=f"model-warmup-{name}", daemon=True)
+    _WARMUP_THREADS[(name, os.getpid())] = thread
+    thread.start()
+    return thread
+
+
+def after_fork():
+    """Start the warm-ups deferred in the gunicorn master (called from post_fork)"""
+    global _FORKED
+    _FORKED = True
+    for name in _DEFERRED_WARMUPS:
+        start_warmup(name)
+
+
+def on_model_swap(callback):
+    """Register callback(name, old_model, new_model), called after reload_model() swaps a model"""
+    _SWAP_LISTENERS.append(callback)
+    return callback
+
+
+def reload_model(name='default'):
+    """Load the artifacts again and atomically replace the shared instance"""
+    new_model = _load(name)
+    with _LOCK:
+        old_model = _MODELS.get(name)
+        _MODELS[name] = new_model
+        _record_attempt(name, new_model)
+    for callback in _SWAP_LISTENERS:
+        callback(name, old_model, new_model)
+    return new_model
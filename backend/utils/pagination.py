@@ -0,0 +1,38 @@
+import base64
+import datetime
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(date, row_id):
+    """Opaque keyset cursor for the (date, id) of the last row on a page"""
+    if isinstance(date, datetime.datetime):
+        date = date.isoformat(sep=' ')
+    raw = f"{date}|{row_id}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor: returns (datetime, id) or raises InvalidCursor"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        date, row_id = base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8').rsplit('|', 1)
+        return datetime.datetime.fromisoformat(date), int(row_id)
+    except (ValueError, UnicodeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor!r}") from e
+
+
+def parse_date_bound(value, end=False):
+    """Parse an ISO date/datetime query parameter.
+
+    A bare date used as an upper bound (``end=True``) covers the whole day,
+    so the caller should compare with ``<`` against the returned value.
+    """
+    if not value:
+        return None
+    parsed = datetime.datetime.fromisoformat(value)
+    if end and len(value) == 10:
+        parsed += datetime.timedelta(days=1)
+    return parsed
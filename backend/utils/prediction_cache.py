@@ -0,0 +1,64 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from backend.utils.metrics import PREDICTION_CACHE_HITS, PREDICTION_CACHE_MISSES, PREDICTION_CACHE_ENTRIES
+
+
+def content_hash(data):
+    """SHA-256 of the raw upload bytes"""
+    return hashlib.sha256(data).hexdigest()
+
+
+class PredictionCache:
+    """Bounded in-process LRU of prediction results keyed by image hash + model version.
+
+    ``ttl_seconds`` of 0 (or None) keeps entries until they are evicted.
+    """
+
+    def __init__(self, max_entries=1024, ttl_seconds=0):
+        self.max_entries = max(0, int(max_entries))
+        self.ttl = float(ttl_seconds or 0)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(data_hash, model_version):
+        return f"{model_version}:{data_hash}"
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, stored_at = entry
+                if self.ttl and time.monotonic() - stored_at > self.ttl:
+                    del self._entries[key]
+                    entry = None
+                else:
+                    self._entries.move_to_end(key)
+            size = len(self._entries)
+
+        PREDICTION_CACHE_ENTRIES.set(size)
+        if entry is None:
+            PREDICTION_CACHE_MISSES.inc()
+            return None
+        PREDICTION_CACHE_HITS.inc()
+        return value
+
+    def put(self, key, value):
+        if not self.max_entries:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            size = len(self._entries)
+        PREDICTION_CACHE_ENTRIES.set(size)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        PREDICTION_CACHE_ENTRIES.set(0)
+
@@ -0,0 +1,235 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import numpy as np
+
+from backend.config import Config
+
+QUANTIZATION_MODES = ('dynamic', 'float16', 'int8')
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_interpreter(model_path=None, model_content=None, num_threads=None, default_delegates=True):
+    """Create a TFLite interpreter, preferring the standalone LiteRT runtime when installed.
+
+    default_delegates=False skips XNNPACK, which repacks the weights into
+    private memory; the interpreter then reads them straight from model_content.
+    """
+    try:
+        from ai_edge_litert.interpreter import Interpreter, OpResolverType
+    except ImportError:
+        import tensorflow as tf
+        Interpreter = tf.lite.Interpreter
+        OpResolverType = tf.lite.experimental.OpResolverType
+    options = {}
+    if not default_delegates:
+        options['experimental_op_resolver_type'] = OpResolverType.BUILTIN_WITHOUT_DEFAULT_DELEGATES
+    return Interpreter(model_path=model_path, model_content=model_content,
+                       num_threads=num_threads or Config.TFLITE_THREADS, **options)
+
+
+def read_quantization_report(model_path=None):
+    path = os.path.join(model_path or Config.MODEL_PATH, Config.QUANTIZATION_REPORT)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def float_artifact_path(model_path=None):
+    """The float32 artifact PlantDiseaseModel loads (full model first, then weights), or None"""
+    model_path = model_path or Config.MODEL_PATH
+    for filename in (Config.MODEL_FULL_ARTIFACT, 'model.weights.h5'):
+        path = os.path.join(model_path, filename)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def check_quantization_gate(model_path=None):
+    """Return None when the quantized backend may be enabled, otherwise the reason it may not.
+
+    The report must match the .tflite file and head.npz byte for byte, and,
+    when the float32 artifact is deployed alongside, the float weights it was
+    built from: a retrained float model disables a stale quantized one.
+    """
+    model_path = model_path or Config.MODEL_PATH
+    tflite_path = os.path.join(model_path, Config.TFLITE_MODEL)
+    if not os.path.exists(tflite_path):
+        return f"{Config.TFLITE_MODEL} not found"
+    head_path = os.path.join(model_path, Config.TFLITE_HEAD)
+    if not os.path.exists(head_path):
+        return f"{Config.TFLITE_HEAD} not found"
+
+    report = read_quantization_report(model_path)
+    if report is None:
+        return f"{Config.QUANTIZATION_REPORT} not found; run python -m backend.utils.quantization"
+    if report.get('tflite_sha256') != file_sha256(tflite_path):
+        return "quantization report does not match the current .tflite file"
+    if report.get('head_sha256') != file_sha256(head_path):
+        return f"quantization report does not match the current {Config.TFLITE_HEAD}"
+    float_path = float_artifact_path(model_path)
+    if float_path is not None and report.get('float_weights_sha256') != file_sha256(float_path):
+        return (f"{os.path.basename(float_path)} changed since quantization; "
+                "run python -m backend.utils.quantization again")
+    if report.get('top1_agreement', 0.0) < Config.QUANTIZATION_MIN_AGREEMENT:
+        return (f"top-1 agreement {report.get('top1_agreement', 0.0):.4f} is below "
+                f"QUANTIZATION_MIN_AGREEMENT={Config.QUANTIZATION_MIN_AGREEMENT}")
+    return None
+
+
+def _load_images(model, folder, limit):
+    images = []
+    for filename in sorted(os.listdir(folder)):
+        if len(images) >= limit:
+            break
+        path = os.path.join(folder, filename)
+        if not os.path.isfile(path):
+            continue
+        try:
+            images.append(model.preprocess_image(path))
+        except Exception as e:
+            print(f"⚠️ Skipping {filename}: {e}", file=sys.stderr)
+    return images
+
+
+def convert_backbone(model, mode, calibration_images=()):
+    """Post-training quantization of the embedding backbone (the Dense head stays float32)"""
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model.backbone)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if mode == 'float16':
+        converter.target_spec.supported_types = [tf.float16]
+    elif mode == 'int8':
+        if not calibration_images:
+            raise ValueError("int8 quantization needs calibration images")
+
+        def representative_dataset():
+            for image in calibration_images:
+                yield [image[np.newaxis].astype(np.float32)]
+
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    return converter.convert()
+
+
+def _tflite_embed(interpreter, images):
+    input_index = interpreter.get_input_details()[0]['index']
+    output_index = interpreter.get_output_details()[0]['index']
+    interpreter.resize_tensor_input(input_index, [1] + list(images[0].shape))
+    interpreter.allocate_tensors()
+    embeddings = []
+    for image in images:
+        interpreter.set_tensor(input_index, image[np.newaxis].astype(np.float32))
+        interpreter.invoke()
+        embeddings.append(interpreter.get_tensor(output_index)[0].copy())
+    return np.stack(embeddings)
+
+
+def evaluate_agreement(model, tflite_path, images):
+    """Compare the quantized backbone (+ float32 head) against the float32 model on ``images``"""
+    started = time.monotonic()
+    reference = np.concatenate([model.predict_batch(image[np.newaxis]) for image in images])
+    float_ms = (time.monotonic() - started) / len(images) * 1000
+
+    interpreter = load_interpreter(model_path=tflite_path)
+    started = time.monotonic()
+    quantized = model.classify_embeddings(_tflite_embed(interpreter, images))
+    quant_ms = (time.monotonic() - started) / len(images) * 1000
+
+    return {
+        'samples': len(images),
+        'top1_agreement': float(np.mean(reference.argmax(axis=1) == quantized.argmax(axis=1))),
+        'max_abs_prob_diff': float(np.abs(reference - quantized).max()),
+        'float32_ms_per_image': round(float_ms, 2),
+        'quantized_ms_per_image': round(quant_ms, 2),
+    }
+
+
+# ---------------------------------------------------
+# CLI:
+#   python -m backend.utils.quantization --mode int8 --calibration-dir backend/uploads
+# ---------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the quantized TFLite backbone and its accuracy report")
+    parser.add_argument('--mode', choices=QUANTIZATION_MODES, default='dynamic')
+    parser.add_argument('--calibration-dir', default=Config.UPLOAD_FOLDER)
+    parser.add_argument('--calibration-samples', type=int, default=100)
+    parser.add_argument('--eval-dir', default=None, help="defaults to the calibration dir, skipping calibration images")
+    parser.add_argument('--eval-samples', type=int, default=200)
+    args = parser.parse_args(argv)
+
+    from backend.utils.model_registry import PlantDiseaseModel
+
+    # Always quantize from the float32 Keras model, whatever INFERENCE_BACKEND says
+    Config.INFERENCE_BACKEND = 'tensorflow'
+    model = PlantDiseaseModel()
+    if not model.supports_embeddings:
+        print(f"❌ Float32 model unavailable ({model.status}: {model.error})", file=sys.stderr)
+        return 1
+
+    # Calibration and evaluation images never overlap: agreement measured on
+    # the calibration set would flatter int8
+    same_dir = args.eval_dir and os.path.realpath(args.eval_dir) == os.path.realpath(args.calibration_dir)
+    calibration = []
+    if args.eval_dir and not same_dir:
+        if args.mode == 'int8':
+            calibration = _load_images(model, args.calibration_dir, args.calibration_samples)
+        evaluation = _load_images(model, args.eval_dir, args.eval_samples)
+    elif args.mode == 'int8':
+        images = _load_images(model, args.calibration_dir, args.calibration_samples + args.eval_samples)
+        count = min(args.calibration_samples, len(images) // 2)
+        if count < args.calibration_samples:
+            print(f"⚠️ Only {len(images)} images: {count} for calibration, {len(images) - count} for evaluation",
+                  file=sys.stderr)
+        calibration, evaluation = images[:count], images[count:count + args.eval_samples]
+    else:
+        # dynamic and float16 need no calibration, so every image is an evaluation image
+        evaluation = _load_images(model, args.calibration_dir, args.eval_samples)
+    if not evaluation or (args.mode == 'int8' and not calibration):
+        print("❌ Not enough images for disjoint calibration and evaluation sets", file=sys.stderr)
+        return 1
+
+    print(f"🔄 Converting backbone ({args.mode}, {len(calibration)} calibration images)")
+    tflite_path = os.path.join(model.model_path, Config.TFLITE_MODEL)
+    with open(tflite_path, 'wb') as f:
+        f.write(convert_backbone(model, args.mode, calibration))
+    kernel, bias = model.head_weights
+    head_path = os.path.join(model.model_path, Config.TFLITE_HEAD)
+    np.savez(head_path, kernel=kernel, bias=bias)
+
+    report = {
+        'mode': args.mode,
+        'tflite_sha256': file_sha256(tflite_path),
+        'tflite_bytes': os.path.getsize(tflite_path),
+        'head_sha256': file_sha256(head_path),
+        'float_model_version': model.version,
+        'float_weights_sha256': file_sha256(float_artifact_path(model.model_path)),
+        'calibration_samples': len(calibration),
+        'min_agreement_required': Config.QUANTIZATION_MIN_AGREEMENT,
+        **evaluate_agreement(model, tflite_path, evaluation),
+    }
+    with open(os.path.join(model.model_path, Config.QUANTIZATION_REPORT), 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(json.dumps(report, indent=2))
+    if report['top1_agreement'] < Config.QUANTIZATION_MIN_AGREEMENT:
+        print("❌ Agreement below threshold: INFERENCE_BACKEND=tflite will stay disabled", file=sys.stderr)
+        return 1
+    print("✅ Quantized backend can be enabled with INFERENCE_BACKEND=tflite")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
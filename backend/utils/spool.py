@@ -0,0 +1,162 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from backend.utils.metrics import (
+    SPOOL_RECORDS,
+    SPOOL_OLDEST_SECONDS,
+    SPOOL_APPENDED,
+    SPOOL_REPLAYED,
+    SPOOL_REPLAY_ERRORS,
+    SPOOL_DISCARDED,
+)
+
+
+class PermanentWriteError(Exception):
+    """Raised by a replay function for records the database will never accept"""
+
+
+class WriteSpool:
+    """Append-only local spool (SQLite in WAL mode) for writes made while MySQL is down.
+
+    Every record carries a unique ``record_id`` so ``replay_fn`` can insert
+    idempotently: a batch replayed twice (a crash between the MySQL commit and
+    the local delete, or two gunicorn workers draining the same file) does
+    not duplicate rows. A background replayer drains the spool once the
+    database is back, backing off exponentially while it is still down.
+    """
+
+    def __init__(self, path, replay_fn, batch_size=500, poll_seconds=5.0, max_backoff=300.0,
+                 name='spool'):
+        self.path = path
+        self.replay_fn = replay_fn
+        self.batch_size = max(1, int(batch_size))
+        self.poll_seconds = poll_seconds
+        self.max_backoff = max_backoff
+        self.name = name
+        self._lock = threading.Lock()
+        self._conn = None
+        self._thread = None
+        self._pid = None
+
+    # -----------------------------------------------
+    # Local storage
+    # -----------------------------------------------
+    def _connection(self):
+        # A sqlite3 connection must not be used across fork; one per process
+        if self._conn is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS spool (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    record_id TEXT UNIQUE NOT NULL,
+                    payload TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            self._conn = conn
+            self._pid = os.getpid()
+            self._thread = None
+        return self._conn
+
+    def append(self, records):
+        """Durably store records (tuples whose first item is the record_id)"""
+        now = time.time()
+        rows = [(record[0], json.dumps(list(record)), now) for record in records]
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.executemany("INSERT OR IGNORE INTO spool (record_id, payload, created_at) VALUES (?, ?, ?)", rows)
+        SPOOL_APPENDED.inc(len(rows))
+        self.update_metrics()
+        # The replayer polls on its own schedule: waking it per append would
+        # hammer a database that is already failing
+        self.start()
+
+    def peek(self, limit):
+        with self._lock:
+            cursor = self._connection().execute(
+                "SELECT seq, payload FROM spool ORDER BY seq LIMIT ?", (limit,))
+            return [(seq, tuple(json.loads(payload))) for seq, payload in cursor.fetchall()]
+
+    def delete(self, seqs):
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.executemany("DELETE FROM spool WHERE seq = ?", [(seq,) for seq in seqs])
+
+    def stats(self):
+        """(record count, oldest record timestamp or None)"""
+        with self._lock:
+            return self._connection().execute("SELECT COUNT(*), MIN(created_at) FROM spool").fetchone()
+
+    def update_metrics(self):
+        count, oldest = self.stats()
+        SPOOL_RECORDS.set(count)
+        SPOOL_OLDEST_SECONDS.set(time.time() - oldest if oldest else 0)
+        return count
+
+    # -----------------------------------------------
+    # Replay into MySQL
+    # -----------------------------------------------
+    def start(self):
+        """Start the replayer thread of this process (no-op when it is already running)"""
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            self._connection()
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name=f"{self.name}-replayer", daemon=True)
+            self._thread.start()
+
+    def _replay_batch(self, batch):
+        discarded = 0
+        try:
+            self.replay_fn([record for _, record in batch])
+        except PermanentWriteError:
+            # One bad record must not block the spool: retry one by one and drop the rejects
+            for seq, record in batch:
+                try:
+                    self.replay_fn([record])
+                except PermanentWriteError as e:
+                    discarded += 1
+                    SPOOL_DISCARDED.inc()
+                    print(f"❌ {self.name}: discarding record {record[0]}: {e}")
+        self.delete([seq for seq, _ in batch])
+        SPOOL_REPLAYED.inc(len(batch) - discarded)
+
+    def replay(self):
+        """Drain the spool into the database; returns the number of records replayed"""
+        replayed = 0
+        while True:
+            batch = self.peek(self.batch_size)
+            if not batch:
+                break
+            self._replay_batch(batch)
+            replayed += len(batch)
+        self.update_metrics()
+        return replayed
+
+    def _run(self):
+        backoff = self.poll_seconds
+        while True:
+            time.sleep(backoff)
+            try:
+                if not self.update_metrics():
+                    backoff = self.poll_seconds
+                    continue
+                replayed = self.replay()
+                print(f"✅ {self.name}: replayed {replayed} spooled records")
+                backoff = self.poll_seconds
+            except Exception as e:
+                SPOOL_REPLAY_ERRORS.inc()
+                backoff = min(backoff * 2, self.max_backoff)
+                print(f"⚠️ {self.name}: replay failed, retrying in {backoff:.0f}s: {e}")
@@ -0,0 +1,103 @@
+import os
+import threading
+import time
+
+from PIL import Image, ImageOps
+
+from backend.config import Config
+from backend.utils.disk_lru import shared_disk_lru
+from backend.utils.metrics import (
+    THUMBNAIL_REQUESTS,
+    THUMBNAIL_RENDER_SECONDS,
+    THUMBNAIL_CACHE_BYTES,
+    THUMBNAIL_EVICTIONS,
+)
+
+THUMBNAIL_FORMATS = {'webp': ('WEBP', 'image/webp'), 'jpeg': ('JPEG', 'image/jpeg')}
+
+
+class ThumbnailCache:
+    """Derived-image cache for uploads: fixed sizes, WebP/JPEG, bounded on disk.
+
+    Thumbnails live under ``<root>/<size>/<filename>.<ext>`` and are written
+    atomically. A shared ``DiskLRU`` sweeper keeps the folder under
+    ``max_bytes`` across all workers by evicting least recently used files.
+    Concurrent requests for the same missing thumbnail share one render.
+    """
+
+    def __init__(self, root=None, max_bytes=None, quality=None):
+        self.root = root or Config.THUMBNAIL_FOLDER
+        self.max_bytes = int(max_bytes if max_bytes is not None else Config.THUMBNAIL_CACHE_MAX_MB * 1024 * 1024)
+        self.quality = quality or Config.THUMBNAIL_QUALITY
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._lru = shared_disk_lru(
+            self.root, self.max_bytes, name='thumbnails',
+            bytes_gauge=THUMBNAIL_CACHE_BYTES, evictions_counter=THUMBNAIL_EVICTIONS
+        ) if self.max_bytes else None
+
+    def path_for(self, filename, size, fmt):
+        # The full filename: a.jpg and a.png are different uploads
+        return os.path.join(self.root, str(size), f"{filename}.{fmt}")
+
+    # -----------------------------------------------
+    # Render
+    # -----------------------------------------------
+    def _render(self, source_path, target_path, size, fmt):
+        started = time.perf_counter()
+        with Image.open(source_path) as image:
+            # Let the JPEG decoder downscale while decoding (much cheaper than a full decode)
+            image.draft('RGB', (size * 2, size * 2))
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((size, size), Image.LANCZOS)
+            has_alpha = image.mode in ('RGBA', 'LA') or 'transparency' in image.info
+            image = image.convert('RGBA' if has_alpha and fmt == 'webp' else 'RGB')
+
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+            tmp_path = f"{target_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            image.save(tmp_path, THUMBNAIL_FORMATS[fmt][0], quality=self.quality, optimize=True)
+        os.replace(tmp_path, target_path)
+        THUMBNAIL_RENDER_SECONDS.labels(fmt).observe(time.perf_counter() - started)
+        if self._lru is not None:
+            self._lru.record(target_path, os.path.getsize(target_path))
+
+    def get(self, source_path, filename, size, fmt):
+        """Path of the thumbnail, rendering it first if needed (one render per key at a time)"""
+        target_path = self.path_for(filename, size, fmt)
+        if os.path.exists(target_path):
+            THUMBNAIL_REQUESTS.labels('hit').inc()
+            if self._lru is not None:
+                self._lru.touch(target_path)
+            return target_path
+
+        # Single-flight: the first request renders, the others wait for it
+        with self._lock:
+            event = self._inflight.get(target_path)
+            leader = event is None
+            if leader:
+                event = self._inflight[target_path] = threading.Event()
+
+        if not leader:
+            THUMBNAIL_REQUESTS.labels('coalesced').inc()
+            event.wait(30)
+            if os.path.exists(target_path):
+                return target_path
+
+        THUMBNAIL_REQUESTS.labels('render').inc()
+        try:
+            self._render(source_path, target_path, size, fmt)
+        finally:
+            if leader:
+                with self._lock:
+                    self._inflight.pop(target_path, None)
+                event.set()
+        return target_path
+
+
+def negotiate_format(requested, accept_mimetypes):
+    """Explicit ?format= wins; otherwise WebP for clients that accept it, else JPEG"""
+    if requested:
+        return requested if requested in THUMBNAIL_FORMATS else None
+    # Only an explicit image/webp counts: */* clients (curl, old apps) keep JPEG
+    webp = any(value == 'image/webp' and quality > 0 for value, quality in accept_mimetypes)
+    return 'webp' if webp else 'jpeg'
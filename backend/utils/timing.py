@@ -0,0 +1,77 @@
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from backend.config import Config
+from backend.utils.metrics import PREDICT_STAGE_SECONDS
+
+logger = logging.getLogger('plantpal.timing')
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+class StageTimer:
+    """Accumulates wall time per named stage of one request.
+
+    Stages run in worker threads (parallel decode) are summed, so for a batch
+    request they show the total time spent in that stage across images.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def total(self):
+        return time.perf_counter() - self.started
+
+    def server_timing_header(self):
+        """Value for the Server-Timing response header (durations in ms)"""
+        with self._lock:
+            parts = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.stages.items()]
+        parts.append(f"total;dur={self.total() * 1000:.2f}")
+        return ', '.join(parts)
+
+    def report(self, endpoint, status_code):
+        """Record the stage histograms and emit one structured log line"""
+        with self._lock:
+            stages = dict(self.stages)
+        for name, seconds in stages.items():
+            PREDICT_STAGE_SECONDS.labels(endpoint=endpoint, stage=name).observe(seconds)
+        if not Config.TIMING_LOG:
+            return
+        logger.info(json.dumps({
+            'event': 'predict_timing',
+            'endpoint': endpoint,
+            'status': status_code,
+            'total_ms': round(self.total() * 1000, 2),
+            **{f"{name}_ms": round(seconds * 1000, 2) for name, seconds in stages.items()},
+        }))
+
+
+@contextmanager
+def timed(timer, name):
+    """timer.stage(name) when a timer is given, otherwise a no-op"""
+    if timer is None:
+        yield
+    else:
+        with timer.stage(name):
+            yield
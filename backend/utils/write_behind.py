@@ -0,0 +1,161 @@
+import atexit
+import os
+import queue
+import threading
+import time
+
+from backend.utils.metrics import (
+    WRITE_BEHIND_QUEUE_DEPTH,
+    WRITE_BEHIND_LAG_SECONDS,
+    WRITE_BEHIND_BATCH_SIZE,
+    WRITE_BEHIND_FLUSHED,
+    WRITE_BEHIND_ERRORS,
+    WRITE_BEHIND_DROPPED,
+)
+
+_BUFFERS = []
+_STOP = object()
+
+
+class WriteBehindBuffer:
+    """Accept records immediately and commit them later in coalesced batches.
+
+    A background thread collects queued records until ``max_batch_size`` is
+    reached or ``max_wait_ms`` has passed since the first one, then hands the
+    whole batch to ``flush_fn`` (one multi-row insert). ``flush()`` drains
+    everything that is still queued and runs at interpreter exit.
+
+    Batches that still fail after ``retries`` are handed to ``on_failure``
+    (e.g. the local spool) instead of being dropped, when one is given.
+    """
+
+    def __init__(self, flush_fn, max_batch_size=100, max_wait_ms=200, max_queue=10000,
+                 retries=3, name='write-behind', on_failure=None):
+        self.flush_fn = flush_fn
+        self.on_failure = on_failure
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.max_queue = int(max_queue)
+        self.retries = max(0, int(retries))
+        self.name = name
+        self._queue = queue.Queue(maxsize=self.max_queue)
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        _BUFFERS.append(self)
+
+    def submit(self, record):
+        """Queue one record; returns False when the queue is full (caller should write synchronously)"""
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait((record, time.monotonic()))
+        except queue.Full:
+            return False
+        WRITE_BEHIND_QUEUE_DEPTH.inc()
+        return True
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _ensure_worker(self):
+        # Same fork handling as MicroBatcher: threads do not survive fork
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            if self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=self.max_queue)
+                atexit.register(self.flush)
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def _collect_batch(self, block=True):
+        """Return (items, stop) where stop means flush() asked the thread to exit"""
+        try:
+            first = self._queue.get() if block else self._queue.get_nowait()
+        except queue.Empty:
+            return [], False
+        if first is _STOP:
+            return [], True
+        batch = [first]
+        deadline = first[1] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 and block else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        while True:
+            batch, stop = self._collect_batch()
+            if batch:
+                self._write(batch)
+            if stop:
+                self._drain()
+                return
+
+    def _drain(self):
+        while True:
+            batch, _ = self._collect_batch(block=False)
+            if not batch:
+                return
+            self._write(batch)
+
+    def _write(self, batch):
+        WRITE_BEHIND_QUEUE_DEPTH.dec(len(batch))
+        records = [record for record, _ in batch]
+        delay = 0.5
+        with self._write_lock:
+            for attempt in range(self.retries + 1):
+                try:
+                    self.flush_fn(records)
+                    break
+                except Exception as e:
+                    WRITE_BEHIND_ERRORS.inc()
+                    print(f"⚠️ {self.name}: flush of {len(records)} records failed (attempt {attempt + 1}): {e}")
+                    if attempt == self.retries:
+                        self._give_up(records)
+                        return
+                    time.sleep(delay)
+                    delay *= 2
+
+        committed = time.monotonic()
+        WRITE_BEHIND_BATCH_SIZE.observe(len(records))
+        WRITE_BEHIND_FLUSHED.inc(len(records))
+        for _, enqueued_at in batch:
+            WRITE_BEHIND_LAG_SECONDS.observe(committed - enqueued_at)
+
+    def _give_up(self, records):
+        if self.on_failure is not None:
+            try:
+                self.on_failure(records)
+                return
+            except Exception as e:
+                print(f"❌ {self.name}: failure handler raised: {e}")
+        WRITE_BEHIND_DROPPED.inc(len(records))
+        print(f"❌ {self.name}: dropped {len(records)} records")
+
+    def flush(self, timeout=30):
+        """Write out everything queued so far (graceful shutdown). The flusher thread exits."""
+        thread = self._thread
+        if thread is not None and thread.is_alive() and self._pid == os.getpid():
+            self._queue.put(_STOP)
+            thread.join(timeout)
+            if not thread.is_alive():
+                return
+        # No live flusher in this process (or it is stuck): drain from the caller's thread
+        self._drain()
+
+
+def flush_all(timeout=30):
+    """Flush every write-behind buffer in this process (gunicorn worker_exit hook)"""
+    for buffer in _BUFFERS:
+        buffer.flush(timeout)
@@ -77,6 +77,23 @@ window.API = {
         const data = await response.json();
         if (!response.ok) throw new Error(data.error || 'Prediction failed');
         return data;
+    },
+
+    // تحليل عدة صور في طلب واحد (النتائج بنفس ترتيب الملفات)
+    async predictBatch(imageFiles) {
+        const formData = new FormData();
+        for (const file of imageFiles) {
+            formData.append('image', file);
+        }
+
+        const response = await fetch(`${BASE_URL}/predict/batch`, {
+            method: 'POST',
+            body: formData
+        });
+
+        const data = await response.json();
+        if (!response.ok) throw new Error(data.error || 'Batch prediction failed');
+        return data.results;
     }
 };
 
@@ -0,0 +1,128 @@
+import os
+import sys
+import tempfile
+import datetime
+
+import pytest
+
+# قبل أي استيراد من backend: لا MySQL حقيقي، لا تحميل للموديل، وملفات مؤقتة خارج المستودع
+_TMP = tempfile.mkdtemp(prefix='plantpal-tests-')
+os.environ.setdefault('DB_HOST', '127.0.0.1')
+os.environ.setdefault('DB_PORT', '1')
+os.environ.setdefault('MODEL_BACKGROUND_LOAD', 'False')
+os.environ.setdefault('SPOOL_PATH', os.path.join(_TMP, 'spool', 'history.sqlite3'))
+os.environ.setdefault('THUMBNAIL_FOLDER', os.path.join(_TMP, 'thumbnails'))
+os.environ.setdefault('EMBEDDING_FOLDER', os.path.join(_TMP, 'embeddings'))
+os.environ.setdefault('PREDICT_JOB_FOLDER', os.path.join(_TMP, 'jobs'))
+os.environ.setdefault('HISTORY_STAMP_FOLDER', os.path.join(_TMP, 'history_stamps'))
+# الاختبارات تستدعي replay() مباشرة بدلاً من انتظار خيط الإعادة
+os.environ.setdefault('SPOOL_POLL_SECONDS', '3600')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# ---------------------------------------------------
+# اتصال MySQL وهمي بالحد الأدنى الذي يستخدمه المجمّع والمسارات
+# ---------------------------------------------------
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self._rows = []
+        self.rowcount = 0
+
+    def execute(self, query, params=None):
+        self.conn.queries.append((query, params))
+        if query.startswith('SELECT MAX(id)'):
+            ids = [row['id'] for row in self.conn.rows]
+            self._rows = [{'last_id': max(ids, default=None), 'total': len(ids)}]
+        else:
+            self._rows = list(self.conn.rows)
+
+    def executemany(self, query, seq_params):
+        self.conn.queries.append((query, list(seq_params)))
+
+    def fetchmany(self, size=1):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    in_transaction = False
+
+    def __init__(self, rows):
+        # نفس القائمة لكل الاتصالات: كأنها جدول واحد على الخادم
+        self.rows = rows
+        self.queries = []
+        self.closed = False
+
+    def cursor(self, *args, **kwargs):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def ping(self, reconnect=False):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def history_rows(count):
+    date = datetime.datetime(2026, 1, 1)
+    return [
+        {'id': i, 'disease_name': 'Tomato___healthy', 'confidence': 0.9,
+         'image_path': f'{i}.jpg', 'date': date + datetime.timedelta(minutes=i)}
+        for i in range(1, count + 1)
+    ]
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    """مجمّع صغير (اتصالان) باتصالات وهمية بدلاً من db.POOL"""
+    from backend.utils import db
+
+    pool = db.ConnectionPool(size=2, checkout_timeout=0.2, recycle_seconds=1800, ping_idle_seconds=5)
+    pool.rows = []
+    pool.connections = []
+
+    def connect():
+        # pool.rows قد يُستبدل داخل الاختبار، فنقرأه عند الاتصال
+        conn = FakeConnection(pool.rows)
+        pool.connections.append(conn)
+        return conn
+
+    pool._connect = connect
+    monkeypatch.setattr(db, 'POOL', pool)
+    return pool
+
+
+@pytest.fixture
+def app():
+    from backend.app import app
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def auth_headers(app):
+    from flask_jwt_extended import create_access_token
+    with app.app_context():
+        token = create_access_token(identity='7')
+    return {'Authorization': f'Bearer {token}'}
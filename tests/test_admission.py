@@ -0,0 +1,108 @@
+import threading
+import time
+
+import pytest
+
+from backend.utils.admission import AdmissionController, Overloaded
+
+
+def wait_for_queue(controller, depth):
+    deadline = time.monotonic() + 5
+    while controller._queued() < depth:
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def start_waiter(controller, lane, admitted):
+    def run():
+        try:
+            admitted.append((lane, controller.acquire(lane)))
+        except Overloaded as e:
+            admitted.append((lane, e))
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_requests_beyond_queue_are_rejected_with_retry_after():
+    controller = AdmissionController(max_in_flight=1, max_queue=0, priority_reserve=0)
+    admitted_at = controller.acquire()
+    with pytest.raises(Overloaded) as error:
+        controller.acquire()
+    assert error.value.reason == 'queue_full'
+    assert error.value.retry_after >= 1
+
+    controller.release(admitted_at)
+    controller.release(controller.acquire())
+    assert controller._in_flight == 0
+
+
+def test_priority_lane_has_reserved_places_and_is_served_first():
+    controller = AdmissionController(max_in_flight=1, max_queue=2, priority_reserve=1, queue_timeout=5)
+    admitted_at = controller.acquire()
+    admitted = []
+    anonymous = start_waiter(controller, 'default', admitted)
+    wait_for_queue(controller, 1)
+
+    # المكان الأخير في الطابور محجوز للمستخدمين المسجلين
+    with pytest.raises(Overloaded):
+        controller.acquire('default')
+    registered = start_waiter(controller, 'priority', admitted)
+    wait_for_queue(controller, 2)
+
+    # يُخدم المسجل أولاً رغم وصوله بعد الطلب المجهول
+    controller.release(admitted_at)
+    registered.join(5)
+    assert [lane for lane, _ in admitted] == ['priority']
+
+    controller.release(admitted[0][1])
+    anonymous.join(5)
+    assert [lane for lane, _ in admitted] == ['priority', 'default']
+    controller.release(admitted[1][1])
+    assert controller._in_flight == 0
+
+
+def test_slot_is_handed_over_without_being_freed():
+    controller = AdmissionController(max_in_flight=1, max_queue=1, priority_reserve=0, queue_timeout=5)
+    admitted_at = controller.acquire()
+    admitted = []
+    thread = start_waiter(controller, 'default', admitted)
+    wait_for_queue(controller, 1)
+
+    controller.release(admitted_at)
+    thread.join(5)
+    # المكان انتقل إلى المنتظر مباشرة فلا يسبقه طلب جديد
+    assert controller._in_flight == 1
+    assert controller._queued() == 0
+    controller.release(admitted[0][1])
+    assert controller._in_flight == 0
+
+
+def test_waiter_times_out_and_leaves_the_queue():
+    controller = AdmissionController(max_in_flight=1, max_queue=1, priority_reserve=0, queue_timeout=0.05)
+    admitted_at = controller.acquire()
+    with pytest.raises(Overloaded) as error:
+        controller.acquire()
+    assert error.value.reason == 'timeout'
+    assert controller._queued() == 0
+
+    controller.release(admitted_at)
+    assert controller._in_flight == 0
+
+
+def test_overloaded_predict_answers_503(monkeypatch, client):
+    from backend.routes import predict
+
+    controller = AdmissionController(max_in_flight=1, max_queue=0, priority_reserve=0)
+    monkeypatch.setattr(predict, 'ADMISSION', controller)
+    admitted_at = controller.acquire()
+
+    response = client.post('/api/predict')
+    assert response.status_code == 503
+    assert int(response.headers['Retry-After']) >= 1
+
+    controller.release(admitted_at)
+    # المكان متاح: يصل الطلب إلى المعالج (400 لعدم وجود صورة)
+    assert client.post('/api/predict').status_code == 400
+    assert controller._in_flight == 0
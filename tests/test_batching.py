@@ -0,0 +1,103 @@
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from backend.utils.batching import MicroBatcher
+
+
+class RecordingModel:
+    """يعيد مجموع كل صورة ويسجّل حجم كل دفعة"""
+
+    def __init__(self, fail=False):
+        self.batch_sizes = []
+        self.fail = fail
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, batch):
+        self.release.wait(5)
+        self.batch_sizes.append(len(batch))
+        if self.fail:
+            raise RuntimeError('forward pass failed')
+        return batch.reshape(len(batch), -1).sum(axis=1)
+
+
+def submit_concurrently(batcher, count):
+    results = [None] * count
+
+    def call(i):
+        try:
+            results[i] = batcher.submit(np.full((2, 2, 1), i, dtype=np.float32), timeout=5)
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    return results
+
+
+def test_concurrent_submits_share_one_forward_pass():
+    model = RecordingModel()
+    batcher = MicroBatcher(model, max_batch_size=8, max_wait_ms=200)
+
+    results = submit_concurrently(batcher, 8)
+
+    assert results == [4.0 * i for i in range(8)]
+    assert model.batch_sizes == [8]
+
+
+def test_batches_never_exceed_max_batch_size():
+    model = RecordingModel()
+    batcher = MicroBatcher(model, max_batch_size=3, max_wait_ms=200)
+    # أول دفعة تنتظر حتى تصطف كل الطلبات خلفها
+    model.release.clear()
+    threading.Timer(0.3, model.release.set).start()
+
+    results = submit_concurrently(batcher, 7)
+
+    assert results == [4.0 * i for i in range(7)]
+    assert max(model.batch_sizes) <= 3
+    assert sum(model.batch_sizes) == 7
+
+
+def test_forward_pass_error_reaches_every_caller_in_the_batch():
+    model = RecordingModel(fail=True)
+    batcher = MicroBatcher(model, max_batch_size=4, max_wait_ms=200)
+
+    results = submit_concurrently(batcher, 4)
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    # العامل يستمر بعد الخطأ
+    model.fail = False
+    assert batcher.submit(np.ones((2, 2, 1), dtype=np.float32), timeout=5) == 4.0
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs fork')
+def test_worker_thread_restarts_after_fork():
+    batcher = MicroBatcher(RecordingModel(), max_batch_size=4, max_wait_ms=1)
+    assert batcher.submit(np.ones((2, 2, 1), dtype=np.float32), timeout=5) == 4.0
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        # العملية الابنة: خيط الأب غير موجود هنا
+        code = 1
+        try:
+            os.close(read_fd)
+            result = batcher.submit(np.full((2, 2, 1), 2, dtype=np.float32), timeout=5)
+            os.write(write_fd, str(result).encode())
+            code = 0
+        finally:
+            os._exit(code)
+
+    os.close(write_fd)
+    _, status = os.waitpid(pid, 0)
+    with os.fdopen(read_fd) as f:
+        output = f.read()
+    assert os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0
+    assert output == '8.0'
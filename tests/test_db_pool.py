@@ -0,0 +1,74 @@
+import time
+
+import pytest
+
+
+def test_checkout_times_out_when_pool_is_exhausted(pool):
+    from backend.utils.db import DatabaseBusy
+
+    held = [pool.checkout() for _ in range(pool.size)]
+    with pytest.raises(DatabaseBusy):
+        pool.checkout()
+
+    held[0].close()
+    pool.checkout().close()
+    for conn in held[1:]:
+        conn.close()
+
+
+def test_released_connection_is_reused(pool):
+    first = pool.checkout()
+    first.close()
+    # close() مرتين لا يعيد الاتصال مرتين
+    first.close()
+    second = pool.checkout()
+    second.close()
+
+    assert len(pool.connections) == 1
+    assert pool._idle.qsize() == 1
+    assert pool._slots._value == pool.size
+
+
+def test_invalidated_connection_is_closed_not_reused(pool):
+    conn = pool.checkout()
+    conn.invalidate()
+    conn.close()
+
+    assert pool.connections[0].closed
+    assert pool._idle.qsize() == 0
+    pool.checkout().close()
+    assert len(pool.connections) == 2
+
+
+def test_idle_connection_past_recycle_age_is_replaced(pool):
+    pool.checkout().close()
+    conn, _ = pool._idle.get_nowait()
+    pool._idle.put((conn, time.monotonic() - pool.recycle_seconds - 1))
+
+    pool.checkout().close()
+    assert pool.connections[0].closed
+    assert len(pool.connections) == 2
+
+
+def test_idle_connection_failing_ping_is_replaced(pool):
+    pool.checkout().close()
+    conn, _ = pool._idle.get_nowait()
+
+    def dead_ping(reconnect=False):
+        raise OSError("server has gone away")
+
+    conn.ping = dead_ping
+    pool._idle.put((conn, time.monotonic() - pool.ping_idle_seconds - 1))
+
+    pool.checkout().close()
+    assert len(pool.connections) == 2
+
+
+def test_open_transaction_is_rolled_back_on_release(pool):
+    conn = pool.checkout()
+    raw = pool.connections[0]
+    raw.in_transaction = True
+    rolled_back = []
+    raw.rollback = lambda: rolled_back.append(True)
+    conn.close()
+    assert rolled_back == [True]
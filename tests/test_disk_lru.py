@@ -0,0 +1,89 @@
+import os
+import time
+
+import pytest
+
+from backend.utils.disk_lru import DiskLRU
+
+
+def write(root, name, size, age):
+    path = os.path.join(root, name)
+    with open(path, 'wb') as f:
+        f.write(b'x' * size)
+    stamp = time.time() - age
+    os.utime(path, (stamp, stamp))
+    return path
+
+
+def remaining(root):
+    return sorted(name for name in os.listdir(root) if not name.startswith('.'))
+
+
+def test_sweep_evicts_least_recently_used_down_to_low_water(tmp_path):
+    root = str(tmp_path)
+    for i in range(10):
+        # a0 هو الأقدم و a9 الأحدث، كل ملف في دقيقة مختلفة
+        write(root, f"a{i}", 100, age=(10 - i) * 120)
+
+    lru = DiskLRU(root, max_bytes=800, low_water=0.5)
+    assert lru.sweep() == 6
+    assert remaining(root) == ['a6', 'a7', 'a8', 'a9']
+    assert lru._bytes == 400
+
+
+def test_sweep_keeps_part_of_a_burst_written_in_one_minute(tmp_path):
+    root = str(tmp_path)
+    for i in range(10):
+        write(root, f"b{i}", 100, age=0)
+
+    lru = DiskLRU(root, max_bytes=800, low_water=0.9)
+    assert lru.sweep() == 3
+    assert len(remaining(root)) == 7
+
+
+def test_sweep_under_the_cap_removes_nothing(tmp_path):
+    root = str(tmp_path)
+    write(root, 'c0', 100, age=3600)
+
+    lru = DiskLRU(root, max_bytes=1000)
+    assert lru.sweep() == 0
+    assert remaining(root) == ['c0']
+    assert lru._bytes == 100
+
+
+def test_touch_refreshes_a_stale_mtime(tmp_path):
+    path = write(str(tmp_path), 'd0', 10, age=3600)
+    lru = DiskLRU(str(tmp_path), max_bytes=1000, sweep_interval=3600)
+    lru.touch(path)
+    assert time.time() - os.path.getmtime(path) < 60
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs flock')
+def test_only_one_sweeper_holds_the_lock(tmp_path):
+    root = str(tmp_path)
+    for i in range(4):
+        write(root, f"e{i}", 100, age=3600)
+    holder = DiskLRU(root, max_bytes=100)
+    handle = holder._try_lock()
+    try:
+        assert DiskLRU(root, max_bytes=100).sweep() == 0
+    finally:
+        handle.close()
+    assert len(remaining(root)) == 4
+
+
+def test_record_over_the_cap_wakes_the_background_sweeper(tmp_path):
+    root = str(tmp_path)
+    lru = DiskLRU(root, max_bytes=500, sweep_interval=3600)
+    lru.record(write(root, 'f0', 10, age=3600), 10)
+    deadline = time.monotonic() + 5
+    while lru._bytes is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    for i in range(1, 10):
+        lru.record(write(root, f"f{i}", 100, age=(10 - i) * 120), 100)
+    while sum(os.path.getsize(os.path.join(root, name)) for name in remaining(root)) > 500:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    assert 'f9' in remaining(root)
+    assert 'f0' not in remaining(root)
@@ -0,0 +1,65 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from backend.utils.disk_lru import DiskLRU
+
+
+@pytest.fixture(autouse=True)
+def no_background_sweeper(monkeypatch):
+    # الاختبارات تستدعي sweep() بنفسها حتى لا تتسابق مع خيط الخلفية
+    monkeypatch.setattr(DiskLRU, '_ensure_sweeper', lambda self: None)
+
+
+def stored_files(root):
+    return [os.path.join(d, name) for d, _, names in os.walk(root) for name in names if not name.startswith('.')]
+
+
+def age(path, seconds):
+    stamp = time.time() - seconds
+    os.utime(path, (stamp, stamp))
+
+
+def test_store_stays_under_its_size_cap(tmp_path):
+    from backend.utils.embedding_store import EmbeddingStore
+
+    embedding = np.ones(2048, dtype=np.float32)
+    store = EmbeddingStore(root=str(tmp_path), namespace='ns', max_bytes=1)
+    store.put('00probe', embedding)
+    file_size = os.path.getsize(stored_files(tmp_path)[0])
+    os.remove(stored_files(tmp_path)[0])
+
+    store = EmbeddingStore(root=str(tmp_path), namespace='ns', max_bytes=10 * file_size)
+    for i in range(20):
+        key = f"{i:02x}key{i}"
+        store.put(key, embedding)
+        age(store._path(key), (20 - i) * 120)
+    # الأقدم كتابةً لكنه قُرئ للتو
+    age(store._path('00key0'), 3600)
+    assert store.get('00key0') is not None
+
+    # الكتابة لا تحذف شيئاً؛ الحذف من عمل الكانس في الخلفية
+    assert len(stored_files(tmp_path)) == 20
+    store._lru.sweep()
+
+    files = stored_files(tmp_path)
+    assert sum(os.path.getsize(path) for path in files) <= 10 * file_size
+    assert '00key0' in store
+    assert f"{19:02x}key19" in store
+    assert '01key1' not in store
+
+
+def test_retired_namespace_is_evicted_first(tmp_path):
+    from backend.utils.embedding_store import EmbeddingStore
+
+    old = EmbeddingStore(root=str(tmp_path), namespace='old', max_bytes=1)
+    old.put('aakey', np.ones(8))
+    age(old._path('aakey'), 3600)
+
+    new = EmbeddingStore(root=str(tmp_path), namespace='new', max_bytes=os.path.getsize(old._path('aakey')) * 3 // 2)
+    new.put('bbkey', np.ones(8))
+    new._lru.sweep()
+    assert old.get('aakey') is None
+    assert new.get('bbkey') is not None
@@ -0,0 +1,84 @@
+import time
+
+import pytest
+
+from conftest import history_rows
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    from backend.routes.disease import HISTORY_CACHE
+    HISTORY_CACHE.clear()
+
+
+def page_queries(pool):
+    return [query for conn in pool.connections for query, _ in conn.queries if 'ORDER BY' in query]
+
+
+def test_unchanged_history_is_served_from_cache(pool, client, auth_headers):
+    pool.rows.extend(history_rows(2))
+    first = client.get('/api/history', headers=auth_headers)
+    second = client.get('/api/history', headers=auth_headers)
+
+    assert first.get_json() == second.get_json()
+    assert first.headers['ETag'] == second.headers['ETag']
+    assert len(page_queries(pool)) == 1
+
+
+def test_cache_hit_does_not_touch_the_database(pool, client, auth_headers):
+    pool.rows.extend(history_rows(2))
+    client.get('/api/history', headers=auth_headers)
+    queries = sum(len(conn.queries) for conn in pool.connections)
+    checkouts = len(pool.connections)
+
+    second = client.get('/api/history', headers=auth_headers)
+    assert second.status_code == 200
+    assert sum(len(conn.queries) for conn in pool.connections) == queries
+    assert len(pool.connections) == checkouts
+
+
+def test_write_from_another_worker_is_visible_immediately(pool, client, auth_headers):
+    from backend.routes.disease import HISTORY_STAMPS
+
+    pool.rows.extend(history_rows(2))
+    first = client.get('/api/history', headers=auth_headers)
+    assert len(first.get_json()) == 2
+
+    # إدخال من عامل آخر: لا يمر عبر HISTORY_CACHE.invalidate في هذه العملية لكنه يغيّر الختم
+    pool.rows.extend(history_rows(3)[2:])
+    HISTORY_STAMPS.bump('7')
+    second = client.get('/api/history', headers={**auth_headers, 'If-None-Match': first.headers['ETag']})
+
+    assert second.status_code == 200
+    assert len(second.get_json()) == 3
+    assert second.headers['ETag'] != first.headers['ETag']
+
+
+def test_unchanged_history_answers_304(pool, client, auth_headers):
+    pool.rows.extend(history_rows(2))
+    first = client.get('/api/history', headers=auth_headers)
+    second = client.get('/api/history', headers={**auth_headers, 'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 304
+
+
+def test_write_that_bypasses_the_stamp_shows_after_the_ttl(pool, client, auth_headers, monkeypatch):
+    from backend.routes.disease import HISTORY_CACHE
+
+    pool.rows.extend(history_rows(2))
+    client.get('/api/history', headers=auth_headers)
+    pool.rows.extend(history_rows(3)[2:])
+    assert len(client.get('/api/history', headers=auth_headers).get_json()) == 2
+
+    monkeypatch.setattr(HISTORY_CACHE, 'ttl', 0.01)
+    time.sleep(0.02)
+    assert len(client.get('/api/history', headers=auth_headers).get_json()) == 3
+
+
+def test_cached_page_answers_304_without_the_database(pool, client, auth_headers):
+    pool.rows.extend(history_rows(2))
+    first = client.get('/api/history', headers=auth_headers)
+    queries = sum(len(conn.queries) for conn in pool.connections)
+
+    second = client.get('/api/history', headers={**auth_headers, 'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 304
+    assert sum(len(conn.queries) for conn in pool.connections) == queries
@@ -0,0 +1,59 @@
+from conftest import history_rows
+
+
+def free_slots(pool):
+    return pool._slots._value
+
+
+def test_export_streams_rows_and_returns_connection(pool, client, auth_headers):
+    pool.rows = history_rows(3)
+    response = client.get('/api/history/export?format=ndjson', headers=auth_headers)
+
+    assert response.status_code == 200
+    assert len(response.get_data(as_text=True).splitlines()) == 3
+    assert free_slots(pool) == pool.size
+    # انتهى البث كاملاً: الاتصال يعود إلى المجمّع ولا يُغلق
+    assert pool._idle.qsize() == 1
+    assert not pool.connections[0].closed
+
+
+def test_head_does_not_hold_a_connection(pool, client, auth_headers):
+    for _ in range(pool.size + 1):
+        response = client.head('/api/history/export', headers=auth_headers)
+        assert response.status_code == 200
+    assert free_slots(pool) == pool.size
+    assert pool.connections == []
+
+
+def test_disconnect_before_first_chunk_releases_connection(pool, client, auth_headers):
+    pool.rows = history_rows(3)
+    for _ in range(pool.size + 1):
+        response = client.get('/api/history/export', headers=auth_headers, buffered=False)
+        assert response.status_code == 200
+        # العميل ينقطع دون قراءة أي دفعة: المولّد لا يبدأ أبداً
+        response.close()
+        assert free_slots(pool) == pool.size
+    # بقية النتائج لم تُقرأ من المؤشر غير المخزّن: الاتصال يُغلق ولا يُعاد
+    assert all(conn.closed for conn in pool.connections)
+
+    response = client.get('/api/history', headers=auth_headers)
+    assert response.status_code != 503
+
+
+def test_concurrent_exports_are_capped(pool, client, auth_headers):
+    from backend.config import Config
+
+    pool.rows = history_rows(3)
+    open_responses = [
+        client.get('/api/history/export', headers=auth_headers, buffered=False)
+        for _ in range(Config.HISTORY_EXPORT_MAX_CONCURRENT)
+    ]
+    rejected = client.get('/api/history/export', headers=auth_headers)
+    assert rejected.status_code == 503
+    assert rejected.headers['Retry-After']
+
+    # بترتيب عكسي: سياقات الطلبات المفتوحة في نفس الخيط متداخلة
+    for response in reversed(open_responses):
+        response.close()
+    assert client.get('/api/history/export', headers=auth_headers).status_code == 200
+    assert free_slots(pool) == pool.size
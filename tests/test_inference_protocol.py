@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from backend.utils.inference_protocol import (
+    ImageError, InferenceTierUnavailable, ModelUnavailable,
+    decode_request, decode_response, encode_outcomes, encode_request,
+)
+
+
+def test_request_round_trip_keeps_order_and_empty_blobs():
+    blobs = [b'\xff\xd8first', b'', b'third,with|separators']
+    body, sizes = encode_request(blobs)
+    assert sizes == '7,0,21'
+    assert decode_request(body, sizes) == blobs
+
+
+@pytest.mark.parametrize('body, sizes', [
+    (b'abcdef', '3,4'),      # جسم مقطوع
+    (b'abcdefgh', '3,4'),    # بايتات زائدة
+    (b'abc', '-1,4'),
+    (b'abc', '3,x'),
+    (b'abc', ''),
+    (b'abc', None),
+])
+def test_request_that_does_not_match_its_sizes_is_rejected(body, sizes):
+    with pytest.raises(ValueError):
+        decode_request(body, sizes)
+
+
+def test_outcomes_round_trip_with_per_image_errors():
+    outcomes = [({'class': 'Tomato___healthy', 'confidence': 0.97}, 'cache'), ValueError('cannot identify image')]
+    payload = json.dumps(encode_outcomes(outcomes)).encode('utf-8')
+
+    decoded = decode_response(200, payload)
+    assert decoded[0] == ({'class': 'Tomato___healthy', 'confidence': 0.97}, 'cache')
+    assert isinstance(decoded[1], ImageError)
+    assert str(decoded[1]) == 'cannot identify image'
+
+
+def test_model_unavailable_frame_raises_model_unavailable():
+    payload = json.dumps({'status': 'missing_artifacts', 'detail': 'model.weights.h5 not found'}).encode()
+    with pytest.raises(ModelUnavailable) as raised:
+        decode_response(503, payload)
+    assert raised.value.status == 'missing_artifacts'
+    assert raised.value.detail == 'model.weights.h5 not found'
+
+
+def test_error_status_without_model_state_is_a_tier_error():
+    with pytest.raises(InferenceTierUnavailable, match='overloaded'):
+        decode_response(503, b'{"error": "overloaded"}')
+    with pytest.raises(InferenceTierUnavailable, match='HTTP 500'):
+        decode_response(500, b'{}')
+
+
+@pytest.mark.parametrize('payload', [
+    b'{"items": [{"result": {"class": "a"}, "sou',   # JSON مقطوع
+    b'',
+    b'<html>502 Bad Gateway</html>',
+    b'[]',
+    b'{}',
+    b'{"items": [{"result": {}}]}',
+    b'{"items": [42]}',
+])
+def test_truncated_or_malformed_response_is_a_tier_error(payload):
+    with pytest.raises(InferenceTierUnavailable):
+        decode_response(200, payload)
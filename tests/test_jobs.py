@@ -0,0 +1,113 @@
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from backend.utils.admission import Overloaded
+from backend.utils.jobs import JobQueue
+
+
+class Runner:
+    """دالة تشغيل يمكن إيقافها حتى نرى الحالات الوسيطة"""
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.gate.set()
+        self.started = threading.Event()
+
+    def __call__(self, payload):
+        self.started.set()
+        self.gate.wait(5)
+        if payload == b'bad':
+            raise ValueError('cannot identify image')
+        return {'class': payload.decode()}
+
+
+@pytest.fixture
+def runner():
+    return Runner()
+
+
+@pytest.fixture
+def jobs(tmp_path, runner):
+    return JobQueue(runner, str(tmp_path), workers=1, max_queue=2, poll_interval=0.01)
+
+
+def test_job_goes_from_queued_through_running_to_done(jobs, runner):
+    runner.gate.clear()
+    job = jobs.submit(b'Tomato___healthy')
+    assert job['status'] == 'queued'
+
+    assert runner.started.wait(5)
+    assert jobs.get(job['job_id'])['status'] == 'running'
+
+    runner.gate.set()
+    done = jobs.wait(job['job_id'], 5)
+    assert done['status'] == 'done'
+    assert done['result'] == {'class': 'Tomato___healthy'}
+    # الحمولة تُحذف بعد التشغيل وتبقى الحالة فقط
+    assert os.listdir(jobs.folder) == [f"{job['job_id']}.json"]
+
+
+def test_failing_job_reports_its_error(jobs):
+    job = jobs.submit(b'bad')
+    failed = jobs.wait(job['job_id'], 5)
+    assert failed['status'] == 'failed'
+    assert failed['error'] == 'cannot identify image'
+
+
+def test_long_poll_returns_the_unfinished_state_after_its_timeout(jobs, runner):
+    runner.gate.clear()
+    job = jobs.submit(b'slow')
+
+    started = time.monotonic()
+    state = jobs.wait(job['job_id'], 0.2)
+    assert 0.2 <= time.monotonic() - started < 2
+    assert state['status'] in ('queued', 'running')
+    runner.gate.set()
+
+
+def test_long_poll_wakes_as_soon_as_the_job_finishes(jobs, runner):
+    runner.gate.clear()
+    job = jobs.submit(b'quick')
+    threading.Timer(0.1, runner.gate.set).start()
+
+    started = time.monotonic()
+    assert jobs.wait(job['job_id'], 5)['status'] == 'done'
+    assert time.monotonic() - started < 2
+
+
+@pytest.mark.parametrize('job_id', ['0' * 32, 'unknown', '../../etc/passwd', ''])
+def test_unknown_job_id_is_none(jobs, job_id):
+    assert jobs.get(job_id) is None
+    assert jobs.wait(job_id, 0.05) is None
+
+
+def test_full_queue_is_rejected_with_retry_after(jobs, runner):
+    runner.gate.clear()
+    jobs.submit(b'running')
+    assert runner.started.wait(5)
+    jobs.submit(b'queued-1')
+    jobs.submit(b'queued-2')
+
+    with pytest.raises(Overloaded) as raised:
+        jobs.submit(b'one too many')
+    assert raised.value.retry_after >= 1
+    assert len([name for name in os.listdir(jobs.folder) if name.endswith('.json')]) == 3
+    runner.gate.set()
+
+
+def test_unfinished_job_of_a_dead_worker_is_reported_failed(jobs):
+    job_id = 'a' * 32
+    state = {'job_id': job_id, 'status': 'running', 'created_at': 0, 'updated_at': time.time() - jobs.stale_seconds - 1}
+    with open(os.path.join(jobs.folder, f"{job_id}.json"), 'w') as f:
+        json.dump(state, f)
+
+    assert jobs.get(job_id)['status'] == 'failed'
+
+
+def test_unknown_job_answers_404(client):
+    response = client.get(f"/api/predict/jobs/{'0' * 32}")
+    assert response.status_code == 404
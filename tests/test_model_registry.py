@@ -0,0 +1,86 @@
+import time
+
+import pytest
+
+from backend.config import Config
+from backend.utils import model_registry
+
+
+class FakeModel:
+    def __init__(self, status):
+        self.status = status
+        self.error = None if status == 'ready' else 'model.weights.h5 not found'
+        self.loaded = status == 'ready'
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    """يستبدل التحميل الحقيقي بقائمة نتائج متتالية، ويعيد سجل المحاولات"""
+    monkeypatch.setattr(model_registry, '_MODELS', {})
+    monkeypatch.setattr(model_registry, '_FAILURES', {})
+    monkeypatch.setattr(model_registry, '_WARMUP_THREADS', {})
+    monkeypatch.setattr(Config, 'MODEL_REQUIRED', False)
+    monkeypatch.setattr(Config, 'INFERENCE_TIER', 'local')
+    outcomes = []
+    attempts = []
+
+    def fake_load(name):
+        attempts.append(name)
+        return FakeModel(outcomes.pop(0) if len(outcomes) > 1 else outcomes[0])
+
+    monkeypatch.setattr(model_registry, '_load', fake_load)
+    return outcomes, attempts
+
+
+def test_failed_load_is_retried_after_its_backoff(loads, monkeypatch):
+    outcomes, attempts = loads
+    outcomes.extend(['missing_artifacts', 'ready'])
+    monkeypatch.setattr(Config, 'MODEL_RETRY_SECONDS', 0.05)
+
+    assert model_registry.get_model().status == 'missing_artifacts'
+    # داخل مهلة الانتظار: نفس النتيجة الفاشلة دون محاولة جديدة
+    assert model_registry.get_model().status == 'missing_artifacts'
+    assert len(attempts) == 1
+
+    time.sleep(0.06)
+    assert model_registry.get_model().status == 'ready'
+    assert len(attempts) == 2
+    assert model_registry._FAILURES == {}
+
+
+def test_backoff_doubles_up_to_the_maximum(loads, monkeypatch):
+    outcomes, _ = loads
+    outcomes.append('failed')
+    monkeypatch.setattr(Config, 'MODEL_RETRY_SECONDS', 10)
+    monkeypatch.setattr(Config, 'MODEL_RETRY_MAX_SECONDS', 25)
+
+    delays = []
+    for _ in range(4):
+        # تجاوز المهلة يدوياً بدلاً من الانتظار
+        model_registry._FAILURES.update({name: (n, 0.0) for name, (n, _) in model_registry._FAILURES.items()})
+        model_registry.get_model()
+        delays.append(round(model_registry._FAILURES['default'][1] - time.monotonic()))
+    assert delays == [10, 20, 25, 25]
+
+
+def test_readiness_starts_the_load_without_waiting(loads, client):
+    outcomes, attempts = loads
+    outcomes.append('ready')
+
+    first = client.get('/api/ready')
+    assert first.status_code == 503
+    model_registry._WARMUP_THREADS[next(iter(model_registry._WARMUP_THREADS))].join(5)
+
+    assert attempts == ['default']
+    assert client.get('/api/ready').status_code == 200
+
+
+def test_missing_model_answers_503_without_server_paths(loads, client):
+    import io
+
+    outcomes, _ = loads
+    outcomes.append('missing_artifacts')
+    response = client.post('/api/predict', data={'image': (io.BytesIO(b'not an image'), 'leaf.jpg')})
+
+    assert response.status_code == 503
+    assert response.get_json() == {'error': 'Model not loaded on server', 'status': 'missing_artifacts'}
@@ -0,0 +1,83 @@
+import base64
+import datetime
+
+import pytest
+
+from backend.routes.disease import build_history_query, parse_history_filters
+from backend.utils.pagination import InvalidCursor, decode_cursor, encode_cursor
+
+
+def b64(text):
+    return base64.urlsafe_b64encode(text.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+@pytest.mark.parametrize('date', [
+    datetime.datetime(2024, 3, 1, 12, 30, 5),
+    datetime.datetime(2024, 3, 1, 12, 30, 5, 123456),
+])
+def test_cursor_round_trip(date):
+    cursor = encode_cursor(date, 42)
+    assert '=' not in cursor
+    assert decode_cursor(cursor) == (date, 42)
+
+
+@pytest.mark.parametrize('cursor', [
+    '',
+    'not-a-cursor',
+    '!!!!',
+    'é',
+    b64('2024-03-01 12:30:05'),
+    b64('2024-03-01 12:30:05|abc'),
+    b64('yesterday|42'),
+    base64.urlsafe_b64encode(b'\xff\xfe|1').decode('ascii'),
+])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor)
+
+
+def test_tampered_cursor_answers_400_without_a_query(pool, client, auth_headers):
+    cursor = encode_cursor(datetime.datetime(2024, 3, 1), 42)
+    tampered = cursor[:-3] + ('A' if cursor[-3] != 'A' else 'B') + cursor[-2:] + '$$'
+
+    response = client.get(f"/api/history?cursor={tampered}", headers=auth_headers)
+    assert response.status_code == 400
+    assert 'cursor' in response.get_json()['error']
+    assert not any(conn.queries for conn in pool.connections)
+
+
+def filters(**overrides):
+    return {'disease': None, 'from': None, 'to': None, 'after': None, **overrides}
+
+
+def test_query_without_filters_only_scopes_the_user():
+    query, params = build_history_query('7', filters(), limit=51)
+    assert 'WHERE user_id = %s ORDER BY date DESC, id DESC LIMIT %s' in query
+    assert params == ['7', 51]
+
+
+def test_query_combines_every_filter_in_order():
+    start, end = datetime.datetime(2024, 1, 1), datetime.datetime(2024, 2, 1)
+    after = (datetime.datetime(2024, 1, 15), 99)
+    query, params = build_history_query('7', filters(disease='Tomato___healthy', **{'from': start, 'to': end},
+                                                     after=after), limit=11)
+
+    where = query.split(' WHERE ')[1].split(' ORDER BY ')[0]
+    assert where == ("user_id = %s AND disease_name = %s AND date >= %s AND date < %s"
+                     " AND (date < %s OR (date = %s AND id < %s))")
+    assert params == ['7', 'Tomato___healthy', start, end, after[0], after[0], 99, 11]
+
+
+def test_query_without_limit_for_exports():
+    query, params = build_history_query('7', filters(disease='x'))
+    assert 'LIMIT' not in query
+    assert params == ['7', 'x']
+
+
+def test_bare_end_date_covers_the_whole_day():
+    parsed = parse_history_filters({'from': '2024-03-01', 'to': '2024-03-01'})
+    assert parsed['from'] == datetime.datetime(2024, 3, 1)
+    assert parsed['to'] == datetime.datetime(2024, 3, 2)
+
+    query, params = build_history_query('7', parsed)
+    assert params == ['7', datetime.datetime(2024, 3, 1), datetime.datetime(2024, 3, 2)]
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+from backend.utils import prediction_cache
+from backend.utils.prediction_cache import PredictionCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(prediction_cache.time, 'monotonic', clock)
+    return clock
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = PredictionCache(max_entries=4, ttl_seconds=60)
+    cache.put('k', {'class': 'healthy'})
+
+    clock.now += 59
+    assert cache.get('k') == {'class': 'healthy'}
+    clock.now += 2
+    assert cache.get('k') is None
+
+
+def test_zero_ttl_never_expires(clock):
+    cache = PredictionCache(max_entries=4, ttl_seconds=0)
+    cache.put('k', 1)
+    clock.now += 10 ** 6
+    assert cache.get('k') == 1
+
+
+def test_least_recently_used_entry_is_evicted_first():
+    cache = PredictionCache(max_entries=3)
+    for key in 'abc':
+        cache.put(key, key)
+    # قراءة a تجعلها الأحدث استخداماً، فيُخلى b عند الإضافة
+    assert cache.get('a') == 'a'
+    cache.put('d', 'd')
+
+    assert cache.get('b') is None
+    assert [cache.get(key) for key in 'acd'] == ['a', 'c', 'd']
+
+
+class FakeModel:
+    supports_embeddings = False
+    embedding_namespace = 'test'
+
+    def __init__(self, version):
+        self.version = version
+        self.forward_calls = 0
+
+    def preprocess_image(self, stream, timer=None):
+        return np.frombuffer(stream.read(), dtype=np.uint8).astype(np.float32)
+
+    def top_k(self, predictions, k=2):
+        return [(f"class-{self.version}", 0.9), ('other', 0.1)][:k]
+
+
+def test_model_version_change_is_a_miss(monkeypatch):
+    from backend.utils import inference_engine
+
+    monkeypatch.setattr(inference_engine, 'PREDICTION_CACHE', PredictionCache(max_entries=8))
+
+    def run(model):
+        def forward(images):
+            model.forward_calls += 1
+            return [np.zeros(2) for _ in images]
+        (result, source), = inference_engine.predict_images(model, [b'leaf'], forward)
+        return result, source
+
+    old = FakeModel('v1')
+    assert run(old)[1] == 'model'
+    assert run(old)[1] == 'cache'
+
+    new = FakeModel('v2')
+    result, source = run(new)
+    assert source == 'model'
+    assert result['class'] == 'class-v2'
+    assert new.forward_calls == 1
@@ -0,0 +1,39 @@
+import json
+import os
+
+import pytest
+
+from backend.config import Config
+from backend.utils.quantization import check_quantization_gate, file_sha256
+
+
+@pytest.fixture
+def artifacts(tmp_path):
+    for filename, data in ((Config.TFLITE_MODEL, b'tflite'), (Config.TFLITE_HEAD, b'head'),
+                           ('model.weights.h5', b'weights')):
+        (tmp_path / filename).write_bytes(data)
+    report = {
+        'mode': 'int8',
+        'tflite_sha256': file_sha256(tmp_path / Config.TFLITE_MODEL),
+        'head_sha256': file_sha256(tmp_path / Config.TFLITE_HEAD),
+        'float_weights_sha256': file_sha256(tmp_path / 'model.weights.h5'),
+        'top1_agreement': 1.0,
+    }
+    (tmp_path / Config.QUANTIZATION_REPORT).write_text(json.dumps(report))
+    return tmp_path
+
+
+def test_matching_artifacts_pass(artifacts):
+    assert check_quantization_gate(str(artifacts)) is None
+
+
+@pytest.mark.parametrize('filename', ['model.weights.h5', Config.TFLITE_HEAD, Config.TFLITE_MODEL])
+def test_any_changed_artifact_disables_the_quantized_backend(artifacts, filename):
+    with open(artifacts / filename, 'ab') as f:
+        f.write(b'retrained')
+    assert check_quantization_gate(str(artifacts)) is not None
+
+
+def test_quantized_only_deploy_passes_without_float_weights(artifacts):
+    os.remove(artifacts / 'model.weights.h5')
+    assert check_quantization_gate(str(artifacts)) is None
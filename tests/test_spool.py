@@ -0,0 +1,84 @@
+import mysql.connector
+import pytest
+
+from backend.utils.spool import WriteSpool, PermanentWriteError
+
+
+def record(record_id, value='x'):
+    return (record_id, 7, value)
+
+
+@pytest.fixture
+def spool(tmp_path):
+    delivered = []
+    spool = WriteSpool(str(tmp_path / 'spool.sqlite3'), delivered.extend, batch_size=2, name='test-spool')
+    spool.delivered = delivered
+    return spool
+
+
+def test_replay_delivers_everything_in_order_and_empties_the_spool(spool):
+    spool.append([record('a'), record('b'), record('c')])
+    assert spool.replay() == 3
+    assert [row[0] for row in spool.delivered] == ['a', 'b', 'c']
+    assert spool.stats()[0] == 0
+
+
+def test_records_stay_spooled_while_the_database_is_down(spool):
+    spool.append([record('a'), record('b')])
+
+    def down(records):
+        raise mysql.connector.errors.InterfaceError("Can't connect to MySQL server")
+
+    spool.replay_fn = down
+    with pytest.raises(mysql.connector.errors.InterfaceError):
+        spool.replay()
+    assert spool.stats()[0] == 2
+
+    spool.replay_fn = spool.delivered.extend
+    spool.replay()
+    assert [row[0] for row in spool.delivered] == ['a', 'b']
+
+
+def test_duplicate_record_ids_are_spooled_once(spool):
+    spool.append([record('a')])
+    spool.append([record('a')])
+    spool.replay()
+    assert len(spool.delivered) == 1
+
+
+def test_permanently_rejected_record_does_not_block_the_rest(spool):
+    def reject_b(records):
+        if any(row[0] == 'b' for row in records):
+            raise PermanentWriteError("unknown user")
+        spool.delivered.extend(records)
+
+    spool.replay_fn = reject_b
+    spool.append([record('a'), record('b'), record('c')])
+    spool.replay()
+
+    assert [row[0] for row in spool.delivered] == ['a', 'c']
+    assert spool.stats()[0] == 0
+
+
+def test_save_during_outage_is_spooled_and_replayed(pool, client, auth_headers):
+    from backend.routes.disease import HISTORY_SPOOL, INSERT_HISTORY
+
+    HISTORY_SPOOL.delete([seq for seq, _ in HISTORY_SPOOL.peek(1000)])
+    connect = pool._connect
+
+    def down():
+        raise mysql.connector.errors.InterfaceError("Can't connect to MySQL server")
+
+    pool._connect = down
+    result = {'disease_name': 'Tomato___Late_blight', 'confidence': 0.8, 'image_path': 'a.jpg'}
+    response = client.post('/api/save_result', json=result, headers=auth_headers)
+    assert response.status_code == 202
+    assert HISTORY_SPOOL.stats()[0] == 1
+    assert pool._slots._value == pool.size
+
+    pool._connect = connect
+    assert HISTORY_SPOOL.replay() == 1
+    assert HISTORY_SPOOL.stats()[0] == 0
+    (query, rows), = pool.connections[0].queries
+    assert query == INSERT_HISTORY
+    assert rows[0][1:5] == ('7', 'Tomato___Late_blight', 0.8, 'a.jpg')
@@ -0,0 +1,53 @@
+import os
+import time
+
+import pytest
+from PIL import Image
+
+from backend.utils.disk_lru import DiskLRU
+from backend.utils.thumbnails import ThumbnailCache
+
+
+@pytest.fixture(autouse=True)
+def no_background_sweeper(monkeypatch):
+    monkeypatch.setattr(DiskLRU, '_ensure_sweeper', lambda self: None)
+
+
+def upload(folder, name, color):
+    path = os.path.join(folder, name)
+    Image.new('RGB', (400, 300), color).save(path)
+    return path
+
+
+def test_same_stem_with_different_extensions_does_not_collide(tmp_path):
+    cache = ThumbnailCache(root=str(tmp_path / 'thumbs'))
+    jpg = cache.get(upload(str(tmp_path), 'a.jpg', 'red'), 'a.jpg', 160, 'jpeg')
+    png = cache.get(upload(str(tmp_path), 'a.png', 'blue'), 'a.png', 160, 'jpeg')
+
+    assert jpg != png
+    with Image.open(jpg) as image:
+        assert image.getpixel((10, 10))[0] > 200
+    with Image.open(png) as image:
+        assert image.getpixel((10, 10))[2] > 200
+
+
+def test_cache_is_kept_under_its_cap_by_the_sweeper(tmp_path):
+    root = str(tmp_path / 'thumbs')
+    cache = ThumbnailCache(root=root, max_bytes=10 ** 9)
+    paths = []
+    for i in range(6):
+        name = f"{i}.png"
+        path = cache.get(upload(str(tmp_path), name, (i * 40, 0, 0)), name, 160, 'jpeg')
+        stamp = time.time() - (6 - i) * 120
+        os.utime(path, (stamp, stamp))
+        paths.append(path)
+    size = max(os.path.getsize(path) for path in paths)
+
+    # حد يتسع لثلاث صور تقريباً، مشترك بين كل العمال
+    cache = ThumbnailCache(root=root, max_bytes=3 * size)
+    cache._lru.sweep()
+
+    kept = [path for path in paths if os.path.exists(path)]
+    assert sum(os.path.getsize(path) for path in kept) <= 3 * size
+    assert paths[-1] in kept
+    assert paths[0] not in kept
@@ -0,0 +1,50 @@
+import threading
+
+from backend.utils.write_behind import WriteBehindBuffer
+
+
+def test_records_are_coalesced_into_batches_and_flushed_in_order():
+    batches = []
+    buffer = WriteBehindBuffer(batches.append, max_batch_size=100, max_wait_ms=50, name='test-coalesce')
+    for i in range(250):
+        assert buffer.submit(i)
+    buffer.flush()
+
+    assert [record for batch in batches for record in batch] == list(range(250))
+    assert all(len(batch) <= 100 for batch in batches)
+    assert len(batches) < 250
+
+
+def test_failed_batch_is_retried_then_handed_to_on_failure():
+    attempts, failed = [], []
+
+    def flaky(records):
+        attempts.append(list(records))
+        raise ConnectionError("MySQL is down")
+
+    buffer = WriteBehindBuffer(flaky, max_wait_ms=1, retries=1, name='test-retry', on_failure=failed.extend)
+    buffer.submit('a')
+    buffer.flush()
+
+    assert attempts == [['a'], ['a']]
+    assert failed == ['a']
+
+
+def test_submit_refuses_when_queue_is_full():
+    started, release = threading.Event(), threading.Event()
+
+    def blocked(records):
+        started.set()
+        release.wait(5)
+
+    buffer = WriteBehindBuffer(blocked, max_batch_size=1, max_wait_ms=0, max_queue=2, name='test-full')
+    assert buffer.submit(1)
+    assert started.wait(5)
+    # الخيط مشغول بالسجل الأول: الطابور يتسع لسجلين فقط
+    assert buffer.submit(2)
+    assert buffer.submit(3)
+    assert not buffer.submit(4)
+
+    release.set()
+    buffer.flush()
+    assert buffer.pending() == 0